@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+VDEH batch tests
+
+run with python -m unittest (or pytest) from the src directory
+"""
+
+__component_version__ = "1.0"
+__license__ = "MIT License"
+
+# %% import modules/libraries
+import csv
+import json
+import os
+import tempfile
+import unittest
+
+from vdeh.gui import vdeh_batch
+
+# %% define tests
+
+JSON_JOBS = [
+    {
+        "name": "full",
+        "inputs": ["reports/a.csv", "reports/b.csv"],
+        "output": "out/full.xlsx",
+        "settings": "settings.xlsx",
+        "store": "",
+        "wide": True,
+        "sparse": False,
+        "replicates": True,
+        "longitudinal": False,
+        "scan": False,
+        "duplicates": "keep-last",
+        "formats": ["parquet", "csv"],
+        "parse_workers": 4,
+        "prefetch": 3,
+        "checkpoint": "ck",
+        "plot_cache": "plots",
+        "plot_cache_size": 32.0,
+        "resamples": 2000,
+        "seed": 7,
+        "resample_workers": 2,
+        "out_of_core": "spill",
+        "chunk_size": 1000,
+        "from_stage": "stats",
+        "validate": False,
+        "validate_only": False,
+    },
+    {
+        "name": "query",
+        "inputs": [],
+        "output": "out/query.xlsx",
+        "settings": "",
+        "store": "series.db",
+        "wide": False,
+        "sparse": False,
+        "replicates": False,
+        "longitudinal": False,
+        "scan": False,
+        "duplicates": "keep-first",
+        "formats": [],
+        "query": {
+            "animal": ["M1", "M2"],
+            "measure": ["EF"],
+            "start": "2024-01-01",
+            "end": None,
+        },
+    },
+]
+
+CSV_ROWS = [
+    {
+        "name": "full",
+        "inputs": "reports/a.csv; reports/b.csv",
+        "output": "out/full.xlsx",
+        "settings": "settings.xlsx",
+        "wide": "yes",
+        "replicates": "x",
+        "duplicates": "keep-last",
+        "formats": "parquet;CSV",
+        "parse_workers": "4",
+        "prefetch": "3",
+        "checkpoint": "ck",
+        "plot_cache": "plots",
+        "plot_cache_size": "32",
+        "resamples": "2000",
+        "seed": "7",
+        "resample_workers": "2",
+        "out_of_core": "spill",
+        "chunk_size": "1000",
+        "from_stage": "stats",
+        "validate": "no",
+        "validate_only": "0",
+    },
+    {
+        "name": "query",
+        "output": "out/query.xlsx",
+        "store": "series.db",
+        "query": "1",
+        "animal": "M1;M2",
+        "measure": "EF",
+        "start": "2024-01-01",
+    },
+]
+
+
+class ReadManifestTest(unittest.TestCase):
+    def test_csv_matches_json(self):
+        with tempfile.TemporaryDirectory() as base:
+            json_path = os.path.join(base, "manifest.json")
+            with open(json_path, "w") as f:
+                json.dump(JSON_JOBS, f)
+            csv_path = os.path.join(base, "manifest.csv")
+            columns = list(dict.fromkeys(k for row in CSV_ROWS for k in row))
+            with open(csv_path, "w", newline="") as f:
+                writer = csv.DictWriter(f, columns)
+                writer.writeheader()
+                writer.writerows(CSV_ROWS)
+
+            from_json = vdeh_batch.read_manifest(json_path)
+            from_csv = vdeh_batch.read_manifest(csv_path)
+            self.assertEqual(from_csv, from_json)
+            self.assertEqual(
+                from_csv[0]["checkpoint"], os.path.normpath(os.path.join(base, "ck"))
+            )
+            self.assertEqual(from_csv[1]["inputs"], [])
+
+
+class ShareWorkersTest(unittest.TestCase):
+    def jobs(self, n, parse_workers=8, resample_workers=None):
+        return [
+            {
+                "name": f"job {i}",
+                "parse_workers": parse_workers,
+                "resample_workers": resample_workers,
+            }
+            for i in range(n)
+        ]
+
+    def test_jobs_split_the_budget(self):
+        jobs, concurrent_jobs = vdeh_batch.share_workers(self.jobs(3, 8, 8), 8)
+        self.assertEqual(concurrent_jobs, 3)
+        for job in jobs:
+            self.assertEqual(job["parse_workers"], 2)
+            self.assertEqual(job["resample_workers"], 2)
+        self.assertLessEqual(concurrent_jobs * jobs[0]["parse_workers"], 8)
+
+    def test_single_job_keeps_its_workers(self):
+        jobs, concurrent_jobs = vdeh_batch.share_workers(self.jobs(1, 3), 8)
+        self.assertEqual(concurrent_jobs, 1)
+        self.assertEqual(jobs[0]["parse_workers"], 3)
+        self.assertEqual(jobs[0]["resample_workers"], 1)
+
+    def test_more_jobs_than_workers(self):
+        jobs, concurrent_jobs = vdeh_batch.share_workers(self.jobs(10), 4)
+        self.assertEqual(concurrent_jobs, 4)
+        self.assertTrue(all(job["parse_workers"] == 1 for job in jobs))
+
+
+if __name__ == "__main__":
+    unittest.main()
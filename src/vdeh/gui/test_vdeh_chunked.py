@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+VDEH out-of-core tests
+
+run with python -m unittest (or pytest) from the src directory
+"""
+
+__component_version__ = "1.0"
+__license__ = "MIT License"
+
+# %% import modules/libraries
+import importlib.util
+import tempfile
+import unittest
+import warnings
+
+import numpy
+import pandas
+
+from vdeh.gui import vdeh_chunked
+
+# %% define tests
+
+
+def unbalanced_frame(rows=600, seed=0):
+    # 2 x 3 design with unequal cell sizes, a large offset (to catch naive
+    # sum of squares) and missing/non numeric values
+    rng = numpy.random.default_rng(seed)
+    df = pandas.DataFrame(
+        {
+            "genotype": rng.choice(["KO", "WT"], rows, p=[0.35, 0.65]),
+            "dose": rng.choice(["low", "mid", "high"], rows, p=[0.5, 0.3, 0.2]),
+            "EF": rng.normal(60, 8, rows) + 1e6,
+            "HR": rng.normal(450, 40, rows),
+        }
+    )
+    df.loc[df["genotype"] == "KO", "HR"] += 25
+    df.loc[rng.random(rows) < 0.05, "HR"] = numpy.nan
+    df.loc[rng.random(rows) < 0.02, "dose"] = numpy.nan
+    df["HR"] = df["HR"].astype(object)
+    df.loc[3, "HR"] = "ERROR_NA"
+    return df
+
+
+def accumulate(df, factors, outcomes, chunks=7):
+    accumulator = vdeh_chunked.GroupAccumulator(factors, outcomes)
+    for part in numpy.array_split(df, chunks):
+        accumulator.update(part)
+    return accumulator
+
+
+class GroupAccumulatorTest(unittest.TestCase):
+    def test_summary_matches_pandas(self):
+        df = unbalanced_frame()
+        factors = ["genotype", "dose"]
+        summary = accumulate(df, factors, ["EF", "HR"]).summary()
+        expected = df.assign(HR=pandas.to_numeric(df["HR"], errors="coerce"))
+        for c in ["EF", "HR"]:
+            reference = (
+                expected.dropna(subset=factors)
+                .groupby(factors)[c]
+                .agg(["count", "mean", "var", "std", "sem"])
+                .reset_index()
+            )
+            merged = summary[summary["outcome_measure"] == c].merge(
+                reference, on=factors
+            )
+            self.assertEqual(merged.shape[0], reference.shape[0])
+            numpy.testing.assert_array_equal(merged["N"], merged["count"])
+            numpy.testing.assert_allclose(
+                merged["mean_x"], merged["mean_y"], rtol=1e-12
+            )
+            numpy.testing.assert_allclose(merged["variance"], merged["var"], rtol=1e-8)
+            numpy.testing.assert_allclose(merged["SD"], merged["std"], rtol=1e-8)
+            numpy.testing.assert_allclose(merged["SEM"], merged["sem"], rtol=1e-8)
+
+    def test_merge_does_not_depend_on_chunking(self):
+        df = unbalanced_frame()
+        factors = ["genotype", "dose"]
+        whole = accumulate(df, factors, ["EF", "HR"], chunks=1).summary()
+        # chunks split over two accumulators (e.g. workers), then merged
+        first = vdeh_chunked.GroupAccumulator(factors, ["EF", "HR"])
+        second = vdeh_chunked.GroupAccumulator(factors, ["EF", "HR"])
+        for i, part in enumerate(numpy.array_split(df, 13)):
+            (first if i % 3 else second).update(part)
+        first.merge(second)
+        self.assertEqual(first.rows, df.shape[0])
+        merged = first.summary()
+        pandas.testing.assert_frame_equal(
+            merged[factors + ["outcome_measure", "N"]],
+            whole[factors + ["outcome_measure", "N"]],
+        )
+        for c in ["mean", "variance", "SEM"]:
+            numpy.testing.assert_allclose(merged[c], whole[c], rtol=1e-9)
+
+    def test_cell_missing_from_a_chunk(self):
+        df = pandas.DataFrame(
+            {"g": ["a", "a", "b", "b", "c"], "y": [1.0, 3.0, 5.0, 9.0, 4.0]}
+        )
+        accumulator = vdeh_chunked.GroupAccumulator(["g"], ["y"])
+        accumulator.update(df.iloc[:2])
+        accumulator.update(df.iloc[2:])
+        summary = accumulator.summary().set_index("g")
+        self.assertEqual(summary.loc["a", "variance"], 2.0)
+        self.assertEqual(summary.loc["b", "variance"], 8.0)
+        self.assertTrue(numpy.isnan(summary.loc["c", "variance"]))
+
+
+class CellAnovaTest(unittest.TestCase):
+    def test_matches_pingouin(self):
+        import pingouin
+
+        df = unbalanced_frame()
+        df["HR"] = pandas.to_numeric(df["HR"], errors="coerce")
+        factors = ["genotype", "dose"]
+        accumulator = accumulate(df, factors, ["HR"], chunks=7)
+        data = df.dropna(subset=factors + ["HR"])
+        for ss_type in [1, 2, 3]:
+            table = accumulator.anova("HR", ss_type).set_index("Source")
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                expected = pingouin.anova(
+                    data=data, dv="HR", between=factors, ss_type=ss_type
+                ).set_index("Source")
+            self.assertEqual(list(table.index), list(expected.index))
+            for c in ["SS", "DF", "MS", "F", "p-unc", "np2"]:
+                numpy.testing.assert_allclose(
+                    table[c].astype(float),
+                    expected[c].astype(float),
+                    rtol=1e-7,
+                    err_msg=f"type {ss_type} {c}",
+                )
+
+    def test_one_factor_matches_scipy(self):
+        from scipy import stats
+
+        df = unbalanced_frame()
+        accumulator = accumulate(df, ["dose"], ["EF"])
+        groups = [g["EF"].values for _, g in df.dropna(subset=["dose"]).groupby("dose")]
+        table = accumulator.anova("EF").set_index("Source")
+        expected = stats.f_oneway(*groups)
+        self.assertAlmostEqual(table.loc["dose", "F"], expected.statistic, places=6)
+        self.assertAlmostEqual(table.loc["dose", "p-unc"], expected.pvalue, places=9)
+
+
+@unittest.skipUnless(importlib.util.find_spec("pyarrow"), "needs pyarrow")
+class ChunkFilesTest(unittest.TestCase):
+    def test_write_read_clear(self):
+        df = unbalanced_frame(rows=50)
+        with tempfile.TemporaryDirectory() as spill_dir:
+            for i, part in enumerate(numpy.array_split(df, 3)):
+                vdeh_chunked.write_chunk(part.astype({"HR": str}), spill_dir, i)
+            self.assertEqual(len(vdeh_chunked.chunk_paths(spill_dir)), 3)
+            read = pandas.concat(
+                vdeh_chunked.read_chunks(spill_dir, ["genotype", "EF"]),
+                ignore_index=True,
+            )
+            pandas.testing.assert_frame_equal(
+                read, df[["genotype", "EF"]].reset_index(drop=True)
+            )
+            vdeh_chunked.clear_chunks(spill_dir)
+            self.assertEqual(vdeh_chunked.chunk_paths(spill_dir), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
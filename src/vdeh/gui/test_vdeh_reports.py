@@ -0,0 +1,363 @@
+# -*- coding: utf-8 -*-
+"""
+VDEH report parsing tests
+
+run with python -m unittest (or pytest) from the src directory
+"""
+
+__component_version__ = "1.0"
+__license__ = "MIT License"
+
+# %% import modules/libraries
+import bz2
+import gzip
+import lzma
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+
+import pandas
+
+from vdeh.gui import vdeh_model
+
+# %% define tests
+
+
+def report_text(study, series):
+    # a minimal VevoLab report, series are (name, animal, date, {parameter: value})
+    lines = [
+        '"FUJIFILM VisualSonics Measurement Export"',
+        '"Report Date","9/11/2023"',
+        "",
+        '"Study","1"',
+        f'"Study Name","{study}"',
+        '"Study Date","5/11/2022"',
+        "",
+    ]
+    for name, animal, date, values in series:
+        lines += [
+            "",
+            f'"Series Name","{name}"',
+            f'"Series Date","{date}"',
+            f'"Animal ID","{animal}"',
+            "",
+            '"Measurement","Mode","Parameter","Units","Value"',
+        ]
+        lines += [f'"LV","M-Mode","{p}","%","{v}",' for p, v in values.items()]
+        lines.append("")
+    return "\n".join(lines) + "\n"
+
+
+def large_report(n):
+    # n series whose metadata, measurement and calculation rows vary between
+    # series (fields missing from some blocks), with windows line endings
+    lines = [
+        '"FUJIFILM VisualSonics Measurement Export"',
+        '"Report Date","9/11/2023"',
+        "",
+        '"Study","1"',
+        '"Study Name","LARGE"',
+        "",
+    ]
+    for i in range(n):
+        lines += [
+            "",
+            f'"Series Name","Series {i}"',
+            f'"Series Date","5/{1 + i % 28}/2022"',
+            f'"Animal ID","M{i % 7}"',
+        ]
+        if i % 3:
+            lines.append(f'"Sex","{["female", "male"][i % 2]}"')
+        lines += [
+            "",
+            f'"Measurement File","VSI_Package{i % 2}.sxml"',
+            "",
+            '"Measurement","Mode","Parameter","Units","Avg","STD",'
+            + '"Instance 1","Instance 2"',
+            f'"LVAW;d","M-Mode","Depth","mm","{1 + i / 100}","0.1",'
+            + f'"{1 + i / 90}","{1 + i / 110}",',
+        ]
+        if i % 5:
+            lines.append(f'"LVID;d","M-Mode","Depth","mm","{3 + i / 50}","0.2","3.1",')
+        lines += ["", "Calculation,,Units,", f'"EF",,"%",{50 + i % 13},']
+        if i % 4 == 0:
+            lines.append(f'"FS",,"%",{25 + i % 7},')
+        lines.append("")
+    return "\r\n".join(lines) + "\r\n"
+
+
+def write_reports(directory, reports):
+    paths = []
+    for name, text in reports.items():
+        paths.append(os.path.join(directory, name))
+        with open(paths[-1], "w", newline="") as f:
+            f.write(text)
+    return paths
+
+
+class Logger:
+    def __init__(self):
+        self.messages = []
+
+    def log(self, level, message, **kwargs):
+        self.messages.append((level, message))
+
+
+class DuplicateSeriesTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def collect(self, second_copy, policy):
+        # Series 2 is the last block of a.csv and the first of b.csv
+        paths = write_reports(
+            self.directory.name,
+            {
+                "a.csv": report_text(
+                    "A",
+                    [
+                        ("Series 1", "M1", "5/11/2022", {"EF": 50}),
+                        ("Series 2", "M2", "5/11/2022", {"EF": 60}),
+                    ],
+                ),
+                "b.csv": report_text(
+                    "B",
+                    [
+                        ("Series 2", "M2", "5/11/2022", {"EF": second_copy}),
+                        ("Series 3", "M3", "5/12/2022", {"EF": 70}),
+                    ],
+                ),
+            },
+        )
+        logger = Logger()
+        table = vdeh_model.collect_series(paths, logger, duplicate_policy=policy)[1]
+        df = table.wide()
+        rows = sorted(zip(df["Series Name"], df["Study ID"], df["LV_M-Mode_EF"]))
+        return rows, logger
+
+    def test_keep_first(self):
+        rows, logger = self.collect(60, "keep-first")
+        self.assertEqual(
+            rows,
+            [("Series 1", "A", 50), ("Series 2", "A", 60), ("Series 3", "B", 70)],
+        )
+        self.assertIn(
+            ("info", "1 duplicate series found (keep-first)"), logger.messages
+        )
+
+    def test_keep_last(self):
+        rows, logger = self.collect(60, "keep-last")
+        self.assertEqual(
+            rows,
+            [("Series 1", "A", 50), ("Series 2", "B", 60), ("Series 3", "B", 70)],
+        )
+
+    def test_error(self):
+        with self.assertRaises(vdeh_model.DuplicateSeriesError):
+            self.collect(60, "error")
+
+    def test_differing_values_are_not_duplicates(self):
+        # same name, animal and date but other values - both copies are kept
+        for policy in vdeh_model.DUPLICATE_POLICIES:
+            rows, logger = self.collect(61, policy)
+            self.assertEqual(
+                rows,
+                [
+                    ("Series 1", "A", 50),
+                    ("Series 2", "A", 60),
+                    ("Series 2", "B", 61),
+                    ("Series 3", "B", 70),
+                ],
+                policy,
+            )
+
+
+class SeriesDeduplicatorTest(unittest.TestCase):
+    fingerprint = ("Series 2", "M2", "5/11/2022", "0" * 40)
+
+    def test_rank_decides_not_arrival(self):
+        # parallel workers may claim the later copy first, copies that lose
+        # their claim are not parsed, kept drops the ones replaced later
+        for policy, winner in [("keep-first", 0), ("keep-last", 1)]:
+            dedup = vdeh_model.SeriesDeduplicator(policy)
+            reports = {}
+            for rank, source in [(1, "b.csv"), (0, "a.csv")]:
+                claimed = dedup.claim(self.fingerprint, (rank, 0), source)
+                reports[rank] = {"Series 2": {}} if claimed else {}
+            kept = [rank for rank in [0, 1] if dedup.kept(rank, reports[rank])]
+            self.assertEqual(kept, [winner], policy)
+            self.assertEqual(dedup.duplicates, 1)
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            vdeh_model.SeriesDeduplicator("merge")
+
+
+def ordered(column_names, result, fingerprints):
+    # parse outputs with the order of every dict, series are in block order
+    study_id, study_dict, report_dict = result
+    return (
+        column_names,
+        study_id,
+        list(study_dict.items()),
+        list(report_dict.items()),
+        list(fingerprints.items()),
+    )
+
+
+def empty_column_names():
+    return {
+        "MetaData Fields": [],
+        "VevoLab Measurement_Mode_Parameter or Calculation": [],
+    }
+
+
+class ParallelParseTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.paths = write_reports(
+            cls.directory.name,
+            {"large.csv": large_report(50), "copy.csv": large_report(50)},
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def setUp(self):
+        # parse the small fixture in parallel as if it were large
+        blocks = vdeh_model.PARALLEL_MIN_BLOCKS
+        vdeh_model.PARALLEL_MIN_BLOCKS = 2
+        self.addCleanup(setattr, vdeh_model, "PARALLEL_MIN_BLOCKS", blocks)
+
+    def sequential(self, projection):
+        column_names, fingerprints = empty_column_names(), {}
+        with vdeh_model.open_report(self.paths[0]) as f:
+            result = vdeh_model.parse_report(
+                (r.replace('"', "") for r in f),
+                column_names,
+                self.paths[0],
+                projection=projection,
+                fingerprints=fingerprints,
+            )
+        return ordered(column_names, result, fingerprints)
+
+    def test_indexed_matches_parse_report(self):
+        index = vdeh_model.index_report(self.paths[0])
+        self.assertEqual(len(index["blocks"]), 50)
+        for keys in [None, ["EF", "LVID;d_M-Mode_Depth", "Sex"]]:
+            projection = vdeh_model.make_projection(keys)
+            expected = self.sequential(projection)
+            # 1 worker parses every block in one process, 3 workers get
+            # chunks of 16 blocks (boundaries inside the report)
+            for workers in [1, 3]:
+                column_names, fingerprints = empty_column_names(), {}
+                result = vdeh_model.parse_indexed_report(
+                    self.paths[0],
+                    index,
+                    column_names,
+                    workers,
+                    projection,
+                    fingerprints,
+                )
+                self.assertEqual(
+                    ordered(column_names, result, fingerprints),
+                    expected,
+                    (keys, workers),
+                )
+
+    def test_parse_workers(self):
+        for keys in [None, ["EF", "LVAW;d_M-Mode_Depth"]]:
+            projection = vdeh_model.make_projection(keys)
+            parallel, sequential = [
+                vdeh_model.load_report(
+                    self.paths[0], projection=projection, workers=workers
+                )
+                for workers in [3, 1]
+            ]
+            self.assertEqual(
+                ordered(parallel[0], parallel[1:], {}),
+                ordered(sequential[0], sequential[1:], {}),
+            )
+        # every series of the copy is a duplicate, claimed as blocks are parsed
+        for policy in ["keep-first", "keep-last"]:
+            tables = [
+                vdeh_model.collect_series(
+                    self.paths, duplicate_policy=policy, workers=workers
+                )[1].wide()
+                for workers in [1, 3]
+            ]
+            pandas.testing.assert_frame_equal(tables[0], tables[1])
+            self.assertEqual(tables[0].shape[0], 50)
+
+
+class CompressedReportTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        plain = os.path.join(cls.directory.name, "plain")
+        os.makedirs(plain)
+        # the Study ID of a report without a Study Name is its file name
+        cls.paths = write_reports(
+            plain,
+            {
+                "a.csv": report_text(
+                    "A", [("Series 1", "M1", "5/11/2022", {"EF": 50, "FS": 30})]
+                ),
+                "large.csv": large_report(30),
+                "unnamed.txt": report_text(
+                    "X", [("Series 1", "M2", "5/12/2022", {"EF": 55})]
+                ).replace('"Study Name","X"\n', ""),
+            },
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def collect(self, paths):
+        column_names, table, study_df = vdeh_model.collect_series(paths)
+        return column_names, table.wide(), study_df
+
+    def assertSameParse(self, paths, expected):
+        column_names, df, study_df = self.collect(paths)
+        self.assertEqual(column_names, expected[0])
+        pandas.testing.assert_frame_equal(df, expected[1])
+        pandas.testing.assert_frame_equal(study_df, expected[2])
+
+    def test_compressed_reports(self):
+        expected = self.collect(self.paths)
+        self.assertIn("unnamed", list(expected[2]["Study ID"]))
+        for ext, opener in [(".gz", gzip.open), (".bz2", bz2.open), (".xz", lzma.open)]:
+            compressed = []
+            for p in self.paths:
+                compressed.append(os.path.join(self.directory.name, "c", p + ext))
+                os.makedirs(os.path.dirname(compressed[-1]), exist_ok=True)
+                with open(p, "rb") as src, opener(compressed[-1], "wb") as dst:
+                    shutil.copyfileobj(src, dst)
+            self.assertSameParse(compressed, expected)
+
+    def test_zip_of_reports(self):
+        expected = self.collect(self.paths)
+        archive = os.path.join(self.directory.name, "zipped", "reports.zip")
+        os.makedirs(os.path.dirname(archive), exist_ok=True)
+        with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zf:
+            for p in self.paths:
+                zf.write(p, os.path.basename(p))
+            zf.writestr("notes/readme.md", "not a report")
+        self.assertEqual(
+            [vdeh_model.report_stem(p) for p in vdeh_model.archive_members(archive)],
+            ["a", "large", "unnamed"],
+        )
+        self.assertSameParse(vdeh_model.expand_report_paths([archive]), expected)
+        # a directory holding the archive
+        self.assertSameParse(
+            vdeh_model.expand_report_paths([os.path.dirname(archive)]), expected
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
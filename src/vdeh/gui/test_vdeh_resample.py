@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+VDEH resampling tests
+
+run with python -m unittest (or pytest) from the src directory
+"""
+
+__component_version__ = "1.0"
+__license__ = "MIT License"
+
+# %% import modules/libraries
+import itertools
+import unittest
+
+import numpy
+import pandas
+
+from vdeh.gui import vdeh_resample
+
+# %% define tests
+
+
+class ResampleTest(unittest.TestCase):
+    def setUp(self):
+        rng = numpy.random.default_rng(3)
+        self.values = rng.normal(size=(40, 3))
+        self.values[:20] += [0.0, 0.5, 2.0]
+        self.values[5, 1] = numpy.nan
+        self.comparisons = [
+            (numpy.arange(20), numpy.arange(20, 40)),
+            (numpy.arange(10), numpy.arange(30, 40)),
+        ]
+
+    def test_workers_do_not_change_results(self):
+        # more iterations than one chunk, so the chunks are spread over workers
+        iterations = vdeh_resample.CHUNK_SIZE * 2 + 500
+        single = vdeh_resample.resample(
+            self.values, self.comparisons, iterations, seed=7, workers=1
+        )
+        pooled = vdeh_resample.resample(
+            self.values, self.comparisons, iterations, seed=7, workers=2
+        )
+        for a, b in zip(single, pooled):
+            numpy.testing.assert_array_equal(a, b)
+
+    def test_seed_changes_results(self):
+        first = vdeh_resample.resample(self.values, self.comparisons, 500, seed=1)
+        second = vdeh_resample.resample(self.values, self.comparisons, 500, seed=2)
+        numpy.testing.assert_array_equal(first[0], second[0])
+        self.assertFalse(numpy.array_equal(first[1], second[1]))
+
+    def test_permutation_pval_matches_enumeration(self):
+        a = numpy.array([1.0, 2.5, 3.0])
+        b = numpy.array([2.0, 4.0, 5.5, 6.0])
+        pooled = numpy.concatenate([a, b])
+        observed = abs(a.mean() - b.mean())
+        splits = list(itertools.combinations(range(len(pooled)), len(a)))
+        exact = numpy.mean(
+            [
+                abs(pooled[list(s)].mean() - numpy.delete(pooled, s).mean())
+                >= observed - 1e-12
+                for s in splits
+            ]
+        )
+        diff, low, high, pval = vdeh_resample.resample(
+            pooled[:, None], [(numpy.arange(3), numpy.arange(3, 7))], 20000, seed=0
+        )
+        self.assertAlmostEqual(diff[0, 0], a.mean() - b.mean())
+        self.assertAlmostEqual(pval[0, 0], exact, delta=0.02)
+        self.assertLess(low[0, 0], diff[0, 0])
+        self.assertGreater(high[0, 0], diff[0, 0])
+
+    def test_bootstrap_interval_width(self):
+        rng = numpy.random.default_rng(0)
+        values = numpy.concatenate([rng.normal(0, 1, 300), rng.normal(1, 2, 200)])
+        diff, low, high, pval = vdeh_resample.resample(
+            values[:, None],
+            [(numpy.arange(300), numpy.arange(300, 500))],
+            4000,
+            seed=0,
+        )
+        se = numpy.sqrt(values[:300].var(ddof=1) / 300 + values[300:].var(ddof=1) / 200)
+        # the percentile interval is close to the normal one for large groups
+        width = 2 * 1.96 * se
+        self.assertAlmostEqual((high - low)[0, 0], width, delta=0.15 * width)
+        self.assertLess(pval[0, 0], 0.01)
+
+    def test_groups_too_small(self):
+        values = numpy.array([[1.0], [2.0], [3.0], [numpy.nan]])
+        result = vdeh_resample.resample(
+            values, [(numpy.arange(2), numpy.arange(2, 4))], 100
+        )
+        for r in result:
+            self.assertTrue(numpy.isnan(r[0, 0]))
+
+
+class ResamplePairwiseTest(unittest.TestCase):
+    def test_both_orders(self):
+        rng = numpy.random.default_rng(1)
+        df = pandas.DataFrame(
+            {
+                "genotype": numpy.repeat(["KO", "WT"], 12),
+                "sex": numpy.tile(["F", "M"], 12),
+                "EF": rng.normal(50, 5, 24),
+            }
+        )
+        result = vdeh_resample.resample_pairwise(
+            df, ["genotype", "sex"], ["EF"], 1000, seed=0
+        ).set_index("comparison")
+        forward = result.loc["KO vs WT"]
+        backward = result.loc["WT vs KO"]
+        self.assertAlmostEqual(forward["mean diff"], -backward["mean diff"])
+        self.assertAlmostEqual(
+            forward["bootstrap ci low"], -backward["bootstrap ci high"]
+        )
+        self.assertEqual(forward["permutation pval"], backward["permutation pval"])
+        # genotype, sex and the 6 pairs of their 4 combinations, in both orders
+        self.assertEqual(result.shape[0], 2 * (1 + 1 + 6))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+"""
+VDEH series store tests
+
+run with python -m unittest (or pytest) from the src directory
+"""
+
+__component_version__ = "1.0"
+__license__ = "MIT License"
+
+# %% import modules/libraries
+import array
+import unittest
+
+import numpy
+import pandas
+
+from vdeh.gui import vdeh_series
+
+# %% define tests
+
+MEASUREMENTS = ["EF", "FS", "LVAW;d_M-Mode_Depth", "HR"]
+
+
+def report_dicts():
+    # two reports as vdeh_model.parse_report returns them - fields missing
+    # from some series, numbers as text, values that are not numbers and the
+    # raw values of replicated measurements
+    first = {
+        "Series 1": {
+            "Series Name": "Series 1",
+            "Animal ID": "M1",
+            "Series Date": "1/2/2024",
+            "EF": "55.5",
+            "FS": "30",
+            "LVAW;d_M-Mode_Depth": 2.0,
+            vdeh_series.REPLICATES: (
+                ["LVAW;d_M-Mode_Depth"],
+                [3],
+                array.array("d", [1.0, 2.0, 3.0]),
+            ),
+            "Study ID": "A",
+        },
+        "Series 2": {
+            "Series Name": "Series 2",
+            "Animal ID": "M2",
+            "Series Date": "1/3/2024",
+            "Sex": "female",
+            "EF": "ERROR_NA",
+            "LVAW;d_M-Mode_Depth": 1.5,
+            vdeh_series.REPLICATES: (
+                ["LVAW;d_M-Mode_Depth"],
+                [4],
+                array.array("d", [1.0, numpy.nan, 2.0, 1.5]),
+            ),
+            "Study ID": "A",
+        },
+    }
+    second = {
+        "Series 1": {
+            "Series Name": "Series 1",
+            "Animal ID": "M1",
+            "Series Date": "2/2/2024",
+            "HR": 450.0,
+            "EF": 60.0,
+            "LVAW;d_M-Mode_Depth": 4.0,
+            vdeh_series.REPLICATES: (
+                ["LVAW;d_M-Mode_Depth"],
+                [1],
+                array.array("d", [4.0]),
+            ),
+            "Study ID": "B",
+        },
+        "Series 3": {
+            "Series Name": "Series 3",
+            "Animal ID": "M3",
+            "Series Date": "2/3/2024",
+            "Study ID": "B",
+        },
+    }
+    return [first, second]
+
+
+def old_wide(reports):
+    # the frame collect_data built before series were kept in long format
+    df = pandas.concat(
+        [pandas.DataFrame()]
+        + [
+            pandas.DataFrame.from_dict(
+                {
+                    name: {
+                        k: v for k, v in series.items() if k != vdeh_series.REPLICATES
+                    }
+                    for name, series in report.items()
+                },
+                orient="index",
+            )
+            for report in reports
+        ],
+        axis=0,
+        join="outer",
+    )
+    return df.reset_index(drop=True)
+
+
+class SeriesTableTest(unittest.TestCase):
+    def setUp(self):
+        self.table = vdeh_series.SeriesTable.from_reports(report_dicts(), MEASUREMENTS)
+
+    def test_wide_matches_old_frame(self):
+        old = old_wide(report_dicts())
+        new = self.table.wide()
+        self.assertEqual(list(new.columns), list(old.columns))
+        for c in old.columns:
+            if c in MEASUREMENTS:
+                # numbers are converted, anything else is kept as text
+                numpy.testing.assert_array_equal(
+                    pandas.to_numeric(new[c], errors="coerce"),
+                    pandas.to_numeric(old[c], errors="coerce"),
+                )
+                text = (
+                    old[c].notna() & pandas.to_numeric(old[c], errors="coerce").isna()
+                )
+                self.assertEqual(list(new[c][text]), list(old[c][text]))
+            else:
+                pandas.testing.assert_series_equal(new[c], old[c], check_dtype=False)
+
+    def test_selected_and_sparse_columns(self):
+        dense = self.table.wide()
+        selected = self.table.wide(["HR", "Animal ID", "not found", "FS"], sparse=True)
+        self.assertEqual(list(selected.columns), ["HR", "Animal ID", "not found", "FS"])
+        self.assertIsInstance(selected["HR"].dtype, pandas.SparseDtype)
+        numpy.testing.assert_array_equal(
+            selected["HR"].sparse.to_dense(), dense["HR"].to_numpy()
+        )
+        self.assertTrue(selected["not found"].isna().all())
+        self.assertEqual(self.table.counts()["EF"], 3)
+
+
+class ReplicateStoreTest(unittest.TestCase):
+    def random_store(self, cells=300, seed=0):
+        # cells of 1 to 6 values, some values not numbers
+        rng = numpy.random.default_rng(seed)
+        counts = rng.integers(1, 7, cells)
+        values = rng.normal(10, 3, counts.sum())
+        values[rng.random(values.size) < 0.1] = numpy.nan
+        return vdeh_series.ReplicateStore(
+            ["a", "b", "c"],
+            rng.integers(0, 100, cells).astype("int32"),
+            rng.integers(0, 3, cells).astype("int32"),
+            numpy.concatenate([[0], numpy.cumsum(counts)]).astype("int64"),
+            values,
+        )
+
+    def assertStatsMatchGroupby(self, store):
+        stats = store.stats()
+        long = store.long()
+        # one group per cell, cells may share series and measurement
+        long["cell"] = numpy.repeat(numpy.arange(len(store)), store.counts())
+        expected = long.groupby("cell")["value"].agg(
+            ["count", "mean", "std", "min", "max"]
+        )
+        self.assertEqual(len(stats), len(store))
+        numpy.testing.assert_array_equal(stats["N"], expected["count"])
+        numpy.testing.assert_allclose(stats["Mean"], expected["mean"], rtol=1e-12)
+        numpy.testing.assert_allclose(stats["SD"], expected["std"], rtol=1e-9)
+        numpy.testing.assert_allclose(
+            stats["CV (%)"], 100 * expected["std"] / expected["mean"].abs(), rtol=1e-9
+        )
+        numpy.testing.assert_array_equal(stats["Min"], expected["min"])
+        numpy.testing.assert_array_equal(stats["Max"], expected["max"])
+        numpy.testing.assert_array_equal(
+            long.groupby("cell")["replicate"].max(), store.counts()
+        )
+
+    def test_stats_match_groupby(self):
+        self.assertStatsMatchGroupby(self.random_store())
+        table = vdeh_series.SeriesTable.from_reports(report_dicts(), MEASUREMENTS)
+        self.assertStatsMatchGroupby(table.replicates)
+
+    def test_replicate_summary(self):
+        table = vdeh_series.SeriesTable.from_reports(report_dicts(), MEASUREMENTS)
+        summary = table.replicate_summary()
+        self.assertEqual(
+            list(summary["Series Date"]), ["1/2/2024", "1/3/2024", "2/2/2024"]
+        )
+        self.assertEqual(list(summary["N"]), [3, 3, 1])
+        self.assertTrue(numpy.isnan(summary["SD"].iloc[2]))
+        values = table.replicate_values()
+        self.assertEqual(values.shape[0], 8)
+        self.assertEqual(list(values["replicate"][:3]), [1, 2, 3])
+
+    def test_empty_store(self):
+        table = vdeh_series.SeriesTable.from_reports(
+            [{"S": {"Series Name": "S", "EF": 1.0}}], ["EF"]
+        )
+        self.assertEqual(table.replicate_summary().shape[0], 0)
+        self.assertEqual(table.replicate_values().shape[0], 0)
+
+
+def animal_frame():
+    # series of 4 animals in no particular order, some without an Animal ID
+    # or with a Series Date that is not a date
+    return pandas.DataFrame(
+        {
+            "Animal ID": ["M2", None, "M1", numpy.nan, "M1", 7, "M2", "M1", "M3"],
+            "Series Date": [
+                "3/1/2024",
+                "1/1/2024",
+                "2/15/2024",
+                "1/2/2024",
+                "1/1/2024",
+                "1/5/2024",
+                "1/10/2024",
+                "not a date",
+                "4/1/2024",
+            ],
+            "EF": [60.0, 1.0, 52.0, 2.0, 50.0, 40.0, "ERROR_NA", 99.0, numpy.nan],
+            "HR": [400.0, 1.0, 420.0, 2.0, 410.0, 380.0, 430.0, 99.0, 450.0],
+        }
+    )
+
+
+def reference_summary(df, columns):
+    # per animal loop over the date sorted series with a value
+    df = df.assign(Date=pandas.to_datetime(df["Series Date"], errors="coerce"))
+    df = df[df["Animal ID"].notna() & df["Date"].notna()]
+    rows = []
+    for animal, group in sorted(df.groupby(df["Animal ID"].astype(str))):
+        group = group.sort_values("Date", kind="stable")
+        for c in columns:
+            values = pandas.to_numeric(group[c], errors="coerce")
+            dates = group["Date"][values.notna()]
+            values = values.dropna()
+            if values.empty:
+                continue
+            days = (dates - group["Date"].iloc[0]) / pandas.Timedelta(days=1)
+            slope = (
+                numpy.polyfit(days, values, 1)[0]
+                if len(values) > 1 and days.nunique() > 1
+                else numpy.nan
+            )
+            change = values.iloc[-1] - values.iloc[0]
+            rows.append(
+                [animal, c, len(values), dates.iloc[0], dates.iloc[-1]]
+                + [values.iloc[0], values.iloc[-1], change]
+                + [100 * change / abs(values.iloc[0]), slope]
+            )
+    return pandas.DataFrame(
+        rows,
+        columns=["Animal ID", "Measurement", "N", "First Date", "Last Date"]
+        + ["First", "Last", "Change", "Change (%)", "Slope (per day)"],
+    )
+
+
+class AnimalIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.df = animal_frame()
+        self.index = vdeh_series.AnimalIndex.from_frame(self.df)
+
+    def test_missing_animal_ids(self):
+        self.assertEqual(list(self.index.animals), ["7", "M1", "M2", "M3"])
+        self.assertEqual(len(self.index), 4)
+        self.assertNotIn("nan", self.index)
+        self.assertNotIn("None", self.index)
+        self.assertIn(7, self.index)
+        self.assertEqual(len(self.index.rows("nan")), 0)
+        self.assertEqual(self.index.offsets[-1], 6)
+
+    def test_rows_and_trajectory(self):
+        expected = {"7": [5], "M1": [4, 2], "M2": [6, 0], "M3": [8]}
+        for animal, rows in expected.items():
+            self.assertEqual(list(self.index.rows(animal)), rows, animal)
+            pandas.testing.assert_frame_equal(
+                self.index.trajectory(self.df, animal), self.df.iloc[rows]
+            )
+        pandas.testing.assert_frame_equal(
+            self.index.trajectory(self.df, "M1", ["HR"]),
+            self.df.iloc[[4, 2]][["Series Date", "HR"]],
+        )
+
+    def test_longitudinal_summary(self):
+        summary = self.index.longitudinal_summary(self.df, ["EF", "HR"])
+        expected = reference_summary(self.df, ["EF", "HR"])
+        self.assertEqual(len(summary), 7)
+        pandas.testing.assert_frame_equal(
+            summary, expected, check_dtype=False, check_datetimelike_compat=True
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+VDEH service tests
+
+run with python -m unittest (or pytest) from the src directory
+"""
+
+__component_version__ = "1.0"
+__license__ = "MIT License"
+
+# %% import modules/libraries
+import json
+import multiprocessing
+import os
+import stat
+import tempfile
+import threading
+import unittest
+import urllib.error
+import urllib.request
+
+from vdeh.gui import vdeh_logging, vdeh_service
+
+# %% define tests
+
+
+class ServiceRequestTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.token_dir = tempfile.TemporaryDirectory()
+        cls.server, cls.token = vdeh_service.VDEH_Service().make_server(
+            0, token_dir=cls.token_dir.name
+        )
+        cls.port = cls.server.server_address[1]
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls.token_dir.cleanup()
+
+    def post(self, body, headers):
+        request = urllib.request.Request(
+            f"http://127.0.0.1:{self.port}/jobs",
+            data=body,
+            headers=headers,
+            method="POST",
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response:
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+    def test_token_file_is_private(self):
+        path = vdeh_service.token_path(self.port, self.token_dir.name)
+        self.assertEqual(
+            vdeh_service.read_token(self.port, self.token_dir.name), self.token
+        )
+        if os.name == "posix":
+            self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o600)
+
+    def test_text_plain_post_is_refused(self):
+        # what a web page can send cross-origin without a preflight
+        status = self.post(
+            json.dumps({"inputs": ["x"], "output": "y"}).encode(),
+            {"Content-Type": "text/plain", vdeh_service.TOKEN_HEADER: self.token},
+        )
+        self.assertEqual(status, 415)
+
+    def test_cross_origin_post_is_refused(self):
+        status = self.post(
+            b"{}",
+            {
+                "Content-Type": "application/json",
+                "Origin": "http://example.com",
+                vdeh_service.TOKEN_HEADER: self.token,
+            },
+        )
+        self.assertEqual(status, 403)
+
+    def test_post_without_token_is_refused(self):
+        for headers in [
+            {"Content-Type": "application/json"},
+            {"Content-Type": "application/json", vdeh_service.TOKEN_HEADER: "0"},
+        ]:
+            self.assertEqual(self.post(b"{}", headers), 403)
+
+    def test_client_job_is_run(self):
+        # a job without inputs is run and reports its error in the log
+        response = vdeh_service.submit_job(
+            {}, self.port, timeout=10, token_dir=self.token_dir.name
+        )
+        self.assertEqual(response["status"], 1)
+        self.assertIn("jobs require input reports", response["log"][0][1])
+
+
+class JobLoggerTest(unittest.TestCase):
+    def test_worker_pools_log_through_the_service_queue(self):
+        queue = multiprocessing.Queue()
+        job_logger = vdeh_service.JobLogger(vdeh_logging.QueueLogger(queue))
+        self.assertIs(job_logger.queue, queue)
+        self.assertEqual(vdeh_logging.pool_options(job_logger)["initargs"], (queue,))
+        self.assertEqual(vdeh_logging.pool_options(vdeh_service.JobLogger()), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
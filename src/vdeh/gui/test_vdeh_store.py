@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+VDEH store tests
+
+run with python -m unittest (or pytest) from the src directory
+"""
+
+__component_version__ = "1.0"
+__license__ = "MIT License"
+
+# %% import modules/libraries
+import unittest
+
+import pandas
+
+from vdeh.gui import vdeh_store
+
+# %% define tests
+
+COLUMN_NAMES = {"VevoLab Measurement_Mode_Parameter or Calculation": ["EF", "FS"]}
+STUDY_DF = pandas.DataFrame({"Study ID": ["S1"], "Study Name": ["study"]})
+
+
+def series_frame(**columns):
+    df = pandas.DataFrame(
+        {
+            "Study ID": ["S1", "S1"],
+            "Series Name": ["Series 1", "Series 2"],
+            "Animal ID": ["M1", "M2"],
+            "Series Date": ["2024-01-01 10:00", "2024-01-02 10:00"],
+        }
+    )
+    for k, v in columns.items():
+        df[k] = v
+    return df
+
+
+class UpsertTest(unittest.TestCase):
+    def setUp(self):
+        self.conn = vdeh_store.open_store(":memory:")
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_reupsert_replaces_series(self):
+        vdeh_store.upsert_collected_data(
+            self.conn,
+            COLUMN_NAMES,
+            series_frame(EF=[50.0, 60.0], FS=[25.0, 30.0], Operator=["a", "b"]),
+            STUDY_DF,
+        )
+        # the re-exported report dropped FS of Series 1 and every Operator
+        vdeh_store.upsert_collected_data(
+            self.conn,
+            COLUMN_NAMES,
+            series_frame(EF=[55.0, 60.0], FS=[None, 31.0]),
+            STUDY_DF,
+        )
+        report = vdeh_store.select_report(self.conn).set_index("Series Name")
+        self.assertEqual(report.loc["Series 1", "EF"], 55.0)
+        self.assertTrue(pandas.isna(report.loc["Series 1", "FS"]))
+        self.assertEqual(report.loc["Series 2", "FS"], 31.0)
+        self.assertNotIn("Operator", report.columns)
+        self.assertEqual(
+            self.conn.execute("SELECT COUNT(*) FROM series").fetchone()[0], 2
+        )
+
+    def test_other_studies_are_kept(self):
+        vdeh_store.upsert_collected_data(
+            self.conn, COLUMN_NAMES, series_frame(EF=[50.0, 60.0]), STUDY_DF
+        )
+        other = series_frame(EF=[70.0, 80.0])
+        other["Study ID"] = "S2"
+        vdeh_store.upsert_collected_data(self.conn, COLUMN_NAMES, other, STUDY_DF)
+        report = vdeh_store.select_report(self.conn)
+        self.assertEqual(report.shape[0], 4)
+        self.assertEqual(sorted(report["EF"]), [50.0, 60.0, 70.0, 80.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
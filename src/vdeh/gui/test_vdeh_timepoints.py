@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+VDEH timepoint matching tests
+
+run with python -m unittest (or pytest) from the src directory
+"""
+
+__component_version__ = "1.0"
+__license__ = "MIT License"
+
+# %% import modules/libraries
+import unittest
+
+import numpy
+import pandas
+
+from vdeh.gui import vdeh_model
+
+# %% define tests
+
+
+def matched_timepoints(timepoint_data, series_dates, animal_ids=None):
+    rows, matched = vdeh_model.match_timepoints(
+        pandas.DataFrame(timepoint_data),
+        [pandas.Timestamp(d) for d in series_dates],
+        animal_ids,
+    )
+    return [t if m else None for t, m in zip(rows["timepoint"], matched)]
+
+
+class MatchTimepointsTest(unittest.TestCase):
+    def test_dates(self):
+        self.assertEqual(
+            matched_timepoints(
+                {"timepoint": ["T0", "T1"], "date": ["2024-01-01", "2024-01-08"]},
+                ["2024-01-01 09:30", "2024-01-08 23:59", "2024-01-09"],
+            ),
+            ["T0", "T1", None],
+        )
+
+    def test_overlapping_windows(self):
+        # B lies inside A - series outside B but inside A still match A
+        timepoints = {
+            "timepoint": ["A", "B"],
+            "start": ["2024-01-01", "2024-01-05"],
+            "end": ["2024-01-10", "2024-01-06"],
+        }
+        self.assertEqual(
+            matched_timepoints(
+                timepoints,
+                ["2024-01-07", "2024-01-02", "2024-01-05 08:00", "2024-01-10 18:00"],
+            ),
+            ["A", "A", "B", "A"],
+        )
+
+    def test_mixed_tolerances(self):
+        # B is nearer to 01-10 but too narrow, A covers it
+        timepoints = {
+            "timepoint": ["A", "B"],
+            "date": ["2024-01-01", "2024-01-14"],
+            vdeh_model.TIMEPOINT_TOLERANCE: [15, 1],
+        }
+        self.assertEqual(
+            matched_timepoints(
+                timepoints, ["2024-01-10", "2024-01-13", "2024-01-20", "2024-01-16"]
+            ),
+            ["A", "B", None, "A"],
+        )
+
+    def test_open_ended_window(self):
+        timepoints = {
+            "timepoint": ["baseline", "followup"],
+            "end": ["2024-01-03", None],
+            "start": [None, "2024-02-01"],
+        }
+        self.assertEqual(
+            matched_timepoints(timepoints, ["2023-06-01", "2024-01-20", "2025-01-01"]),
+            ["baseline", None, "followup"],
+        )
+
+    def test_animal_rows_take_precedence(self):
+        timepoints = {
+            "timepoint": ["shared", "M1 only", "M2 only"],
+            "date": ["2024-01-05", "2024-01-06", "2024-01-20"],
+            vdeh_model.TIMEPOINT_TOLERANCE: [3, 3, 1],
+            "Animal ID": [None, "M1", "M2"],
+        }
+        self.assertEqual(
+            matched_timepoints(
+                timepoints,
+                ["2024-01-05", "2024-01-05", "2024-01-05", "2024-01-20"],
+                ["M1", "M2", "M3", "M1"],
+            ),
+            ["M1 only", "shared", "shared", None],
+        )
+
+    def test_many_series(self):
+        # the sorted lookup gives the same matches as comparing each series
+        # with every row - nested, overlapping and animal specific windows
+        rng = numpy.random.default_rng(0)
+        n = 500
+        dates = pandas.Timestamp("2024-01-01") + pandas.to_timedelta(
+            rng.integers(-5 * 24 * 3600, 70 * 24 * 3600, n), unit="s"
+        )
+        animal_ids = rng.choice(["M1", "M2", "M3", "M4"], n)
+        start = pandas.Timestamp("2024-01-01") + pandas.to_timedelta(
+            rng.integers(0, 60, 20), unit="D"
+        )
+        timepoints = pandas.DataFrame(
+            {
+                "timepoint": [f"T{i}" for i in range(40)],
+                "date": list(pandas.date_range("2024-01-01", periods=20, freq="3D"))
+                + [None] * 20,
+                vdeh_model.TIMEPOINT_TOLERANCE: list(rng.integers(0, 6, 20))
+                + [None] * 20,
+                "start": [None] * 20 + list(start),
+                "end": [None] * 20
+                + list(start + pandas.to_timedelta(rng.integers(0, 30, 20), "D")),
+                "Animal ID": rng.choice(["M1", "M2", None, None, None], 40),
+            }
+        )
+        timepoints.loc[[3, 25], ["start", "end"]] = [None, "2024-01-02"]
+        timepoints.loc[30, "end"] = None
+        self.assertEqual(
+            matched_timepoints(timepoints, dates, animal_ids),
+            reference_timepoints(timepoints, dates, animal_ids),
+        )
+        self.assertGreater(
+            len(set(matched_timepoints(timepoints, dates, animal_ids))), 20
+        )
+
+
+def reference_timepoints(timepoint_data, series_dates, animal_ids):
+    # one series at a time, all rows of each precedence tier
+    timepoints, windows = vdeh_model.timepoint_windows(timepoint_data)
+    usable = windows[["lo", "hi", "center"]].notna().all(axis=1)
+    result = []
+    for date, animal in zip(series_dates, animal_ids):
+        date = pandas.Timestamp(date)
+        choice = None
+        for tier in [
+            windows["window"] & (windows["animal"] == animal),
+            windows["nearest"] & (windows["animal"] == animal),
+            windows["window"] & (windows["animal"] == ""),
+            windows["nearest"] & (windows["animal"] == ""),
+        ]:
+            candidates = windows[
+                tier & usable & (windows["lo"] <= date) & (windows["hi"] > date)
+            ]
+            if candidates.shape[0]:
+                distance = (date - candidates["center"]).abs()
+                # float ns, unbounded windows would overflow a timedelta
+                width = candidates["hi"].astype("int64").astype(float)
+                width -= candidates["lo"].astype("int64").astype(float)
+                candidates = candidates.assign(distance=distance, width=width)
+                best = candidates.sort_values(["distance", "width"], kind="stable")
+                choice = timepoints.loc[best.index[0], "timepoint"]
+                break
+        result.append(choice)
+    return result
+
+
+if __name__ == "__main__":
+    unittest.main()
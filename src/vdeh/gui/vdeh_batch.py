@@ -0,0 +1,340 @@
+# -*- coding: utf-8 -*-
+"""
+VDEH_batch
+
+batch runner for manifests of extraction/analysis jobs - jobs run in a pool
+of worker processes and their status, timing and input fingerprint are kept
+in a state file next to the manifest, so a rerun skips jobs whose inputs and
+settings are unchanged since their last successful run (and picks up where a
+crashed run stopped)
+
+manifest formats
+    json : a list of jobs (or {"jobs": [...]}), each job is a dict with the
+        keys used by vdeh_service.run_job plus an optional "name"
+    csv : one job per row with a column per job key (name, inputs, output,
+        settings, store, wide, sparse, replicates, longitudinal, scan,
+        formats, duplicates, parse_workers, prefetch, checkpoint, plot_cache,
+        plot_cache_size, resamples, seed, resample_workers, out_of_core,
+        chunk_size, from_stage, validate, validate_only) and query, animal,
+        measure, start, end for store queries - multiple inputs, formats,
+        animals and measures are separated by ';', empty cells keep the
+        run_job default
+"""
+
+__component_version__ = "1.0"
+__license__ = "MIT License"
+
+# %% import modules/libraries
+import concurrent.futures
+import csv
+import datetime
+import hashlib
+import json
+import os
+import time
+import traceback
+
+from . import vdeh_logging, vdeh_model, vdeh_service
+
+# %% define functions
+
+TRUE_VALUES = {"1", "true", "yes", "y", "x"}
+
+# csv manifest columns converted to the type of the matching json job key
+INT_COLUMNS = [
+    "parse_workers",
+    "prefetch",
+    "resamples",
+    "seed",
+    "resample_workers",
+    "chunk_size",
+]
+FLOAT_COLUMNS = ["plot_cache_size"]
+TEXT_COLUMNS = ["checkpoint", "plot_cache", "out_of_core", "from_stage"]
+FLAG_COLUMNS = ["validate", "validate_only"]
+
+# job keys holding paths, relative paths are taken relative to the manifest
+PATH_KEYS = ["output", "settings", "store", "checkpoint", "plot_cache", "out_of_core"]
+
+
+def split_cell(value):
+    return [v.strip() for v in value.split(";") if v.strip()]
+
+
+def read_manifest(manifest_path):
+    """
+    Parameters
+    ----------
+    manifest_path : string
+        path to a json or csv manifest
+
+    Returns
+    -------
+    jobs : list of dicts
+        jobs with absolute paths (relative paths in the manifest are taken
+        relative to the manifest) and a unique name
+
+    """
+    base = os.path.dirname(os.path.abspath(manifest_path))
+
+    if os.path.splitext(manifest_path)[1].lower() == ".csv":
+        with open(manifest_path, newline="") as f:
+            rows = list(csv.DictReader(f))
+        jobs = []
+        for row in rows:
+            row = {k.strip().lower(): (v or "").strip() for k, v in row.items() if k}
+            job = {
+                "name": row.get("name", ""),
+                "inputs": [p.strip() for p in row.get("inputs", "").split(";")],
+                "output": row.get("output", ""),
+                "settings": row.get("settings", ""),
+                "store": row.get("store", ""),
+                "wide": row.get("wide", "").lower() in TRUE_VALUES,
+                "sparse": row.get("sparse", "").lower() in TRUE_VALUES,
+                "replicates": row.get("replicates", "").lower() in TRUE_VALUES,
+                "longitudinal": row.get("longitudinal", "").lower() in TRUE_VALUES,
+                "scan": row.get("scan", "").lower() in TRUE_VALUES,
+                "duplicates": row.get("duplicates", "") or "keep-first",
+                "formats": [
+                    f.strip().lower()
+                    for f in row.get("formats", "").split(";")
+                    if f.strip()
+                ],
+            }
+            for k in INT_COLUMNS:
+                if row.get(k):
+                    job[k] = int(row[k])
+            for k in FLOAT_COLUMNS:
+                if row.get(k):
+                    job[k] = float(row[k])
+            for k in TEXT_COLUMNS:
+                if row.get(k):
+                    job[k] = row[k]
+            for k in FLAG_COLUMNS:
+                if row.get(k):
+                    job[k] = row[k].lower() in TRUE_VALUES
+            if row.get("query", "").lower() in TRUE_VALUES:
+                job["query"] = {
+                    "animal": split_cell(row.get("animal", "")) or None,
+                    "measure": split_cell(row.get("measure", "")) or None,
+                    "start": row.get("start") or None,
+                    "end": row.get("end") or None,
+                }
+            jobs.append(job)
+    else:
+        with open(manifest_path) as f:
+            jobs = json.load(f)
+        if isinstance(jobs, dict):
+            jobs = jobs["jobs"]
+
+    def absolute(path):
+        return os.path.normpath(os.path.join(base, path)) if path else str()
+
+    names = set()
+    for i, job in enumerate(jobs):
+        if isinstance(job.get("inputs"), str):
+            job["inputs"] = [job["inputs"]]
+        job["inputs"] = [absolute(p) for p in job.get("inputs") or [] if p]
+        for k in PATH_KEYS:
+            job[k] = absolute(job.get(k))
+        name = job.get("name") or job["output"] or f"job {i + 1}"
+        if name in names:
+            name = f"{name} ({i + 1})"
+        names.add(name)
+        job["name"] = name
+
+    return jobs
+
+
+def job_fingerprint(job):
+    """
+    hash of the job options and the current version of every input report
+    and the settings file - changes if any of them change
+    """
+    h = hashlib.sha256()
+    options = {k: v for k, v in job.items() if k not in ["name", "inputs"]}
+    h.update(json.dumps(options, sort_keys=True, default=str).encode())
+    paths = vdeh_model.expand_report_paths(job.get("inputs") or [])
+    if job.get("settings"):
+        paths.append(job["settings"])
+    for p in paths:
+        try:
+            h.update(repr(vdeh_model.file_fingerprint(p)).encode())
+        except OSError:
+            h.update(f"missing {p}".encode())
+    return h.hexdigest()
+
+
+def load_state(state_path):
+    if state_path and os.path.exists(state_path):
+        with open(state_path) as f:
+            return json.load(f)
+    return {}
+
+
+def save_state(state, state_path):
+    # write to a temporary file and swap it in so a crash never leaves a
+    # partially written state file
+    temp_path = state_path + ".tmp"
+    with open(temp_path, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(temp_path, state_path)
+
+
+def run_batch_job(job, version_info=None):
+    """
+    run a single job in a worker process, returns status, seconds and the log
+    messages of the job - messages are also passed on to the batch logger as
+    they are logged (if the pool was started with vdeh_logging.pool_options)
+    """
+    job_logger = vdeh_service.JobLogger(vdeh_logging.worker_logger)
+    start = time.perf_counter()
+    model = vdeh_model.vdeh_model()
+    model.logger = job_logger
+    model.version_info = version_info or {}
+    try:
+        status = vdeh_service.run_job(job, model)
+    except Exception as e:
+        job_logger.log("error", f"Unable to run job: {e}")
+        job_logger.log("error", traceback.format_exc())
+        status = 1
+    return {
+        "status": status,
+        "seconds": time.perf_counter() - start,
+        "log": job_logger.messages,
+    }
+
+
+def share_workers(jobs, workers, logger=None):
+    """
+    split the worker budget between the jobs running at once - the parse and
+    resample workers of each job are limited to its share, so a batch never
+    runs more than workers processes. Returns the limited jobs and the number
+    of jobs to run at once
+    """
+    concurrent_jobs = min(workers, max(len(jobs), 1))
+    job_workers = max(1, workers // concurrent_jobs)
+    limited_jobs = []
+    for job in jobs:
+        limited = {
+            k: min(int(job.get(k) or 1), job_workers)
+            for k in ["parse_workers", "resample_workers"]
+        }
+        if any(int(job.get(k) or 1) != v for k, v in limited.items()) and logger:
+            logger.log(
+                "debug",
+                f"job {job['name']} limited to {job_workers} parse/resample workers",
+            )
+        limited_jobs.append(dict(job, **limited))
+    return limited_jobs, concurrent_jobs
+
+
+def run_batch(
+    manifest_path,
+    workers=None,
+    state_path=None,
+    force=False,
+    logger=None,
+    version_info=None,
+):
+    """
+    Parameters
+    ----------
+    manifest_path : string
+        path to a json or csv manifest of jobs
+    workers : int, optional
+        number of worker processes, default is the number of cpus - shared
+        by all jobs, the parse and resample workers of each job are limited
+        to its share
+    state_path : string, optional
+        path of the state file, default is the manifest path + '.state.json'
+    force : bool, optional
+        run every job even if it is unchanged since its last successful run
+    logger : VDEH_Logger, optional
+    version_info : dict, optional
+        version information saved with each job's output
+
+    Returns
+    -------
+    int
+        number of failed jobs
+
+    """
+    jobs = read_manifest(manifest_path)
+    state_path = state_path or manifest_path + ".state.json"
+    state = load_state(state_path)
+    workers = workers or os.cpu_count() or 1
+
+    pending = []
+    for job in jobs:
+        fingerprint = job_fingerprint(job)
+        previous = state.get(job["name"], {})
+        if (
+            not force
+            and previous.get("status") == "done"
+            and previous.get("fingerprint") == fingerprint
+            and os.path.exists(job["output"])
+        ):
+            if logger:
+                logger.log("info", f"skipping unchanged job - {job['name']}")
+            continue
+        state[job["name"]] = {"status": "pending", "fingerprint": fingerprint}
+        pending.append(job)
+    save_state(state, state_path)
+
+    pending, concurrent_jobs = share_workers(pending, workers, logger)
+
+    if logger:
+        logger.log(
+            "info",
+            f"running {len(pending)} of {len(jobs)} jobs with "
+            + f"{concurrent_jobs} workers",
+        )
+
+    failed = 0
+    start = time.perf_counter()
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=concurrent_jobs, **vdeh_logging.pool_options(logger)
+    ) as executor:
+        futures = {
+            executor.submit(run_batch_job, job, version_info): job for job in pending
+        }
+        for future in concurrent.futures.as_completed(futures):
+            job = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                # the worker process itself failed (e.g. ran out of memory)
+                result = {"status": 1, "seconds": None, "log": [["error", str(e)]]}
+            ok = result["status"] == 0
+            failed += not ok
+            state[job["name"]].update(
+                {
+                    "status": "done" if ok else "failed",
+                    "seconds": result["seconds"],
+                    "finished": datetime.datetime.now().isoformat(timespec="seconds"),
+                    "errors": [
+                        m
+                        for level, m in result["log"]
+                        if level == "error" and not m.startswith("Traceback")
+                    ],
+                }
+            )
+            # record progress after every job so an interrupted batch resumes
+            save_state(state, state_path)
+            if logger:
+                logger.log(
+                    "info" if ok else "error",
+                    f"{'finished' if ok else 'failed'} job - {job['name']}"
+                    + (f" ({result['seconds']:.1f} s)" if result["seconds"] else ""),
+                )
+
+    if logger:
+        logger.log(
+            "info",
+            f"batch complete in {time.perf_counter() - start:.1f} s - "
+            + f"{len(pending) - failed} done, {failed} failed, "
+            + f"{len(jobs) - len(pending)} skipped",
+        )
+
+    return failed
@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+"""
+VDEH_chunked
+
+out-of-core building blocks - series rows are written to disk in parquet
+chunks as they are parsed (see vdeh_model.spill_reports) and only the
+sufficient statistics of every factor cell (count, mean and sum of squared
+deviations of each outcome measure) are kept in memory. Cell statistics of
+chunks are merged with Chan's parallel form of Welford's update, which is
+exact and does not depend on how the rows were split into chunks. The group
+summary (N, mean, variance, SD, SEM) and the factorial ANOVA are computed
+from the cell statistics alone
+"""
+
+__component_version__ = "1.0"
+__license__ = "MIT License"
+
+# %% import modules/libraries
+import glob
+import itertools
+import os
+
+import numpy
+import pandas
+
+# %% define functions
+
+# series per spilled chunk
+CHUNK_SERIES = 5000
+CHUNK_PATTERN = "chunk_{:05d}.parquet"
+
+
+def chunk_paths(spill_dir):
+    """
+    spilled chunks of spill_dir in the order they were written
+    """
+    return sorted(glob.glob(os.path.join(spill_dir, "chunk_*.parquet")))
+
+
+def clear_chunks(spill_dir):
+    """
+    remove the chunks of an earlier run from spill_dir (other files are kept)
+    """
+    for path in chunk_paths(spill_dir):
+        os.remove(path)
+
+
+def write_chunk(df, spill_dir, number):
+    """
+    write one chunk of series rows (a columnar_frame) to spill_dir, returns
+    the chunk path
+    """
+    os.makedirs(spill_dir, exist_ok=True)
+    path = os.path.join(spill_dir, CHUNK_PATTERN.format(number))
+    df.to_parquet(path, index=False)
+    return path
+
+
+def read_chunks(spill_dir, columns=None):
+    """
+    yield the spilled chunks of spill_dir one at a time (only columns, if
+    given) - chunks are read separately, as a column can be numeric in one
+    chunk and text in another
+    """
+    for path in chunk_paths(spill_dir):
+        yield pandas.read_parquet(path, columns=columns)
+
+
+def _effect_columns(codes, levels):
+    # sum to zero (effect) coding of one factor, one column per level but the
+    # last, which is -1 in every column
+    columns = numpy.zeros((len(codes), max(levels - 1, 0)))
+    for i in range(levels - 1):
+        columns[codes == i, i] = 1
+        columns[codes == levels - 1, i] = -1
+    return columns
+
+
+def _weighted_rss(X, y, w):
+    # residual sum of squares and rank of the weighted least squares fit
+    sw = numpy.sqrt(w)
+    Xw = X * sw[:, None]
+    yw = y * sw
+    beta, _, rank, _ = numpy.linalg.lstsq(Xw, yw, rcond=None)
+    residual = yw - Xw @ beta
+    return float(residual @ residual), int(rank)
+
+
+def cell_anova(cells, n, mean, m2, ss_type=3):
+    """
+    factorial between subjects ANOVA of one outcome measure from the
+    statistics of its factor cells - the fitted values of any model of the
+    factors are constant within a cell, so the residual sum of squares of a
+    model is the within cell M2 plus the n weighted residuals of the cell
+    means
+
+    Parameters
+    ----------
+    cells : pandas.DataFrame
+        factor levels of each cell (one column per factor)
+    n, mean, m2 : numpy.ndarray
+        count, mean and sum of squared deviations of each cell
+    ss_type : int, optional
+        type of the sums of squares (1, 2 or 3), effect coding is used
+
+    Returns
+    -------
+    pandas.DataFrame
+        Source, SS, DF, MS, F, p-unc and np2 of every term (interactions as
+        'A * B') and the Residual
+
+    """
+    from scipy import stats
+
+    n = numpy.asarray(n, dtype="float64")
+    keep = n > 0
+    cells = cells[keep].reset_index(drop=True)
+    n, mean, m2 = n[keep], numpy.asarray(mean)[keep], numpy.asarray(m2)[keep]
+    factors = list(cells.columns)
+
+    coded = {}
+    for f in factors:
+        codes, levels = pandas.factorize(cells[f])
+        coded[f] = _effect_columns(codes, len(levels))
+
+    terms = [
+        t for k in range(len(factors)) for t in itertools.combinations(factors, k + 1)
+    ]
+    term_columns = {}
+    for t in terms:
+        columns = numpy.ones((len(cells), 1))
+        for f in t:
+            # row wise products of the columns of every factor of the term
+            columns = (columns[:, :, None] * coded[f][:, None, :]).reshape(
+                len(cells), -1
+            )
+        term_columns[t] = columns
+
+    def rss(included):
+        X = numpy.hstack(
+            [numpy.ones((len(cells), 1))] + [term_columns[t] for t in included]
+        )
+        return _weighted_rss(X, mean, n)
+
+    full_rss, full_rank = rss(terms)
+    residual_ss = float(m2.sum()) + full_rss
+    residual_df = n.sum() - full_rank
+
+    rows = []
+    for i, t in enumerate(terms):
+        if ss_type == 1:
+            reduced = terms[:i]
+        elif ss_type == 2:
+            # terms that do not contain t
+            reduced = [u for u in terms if not set(t) <= set(u)]
+        else:
+            reduced = [u for u in terms if u != t]
+        reduced_rss, reduced_rank = rss(reduced)
+        with_rss, with_rank = rss(reduced + [t])
+        ss = max(reduced_rss - with_rss, 0.0)
+        df = with_rank - reduced_rank
+        rows.append([" * ".join(t), ss, df])
+
+    table = pandas.DataFrame(rows, columns=["Source", "SS", "DF"])
+    with numpy.errstate(invalid="ignore", divide="ignore"):
+        table["MS"] = table["SS"] / table["DF"]
+        residual_ms = residual_ss / residual_df if residual_df > 0 else numpy.nan
+        table["F"] = table["MS"] / residual_ms
+        table["p-unc"] = stats.f.sf(table["F"], table["DF"], residual_df)
+        table["np2"] = table["SS"] / (table["SS"] + residual_ss)
+    table.loc[len(table)] = [
+        "Residual",
+        residual_ss,
+        residual_df,
+        residual_ms,
+        numpy.nan,
+        numpy.nan,
+        numpy.nan,
+    ]
+    return table
+
+
+# %% define classes
+
+
+class GroupAccumulator:
+    """
+    count, mean and sum of squared deviations (M2) of the outcome measures in
+    every cell of the factors - each chunk is summarized with one groupby and
+    merged into the running statistics (Chan et al.), so memory only grows
+    with the number of cells. Accumulators of separate runs (e.g. workers)
+    are combined with merge
+    """
+
+    def __init__(self, factors, outcomes):
+        self.factors = list(factors)
+        self.outcomes = list(outcomes)
+        self.rows = 0
+        self.n = self.mean = self.m2 = None
+
+    def __len__(self):
+        return 0 if self.n is None else len(self.n)
+
+    def update(self, df):
+        """
+        add the rows of df (outcome and factor columns) - values that are not
+        numbers and rows with a missing factor are left out
+        """
+        values = (
+            df.reindex(columns=self.outcomes)
+            .apply(pandas.to_numeric, errors="coerce")
+            .astype("float64")
+        )
+        grouped = values.groupby([df[f] for f in self.factors], dropna=True)
+        n = grouped.count()
+        mean = grouped.mean().fillna(0.0)
+        m2 = (grouped.var(ddof=0) * n).fillna(0.0)
+        self._combine(n, mean, m2)
+        self.rows += len(df)
+
+    def merge(self, other):
+        """
+        add the statistics of another accumulator of the same factors
+        """
+        if other.n is not None:
+            self._combine(other.n, other.mean, other.m2)
+        self.rows += other.rows
+
+    def _combine(self, n, mean, m2):
+        if self.n is None:
+            self.n, self.mean, self.m2 = n, mean, m2
+            return
+        index = self.n.index.union(n.index)
+        na = self.n.reindex(index, fill_value=0)
+        nb = n.reindex(index, fill_value=0)
+        delta = mean.reindex(index, fill_value=0.0) - self.mean.reindex(
+            index, fill_value=0.0
+        )
+        total = na + nb
+        with numpy.errstate(invalid="ignore", divide="ignore"):
+            weight = (nb / total).fillna(0.0)
+        self.mean = self.mean.reindex(index, fill_value=0.0) + delta * weight
+        self.m2 = (
+            self.m2.reindex(index, fill_value=0.0)
+            + m2.reindex(index, fill_value=0.0)
+            + delta**2 * na * weight
+        )
+        self.n = total
+
+    def cells(self, outcome):
+        """
+        (factor levels, n, mean, m2) of the cells with values of outcome
+        """
+        n = self.n[outcome]
+        keep = (n > 0).to_numpy()
+        cells = self.n.index.to_frame(index=False)[keep].reset_index(drop=True)
+        cells.columns = self.factors
+        return (
+            cells,
+            n.to_numpy()[keep],
+            self.mean[outcome].to_numpy()[keep],
+            self.m2[outcome].to_numpy()[keep],
+        )
+
+    def summary(self, outcomes=None):
+        """
+        Returns
+        -------
+        pandas.DataFrame
+            one row per outcome measure and factor cell with N, mean,
+            variance, SD and SEM (sample variance, as pandas)
+
+        """
+        frames = []
+        for c in outcomes if outcomes is not None else self.outcomes:
+            if self.n is None or c not in self.n:
+                continue
+            cells, n, mean, m2 = self.cells(c)
+            with numpy.errstate(invalid="ignore", divide="ignore"):
+                variance = numpy.where(n > 1, m2 / (n - 1), numpy.nan)
+            cells["outcome_measure"] = c
+            cells["N"] = n.astype("int64")
+            cells["mean"] = mean
+            cells["variance"] = variance
+            cells["SD"] = numpy.sqrt(variance)
+            cells["SEM"] = numpy.sqrt(variance / n)
+            frames.append(cells)
+        if not frames:
+            return pandas.DataFrame(
+                columns=self.factors
+                + ["outcome_measure", "N", "mean", "variance", "SD", "SEM"]
+            )
+        return pandas.concat(frames, ignore_index=True)
+
+    def plot_frame(self, outcome):
+        """
+        mean, len and sem of each cell of outcome, as the summary plots of
+        vdeh_model.analyze_outcome expect them
+        """
+        summary = self.summary([outcome])
+        agg_df = summary[self.factors].copy()
+        agg_df["mean"] = summary["mean"]
+        agg_df["len"] = summary["N"]
+        agg_df["sem"] = summary["SEM"]
+        agg_df["axis"] = agg_df[self.factors].astype(str).agg("_".join, axis=1)
+        return agg_df
+
+    def anova(self, outcome, ss_type=3):
+        """
+        ANOVA table of outcome (see cell_anova)
+        """
+        cells, n, mean, m2 = self.cells(outcome)
+        table = cell_anova(cells, n, mean, m2, ss_type)
+        table["outcome_measure"] = outcome
+        return table
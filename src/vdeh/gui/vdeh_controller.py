@@ -9,22 +9,68 @@ __license__ = "MIT License"
 
 
 # %% import modules/libraries
-# from .vdeh_form import Ui_MainWindow
-from .vdeh_model import simple_export
+# the form is compiled ahead of time from vdeh_form_lite.ui, after editing the
+# .ui file regenerate it with: pyside6-uic vdeh_form_lite.ui -o vdeh_form_lite.py
+from .vdeh_form_lite import Ui_MainWindow
+from .vdeh_model import DuplicateSeriesError, write_settings_template
 
 # from PySide6 import uic
 from PySide6.QtWidgets import QFileDialog, QListWidgetItem, QMessageBox
 from PySide6.QtWidgets import QTextEdit, QMainWindow
+from PySide6.QtGui import QActionGroup
+from PySide6.QtCore import QObject, Signal, Slot
 
+from . import vdeh_logging
 
+
+import atexit
 import pandas
 import logging
+import logging.handlers
+import multiprocessing
 import sys
 import webbrowser
 
 
 # %%
-class VDEH_Logger:
+class GuiLogBridge(QObject):
+    # hands messages from the log listener thread to the status window, the
+    # signal is queued so the text edit is only touched in the gui thread
+    append = Signal(str)
+
+    def __init__(self, text_edit):
+        super().__init__(text_edit)
+        self.text_edit = text_edit
+        self.append.connect(self.write)
+
+    @Slot(str)
+    def write(self, html):
+        self.text_edit.insertHtml(html)
+        self.text_edit.verticalScrollBar().setValue(
+            self.text_edit.verticalScrollBar().maximum()
+        )
+
+
+class GuiLogHandler(logging.Handler):
+    def __init__(self, bridge, level):
+        super().__init__(level)
+        self.bridge = bridge
+
+    def emit(self, record):
+        self.bridge.append.emit(
+            vdeh_logging.gui_html(
+                record.levelno,
+                record.getMessage(),
+                getattr(record, "gui_color", None),
+                getattr(record, "gui_style", None),
+            )
+        )
+
+
+class VDEH_Logger(vdeh_logging.QueueLogger):
+    # messages of this process and of worker processes (see
+    # vdeh_logging.pool_options) go through one queue, a listener thread
+    # writes them to the console, the log file and the gui
     def __init__(
         self,
         gui_loglevel: int = logging.INFO,
@@ -33,19 +79,9 @@ class VDEH_Logger:
         log_file_path: str = None,
         gui_handler: QTextEdit = None,
         logname: str = __name__,
+        console_stream=None,
     ):
-
-        self.log_levels = {
-            "notset": 0,
-            "debug": 10,
-            "info": 20,
-            "warning": 30,
-            "error": 40,
-            "critical": 50,
-        }
-
-        self.logger = logging.getLogger(logname)
-        self.logger.setLevel(logging.DEBUG)
+        super().__init__(multiprocessing.Queue(), logname)
 
         self.gui_handler = gui_handler
         self.gui_loglevel = self.fix_level(gui_loglevel)
@@ -55,16 +91,28 @@ class VDEH_Logger:
             "%(asctime)s | %(name)s | %(levelname)s | %(message)s"
         )
 
-        console_handler = logging.StreamHandler(sys.stdout)
+        # console messages go to stderr when stdout carries streamed output
+        console_handler = logging.StreamHandler(console_stream or sys.stdout)
         console_handler.setLevel(console_loglevel)
         console_handler.setFormatter(log_format)
-        self.logger.addHandler(console_handler)
+        handlers = [console_handler]
 
         if log_file_path:
             file_handler = logging.FileHandler(log_file_path)
             file_handler.setLevel(file_loglevel)
             file_handler.setFormatter(log_format)
-            self.logger.addHandler(file_handler)
+            handlers.append(file_handler)
+
+        if gui_handler:
+            self.gui_bridge = GuiLogBridge(gui_handler)
+            handlers.append(GuiLogHandler(self.gui_bridge, self.gui_loglevel))
+
+        self.listener = logging.handlers.QueueListener(
+            self.queue, *handlers, respect_handler_level=True
+        )
+        self.listener.start()
+        # write out queued messages before the interpreter exits
+        atexit.register(self.close)
 
         # log initial inputs
         self.log("info", "VDEH Logger Started")
@@ -82,69 +130,23 @@ class VDEH_Logger:
 
         return level
 
-    def log(
-        self,
-        level,
-        message,
-        gui_message: str = None,
-        gui_color: str = None,
-        gui_style: str = None,
-    ):
-
-        if type(level) is not int:
-            if type(level) is not str:
-                old_level = level
-                message += f" |Abnormal log level provided: {old_level}|"
-                level = 40
-            elif level.lower() in self.log_levels:
-                level = self.log_levels[level.lower()]
-            else:
-                old_level = level
-                message += f" |Abnormal log level provided: {old_level}|"
-                level = 40
-        elif level not in self.log_levels.values():
-            old_level = level
-            message += f" |Abnormal log level provided: {old_level}|"
-            level = 40
-
-        self.logger.log(level, message)
-        if level >= self.gui_loglevel and self.gui_handler:
-            if not gui_color:
-                if level < 20:
-                    gui_color = "green"
-                elif level > 20:
-                    gui_color = "red"
-                else:
-                    gui_color = "black"
-            if not gui_style:
-                if level >= 40:
-                    gui_style = "strong"
-
-            self.gui_handler.insertHtml(
-                (
-                    f'<span style="color:{gui_color}"><{gui_style}>'
-                    + f"{message}"
-                    + f"</{gui_style}></span><br>"
-                )
-            )
-            self.gui_handler.verticalScrollBar().setValue(
-                self.gui_handler.verticalScrollBar().maximum()
-            )
+    def close(self):
+        # stop the listener once every queued message is written
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
 
 
 # %% define classes
-# class vdeh_main_window(Ui_MainWindow):
-class vdeh_main_window(QMainWindow):
-    def __init__(self, ui, model, loader):
+class vdeh_main_window(QMainWindow, Ui_MainWindow):
+    def __init__(self, model):
         super(vdeh_main_window, self).__init__()
 
-        self.ui = ui
+        # build the widgets from the compiled form, they are attributes of
+        # the window itself
+        self.setupUi(self)
 
-        # migrate ui children to parent level of class
-        for att, val in ui.__dict__.items():
-            setattr(self, att, val)
-
-        self.ui.setWindowTitle("VevoLab Data Extraction Helper")
+        self.setWindowTitle("VevoLab Data Extraction Helper")
 
         # self.setupUi(MainWindow)
         self.model = model
@@ -189,12 +191,36 @@ class vdeh_main_window(QMainWindow):
         # )
 
         self.pushButton_extract_data.clicked.connect(self.action_extract_data_and_save)
+        self.menu_Scan_Reports.triggered.connect(self.action_scan_reports)
+        self.menu_Check_Settings.triggered.connect(self.action_check_settings)
 
         # self.pushButton_extract_data_and_analyze.clicked.connect(
         #     self.action_extract_data_and_analyze
         # )
 
         # buttons for the help section
+        # options
+        self.menu_Wide_Export.toggled.connect(self.action_toggle_wide_export)
+        self.duplicate_actions = QActionGroup(self)
+        for action, policy in [
+            (self.menu_Duplicates_Keep_First, "keep-first"),
+            (self.menu_Duplicates_Keep_Last, "keep-last"),
+            (self.menu_Duplicates_Error, "error"),
+        ]:
+            self.duplicate_actions.addAction(action)
+            action.triggered.connect(
+                lambda checked, policy=policy: self.action_set_duplicate_policy(policy)
+            )
+        self.menu_Export_Parquet.toggled.connect(
+            lambda checked: self.action_toggle_export_format("parquet", checked)
+        )
+        self.menu_Export_Feather.toggled.connect(
+            lambda checked: self.action_toggle_export_format("feather", checked)
+        )
+        self.menu_Export_CSV.toggled.connect(
+            lambda checked: self.action_toggle_export_format("csv", checked)
+        )
+
         self.menu_User_Manual.triggered.connect(self.action_user_manual)
         self.menu_About.triggered.connect(self.action_about)
 
@@ -208,7 +234,8 @@ class vdeh_main_window(QMainWindow):
             None,
             "Select VevoLab Reports",
             "",
-            "All Files (*);;Text Files (*.txt);;CSV Files (*.csv)",
+            "All Files (*);;Text Files (*.txt);;CSV Files (*.csv);;"
+            + "Compressed Reports (*.gz *.bz2 *.xz *.zip)",
         )[0]
         # print(self.model.input_paths)
         self.listWidget_vevolab_files.clear()
@@ -225,6 +252,7 @@ class vdeh_main_window(QMainWindow):
     def action_clear_vevolab_files(self):
         self.model.input_paths = []
         self.model.model_data = pandas.DataFrame()
+        self.model.study_data = pandas.DataFrame()
         self.listWidget_vevolab_files.clear()
         self.pushButton_clear_vevolab_files.setHidden(True)
         self.logger.log("info", "VevoLab Report files cleared")
@@ -303,7 +331,7 @@ class vdeh_main_window(QMainWindow):
         self.logger.log("info", "Output location cleared")
 
     def action_extract_data(self):
-        self.model.check_data(self.model)
+        self.model.check_data()
         # print(self.model.column_names)
         # print(self.model.model_data)
 
@@ -315,17 +343,94 @@ class vdeh_main_window(QMainWindow):
         else:
             # print(self.model.column_names)
             # print(self.model.model_data)
-            self.model.check_data(self.model)
+            try:
+                self.model.check_data()
+            except DuplicateSeriesError as e:
+                self.logger.log("error", str(e))
+                return
 
-            simple_export(
-                {"simple_summary": self.model.model_data}, self.model.output_path
-            )
+            self.model.export_extracted_data()
             self.logger.log("info", "Finished Data Extraction", gui_style="strong")
 
+    def action_scan_reports(self):
+        if not self.model.input_paths:
+            self.logger.log("warning", "no VevoLab Report files selected")
+            return
+        template_path = QFileDialog.getSaveFileName(
+            None,
+            "Select filename for settings template",
+            "",
+            "Excel File (*.xlsx)",
+        )[0]
+        if not template_path:
+            return
+        self.model.scan_data()
+        write_settings_template(self.model.catalog, template_path, self.logger)
+
+    def action_check_settings(self):
+        # check a settings file against a header scan of the selected reports
+        # and list the problems found
+        if not self.model.input_paths:
+            self.logger.log("warning", "no VevoLab Report files selected")
+            return
+        settings_path = QFileDialog.getOpenFileName(
+            None,
+            "Select Metadata/Settings File",
+            "",
+            "Excel Files (*.xlsx);;All Files (*)",
+        )[0]
+        if not settings_path:
+            return
+        self.model.settings_path = settings_path
+        try:
+            self.model.load_settings_from_file()
+            problems = self.model.preflight_check()
+        except Exception as e:
+            self.logger.log("error", f"Unable to check settings: {e}")
+            return
+
+        errors = problems[problems["Severity"] == "error"]
+        if problems.shape[0] == 0:
+            QMessageBox.information(
+                None, "Settings Check", "No problems found in the settings"
+            )
+            return
+        (QMessageBox.critical if errors.shape[0] else QMessageBox.warning)(
+            None,
+            "Settings Check",
+            f"{errors.shape[0]} errors, {problems.shape[0] - errors.shape[0]} "
+            + "warnings\n\n"
+            + "\n".join(
+                f"{severity} | {sheet} | {item} | {text}"
+                for severity, sheet, item, text in problems.itertuples(index=False)
+            ),
+        )
+
     def action_extract_data_and_analyze(self):
         # !!!
         print("...")
 
+    def action_toggle_wide_export(self, checked):
+        self.model.wide_export = checked
+        if checked:
+            self.logger.log("info", "Study metadata will be joined to series rows")
+        else:
+            self.logger.log("info", "Study metadata will be saved as its own sheet")
+
+    def action_set_duplicate_policy(self, policy):
+        self.model.duplicate_policy = policy
+        self.logger.log("info", f"Duplicate series policy set to {policy}")
+
+    def action_toggle_export_format(self, export_format, checked):
+        formats = [f for f in self.model.export_formats or [] if f != export_format]
+        if checked:
+            formats.append(export_format)
+        self.model.export_formats = formats
+        self.logger.log(
+            "info",
+            f"Tables will {'' if checked else 'not '}also be saved as {export_format}",
+        )
+
     def action_reset_form(self):
         self.action_clear_vevolab_files()
         self.action_clear_metadata_settings_file()
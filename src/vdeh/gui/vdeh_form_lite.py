@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+
+################################################################################
+## Form generated from reading UI file 'vdeh_form_lite.ui'
+##
+## Created by: Qt User Interface Compiler version 6.7.3
+##
+## WARNING! All changes made in this file will be lost when recompiling UI file!
+################################################################################
+
+from PySide6.QtCore import (QCoreApplication, QDate, QDateTime, QLocale,
+    QMetaObject, QObject, QPoint, QRect,
+    QSize, QTime, QUrl, Qt)
+from PySide6.QtGui import (QAction, QBrush, QColor, QConicalGradient,
+    QCursor, QFont, QFontDatabase, QGradient,
+    QIcon, QImage, QKeySequence, QLinearGradient,
+    QPainter, QPalette, QPixmap, QRadialGradient,
+    QTransform)
+from PySide6.QtWidgets import (QApplication, QFrame, QLabel, QListWidget,
+    QListWidgetItem, QMainWindow, QMenu, QMenuBar,
+    QPushButton, QSizePolicy, QStatusBar, QTextEdit,
+    QWidget)
+
+class Ui_MainWindow(object):
+    def setupUi(self, MainWindow):
+        if not MainWindow.objectName():
+            MainWindow.setObjectName(u"MainWindow")
+        MainWindow.resize(643, 770)
+        self.menu_User_Manual = QAction(MainWindow)
+        self.menu_User_Manual.setObjectName(u"menu_User_Manual")
+        self.menu_About = QAction(MainWindow)
+        self.menu_About.setObjectName(u"menu_About")
+        self.menu_Load_VevoLab_File_s = QAction(MainWindow)
+        self.menu_Load_VevoLab_File_s.setObjectName(u"menu_Load_VevoLab_File_s")
+        self.menu_Load_Metadata_Settings_File = QAction(MainWindow)
+        self.menu_Load_Metadata_Settings_File.setObjectName(u"menu_Load_Metadata_Settings_File")
+        self.menu_Set_Output_Path = QAction(MainWindow)
+        self.menu_Set_Output_Path.setObjectName(u"menu_Set_Output_Path")
+        self.menu_Run_Extractor = QAction(MainWindow)
+        self.menu_Run_Extractor.setObjectName(u"menu_Run_Extractor")
+        self.menu_Scan_Reports = QAction(MainWindow)
+        self.menu_Scan_Reports.setObjectName(u"menu_Scan_Reports")
+        self.menu_Check_Settings = QAction(MainWindow)
+        self.menu_Check_Settings.setObjectName(u"menu_Check_Settings")
+        self.menu_Run_Stats_and_Graphs = QAction(MainWindow)
+        self.menu_Run_Stats_and_Graphs.setObjectName(u"menu_Run_Stats_and_Graphs")
+        self.menu_Column_Names = QAction(MainWindow)
+        self.menu_Column_Names.setObjectName(u"menu_Column_Names")
+        self.menu_Animal_Series_Metadata = QAction(MainWindow)
+        self.menu_Animal_Series_Metadata.setObjectName(u"menu_Animal_Series_Metadata")
+        self.menu_Derived_Data_Options = QAction(MainWindow)
+        self.menu_Derived_Data_Options.setObjectName(u"menu_Derived_Data_Options")
+        self.menu_Stat_Model_and_Graphs = QAction(MainWindow)
+        self.menu_Stat_Model_and_Graphs.setObjectName(u"menu_Stat_Model_and_Graphs")
+        self.menu_Exit = QAction(MainWindow)
+        self.menu_Exit.setObjectName(u"menu_Exit")
+        self.menu_Wide_Export = QAction(MainWindow)
+        self.menu_Wide_Export.setObjectName(u"menu_Wide_Export")
+        self.menu_Wide_Export.setCheckable(True)
+        self.menu_Duplicates_Keep_First = QAction(MainWindow)
+        self.menu_Duplicates_Keep_First.setObjectName(u"menu_Duplicates_Keep_First")
+        self.menu_Duplicates_Keep_First.setCheckable(True)
+        self.menu_Duplicates_Keep_First.setChecked(True)
+        self.menu_Duplicates_Keep_Last = QAction(MainWindow)
+        self.menu_Duplicates_Keep_Last.setObjectName(u"menu_Duplicates_Keep_Last")
+        self.menu_Duplicates_Keep_Last.setCheckable(True)
+        self.menu_Duplicates_Error = QAction(MainWindow)
+        self.menu_Duplicates_Error.setObjectName(u"menu_Duplicates_Error")
+        self.menu_Duplicates_Error.setCheckable(True)
+        self.menu_Export_Parquet = QAction(MainWindow)
+        self.menu_Export_Parquet.setObjectName(u"menu_Export_Parquet")
+        self.menu_Export_Parquet.setCheckable(True)
+        self.menu_Export_Feather = QAction(MainWindow)
+        self.menu_Export_Feather.setObjectName(u"menu_Export_Feather")
+        self.menu_Export_Feather.setCheckable(True)
+        self.menu_Export_CSV = QAction(MainWindow)
+        self.menu_Export_CSV.setObjectName(u"menu_Export_CSV")
+        self.menu_Export_CSV.setCheckable(True)
+        self.menu_Reset = QAction(MainWindow)
+        self.menu_Reset.setObjectName(u"menu_Reset")
+        self.centralwidget = QWidget(MainWindow)
+        self.centralwidget.setObjectName(u"centralwidget")
+        self.listWidget_vevolab_files = QListWidget(self.centralwidget)
+        self.listWidget_vevolab_files.setObjectName(u"listWidget_vevolab_files")
+        self.listWidget_vevolab_files.setGeometry(QRect(10, 30, 621, 321))
+        self.pushButton_load_vevolab_files = QPushButton(self.centralwidget)
+        self.pushButton_load_vevolab_files.setObjectName(u"pushButton_load_vevolab_files")
+        self.pushButton_load_vevolab_files.setGeometry(QRect(20, 380, 201, 23))
+        self.label_vevolab_files = QLabel(self.centralwidget)
+        self.label_vevolab_files.setObjectName(u"label_vevolab_files")
+        self.label_vevolab_files.setGeometry(QRect(10, 0, 252, 39))
+        self.label_output_path = QLabel(self.centralwidget)
+        self.label_output_path.setObjectName(u"label_output_path")
+        self.label_output_path.setGeometry(QRect(10, 420, 621, 39))
+        self.pushButton_set_output_path = QPushButton(self.centralwidget)
+        self.pushButton_set_output_path.setObjectName(u"pushButton_set_output_path")
+        self.pushButton_set_output_path.setGeometry(QRect(20, 450, 211, 23))
+        self.line = QFrame(self.centralwidget)
+        self.line.setObjectName(u"line")
+        self.line.setGeometry(QRect(10, 360, 621, 16))
+        self.line.setFrameShape(QFrame.Shape.HLine)
+        self.line.setFrameShadow(QFrame.Shadow.Sunken)
+        self.line_2 = QFrame(self.centralwidget)
+        self.line_2.setObjectName(u"line_2")
+        self.line_2.setGeometry(QRect(10, 410, 621, 16))
+        self.line_2.setFrameShape(QFrame.Shape.HLine)
+        self.line_2.setFrameShadow(QFrame.Shadow.Sunken)
+        self.line_3 = QFrame(self.centralwidget)
+        self.line_3.setObjectName(u"line_3")
+        self.line_3.setGeometry(QRect(0, 480, 621, 16))
+        self.line_3.setFrameShape(QFrame.Shape.HLine)
+        self.line_3.setFrameShadow(QFrame.Shadow.Sunken)
+        self.pushButton_extract_data = QPushButton(self.centralwidget)
+        self.pushButton_extract_data.setObjectName(u"pushButton_extract_data")
+        self.pushButton_extract_data.setGeometry(QRect(160, 500, 311, 23))
+        self.textEdit_status = QTextEdit(self.centralwidget)
+        self.textEdit_status.setObjectName(u"textEdit_status")
+        self.textEdit_status.setGeometry(QRect(10, 560, 621, 131))
+        self.label_status = QLabel(self.centralwidget)
+        self.label_status.setObjectName(u"label_status")
+        self.label_status.setGeometry(QRect(10, 520, 252, 39))
+        self.pushButton_clear_vevolab_files = QPushButton(self.centralwidget)
+        self.pushButton_clear_vevolab_files.setObjectName(u"pushButton_clear_vevolab_files")
+        self.pushButton_clear_vevolab_files.setGeometry(QRect(240, 380, 201, 23))
+        self.pushButton_clear_output_path = QPushButton(self.centralwidget)
+        self.pushButton_clear_output_path.setObjectName(u"pushButton_clear_output_path")
+        self.pushButton_clear_output_path.setGeometry(QRect(20, 450, 211, 23))
+        self.pushButton_reset_form = QPushButton(self.centralwidget)
+        self.pushButton_reset_form.setObjectName(u"pushButton_reset_form")
+        self.pushButton_reset_form.setGeometry(QRect(530, 700, 101, 23))
+        MainWindow.setCentralWidget(self.centralwidget)
+        self.pushButton_clear_output_path.raise_()
+        self.listWidget_vevolab_files.raise_()
+        self.pushButton_load_vevolab_files.raise_()
+        self.label_vevolab_files.raise_()
+        self.label_output_path.raise_()
+        self.pushButton_set_output_path.raise_()
+        self.line.raise_()
+        self.line_2.raise_()
+        self.line_3.raise_()
+        self.pushButton_extract_data.raise_()
+        self.textEdit_status.raise_()
+        self.label_status.raise_()
+        self.pushButton_clear_vevolab_files.raise_()
+        self.pushButton_reset_form.raise_()
+        self.menubar = QMenuBar(MainWindow)
+        self.menubar.setObjectName(u"menubar")
+        self.menubar.setGeometry(QRect(0, 0, 643, 21))
+        self.menuFile = QMenu(self.menubar)
+        self.menuFile.setObjectName(u"menuFile")
+        self.menuHelp = QMenu(self.menubar)
+        self.menuHelp.setObjectName(u"menuHelp")
+        self.menuRun = QMenu(self.menubar)
+        self.menuRun.setObjectName(u"menuRun")
+        self.menuOptions = QMenu(self.menubar)
+        self.menuOptions.setObjectName(u"menuOptions")
+        self.menuDuplicate_Series = QMenu(self.menuOptions)
+        self.menuDuplicate_Series.setObjectName(u"menuDuplicate_Series")
+        self.menuExport_Formats = QMenu(self.menuOptions)
+        self.menuExport_Formats.setObjectName(u"menuExport_Formats")
+        MainWindow.setMenuBar(self.menubar)
+        self.statusbar = QStatusBar(MainWindow)
+        self.statusbar.setObjectName(u"statusbar")
+        MainWindow.setStatusBar(self.statusbar)
+
+        self.menubar.addAction(self.menuFile.menuAction())
+        self.menubar.addAction(self.menuRun.menuAction())
+        self.menubar.addAction(self.menuOptions.menuAction())
+        self.menubar.addAction(self.menuHelp.menuAction())
+        self.menuFile.addAction(self.menu_Load_VevoLab_File_s)
+        self.menuFile.addAction(self.menu_Set_Output_Path)
+        self.menuFile.addSeparator()
+        self.menuFile.addAction(self.menu_Reset)
+        self.menuFile.addSeparator()
+        self.menuFile.addAction(self.menu_Exit)
+        self.menuHelp.addAction(self.menu_User_Manual)
+        self.menuHelp.addSeparator()
+        self.menuHelp.addAction(self.menu_About)
+        self.menuRun.addAction(self.menu_Run_Extractor)
+        self.menuRun.addAction(self.menu_Scan_Reports)
+        self.menuRun.addAction(self.menu_Check_Settings)
+        self.menuOptions.addAction(self.menu_Wide_Export)
+        self.menuOptions.addAction(self.menuExport_Formats.menuAction())
+        self.menuOptions.addAction(self.menuDuplicate_Series.menuAction())
+        self.menuDuplicate_Series.addAction(self.menu_Duplicates_Keep_First)
+        self.menuDuplicate_Series.addAction(self.menu_Duplicates_Keep_Last)
+        self.menuDuplicate_Series.addAction(self.menu_Duplicates_Error)
+        self.menuExport_Formats.addAction(self.menu_Export_Parquet)
+        self.menuExport_Formats.addAction(self.menu_Export_Feather)
+        self.menuExport_Formats.addAction(self.menu_Export_CSV)
+
+        self.retranslateUi(MainWindow)
+
+        QMetaObject.connectSlotsByName(MainWindow)
+    # setupUi
+
+    def retranslateUi(self, MainWindow):
+        MainWindow.setWindowTitle(QCoreApplication.translate("MainWindow", u"MainWindow", None))
+        self.menu_User_Manual.setText(QCoreApplication.translate("MainWindow", u"User Manual", None))
+        self.menu_About.setText(QCoreApplication.translate("MainWindow", u"About", None))
+        self.menu_Load_VevoLab_File_s.setText(QCoreApplication.translate("MainWindow", u"Load VevoLab File(s)", None))
+        self.menu_Load_Metadata_Settings_File.setText(QCoreApplication.translate("MainWindow", u"Load Metadata/Settings File", None))
+        self.menu_Set_Output_Path.setText(QCoreApplication.translate("MainWindow", u"Set Output Path", None))
+        self.menu_Run_Extractor.setText(QCoreApplication.translate("MainWindow", u"Run Extractor", None))
+        self.menu_Scan_Reports.setText(QCoreApplication.translate("MainWindow", u"Scan Reports And Save Settings Template", None))
+        self.menu_Check_Settings.setText(QCoreApplication.translate("MainWindow", u"Check Settings File Against Reports", None))
+        self.menu_Run_Stats_and_Graphs.setText(QCoreApplication.translate("MainWindow", u"Run Stats and Graphs", None))
+        self.menu_Column_Names.setText(QCoreApplication.translate("MainWindow", u"Column Names", None))
+        self.menu_Animal_Series_Metadata.setText(QCoreApplication.translate("MainWindow", u"Animal/Series Metadata", None))
+        self.menu_Derived_Data_Options.setText(QCoreApplication.translate("MainWindow", u"Derived Data Options", None))
+        self.menu_Stat_Model_and_Graphs.setText(QCoreApplication.translate("MainWindow", u"Stat Model and Graphs", None))
+        self.menu_Exit.setText(QCoreApplication.translate("MainWindow", u"Exit", None))
+        self.menu_Wide_Export.setText(QCoreApplication.translate("MainWindow", u"Join Study Metadata To Series Rows", None))
+        self.menu_Duplicates_Keep_First.setText(QCoreApplication.translate("MainWindow", u"Keep First Copy", None))
+        self.menu_Duplicates_Keep_Last.setText(QCoreApplication.translate("MainWindow", u"Keep Last Copy", None))
+        self.menu_Duplicates_Error.setText(QCoreApplication.translate("MainWindow", u"Stop With An Error", None))
+        self.menu_Export_Parquet.setText(QCoreApplication.translate("MainWindow", u"Parquet (.parquet)", None))
+        self.menu_Export_Feather.setText(QCoreApplication.translate("MainWindow", u"Feather/Arrow IPC (.feather)", None))
+        self.menu_Export_CSV.setText(QCoreApplication.translate("MainWindow", u"CSV (.csv)", None))
+        self.menu_Reset.setText(QCoreApplication.translate("MainWindow", u"Reset", None))
+        self.pushButton_load_vevolab_files.setText(QCoreApplication.translate("MainWindow", u"Load VevoLab Files", None))
+        self.label_vevolab_files.setText(QCoreApplication.translate("MainWindow", u"VevoLab Files:", None))
+        self.label_output_path.setText(QCoreApplication.translate("MainWindow", u"Output Path: ____", None))
+        self.pushButton_set_output_path.setText(QCoreApplication.translate("MainWindow", u"Set Output Path", None))
+        self.pushButton_extract_data.setText(QCoreApplication.translate("MainWindow", u"Extract Data", None))
+        self.label_status.setText(QCoreApplication.translate("MainWindow", u"Status:", None))
+        self.pushButton_clear_vevolab_files.setText(QCoreApplication.translate("MainWindow", u"Clear VevoLab Files", None))
+        self.pushButton_clear_output_path.setText(QCoreApplication.translate("MainWindow", u"Clear Output Path", None))
+        self.pushButton_reset_form.setText(QCoreApplication.translate("MainWindow", u"Reset Form", None))
+        self.menuFile.setTitle(QCoreApplication.translate("MainWindow", u"File", None))
+        self.menuHelp.setTitle(QCoreApplication.translate("MainWindow", u"Help", None))
+        self.menuRun.setTitle(QCoreApplication.translate("MainWindow", u"Run", None))
+        self.menuOptions.setTitle(QCoreApplication.translate("MainWindow", u"Options", None))
+        self.menuDuplicate_Series.setTitle(QCoreApplication.translate("MainWindow", u"Duplicate Series", None))
+        self.menuExport_Formats.setTitle(QCoreApplication.translate("MainWindow", u"Also Save Tables As", None))
+    # retranslateUi
+
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+VDEH_logging
+
+process safe logging - loggers put their records on a multiprocessing queue
+and a single listener thread in the main process writes them to the console,
+the log file and the gui (see vdeh_controller.VDEH_Logger). Worker processes
+started with pool_options(logger) log through the same queue via
+worker_logger. Nothing here imports Qt, so workers stay light
+"""
+
+__component_version__ = "1.0"
+__license__ = "MIT License"
+
+# %% import modules/libraries
+import logging
+import logging.handlers
+
+# %% define functions
+
+LOG_LEVELS = {
+    "notset": 0,
+    "debug": 10,
+    "info": 20,
+    "warning": 30,
+    "error": 40,
+    "critical": 50,
+}
+
+# logger of the current worker process, set by init_worker
+worker_logger = None
+
+
+def normalize_level(level, message):
+    """
+    numeric level of a level name or number, unknown levels are logged as
+    errors with a note added to the message - returns (level, message)
+    """
+    if type(level) is not int:
+        if type(level) is str and level.lower() in LOG_LEVELS:
+            return LOG_LEVELS[level.lower()], message
+    elif level in LOG_LEVELS.values():
+        return level, message
+    return 40, message + f" |Abnormal log level provided: {level}|"
+
+
+def gui_html(level, message, gui_color=None, gui_style=None):
+    """
+    html of a message for the status window - debug messages are green,
+    info black, warnings and errors red, errors and above in bold
+    """
+    if not gui_color:
+        if level < 20:
+            gui_color = "green"
+        elif level > 20:
+            gui_color = "red"
+        else:
+            gui_color = "black"
+    if not gui_style and level >= 40:
+        gui_style = "strong"
+    if gui_style:
+        message = f"<{gui_style}>{message}</{gui_style}>"
+    return f'<span style="color:{gui_color}">{message}</span><br>'
+
+
+def init_worker(queue):
+    """
+    initializer of worker processes, their log messages are sent to the
+    listener of the logger that owns queue
+    """
+    global worker_logger
+    worker_logger = QueueLogger(queue, "vdeh.worker")
+
+
+def pool_options(logger):
+    """
+    keyword arguments for a ProcessPoolExecutor whose workers log through
+    logger (empty if logger does not log through a queue)
+    """
+    queue = getattr(logger, "queue", None)
+    if queue is None:
+        return {}
+    return {"initializer": init_worker, "initargs": (queue,)}
+
+
+# %% define classes
+
+
+class QueueLogger:
+    """
+    puts log records on a queue, the listener of the queue writes them out -
+    records carry the gui_color and gui_style of the message
+    """
+
+    def __init__(self, queue, name=__name__):
+        self.queue = queue
+        self.log_levels = LOG_LEVELS
+        # a private logger, so loggers of the same name do not share handlers
+        self.logger = logging.Logger(name, logging.DEBUG)
+        self.logger.addHandler(logging.handlers.QueueHandler(queue))
+
+    def log(
+        self,
+        level,
+        message,
+        gui_message: str = None,
+        gui_color: str = None,
+        gui_style: str = None,
+    ):
+        level, message = normalize_level(level, message)
+        self.logger.log(
+            level, message, extra={"gui_color": gui_color, "gui_style": gui_style}
+        )
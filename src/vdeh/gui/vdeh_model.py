@@ -7,293 +7,3289 @@ __component_version__ = "1.2"
 __license__ = "MIT License"
 
 # %% import modules/libraries
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 import pandas
 import re
 import numpy
 import scipy
-import pingouin
 import itertools
 import logging
 import traceback
+import os
+import io
+import hashlib
+import collections
+import contextlib
+import gzip
+import bz2
+import lzma
+import zipfile
+import threading
+import concurrent.futures
+import functools
+import json
+import locale
+import mmap
+import pickle
+import time
+import array
+import csv
+import math
+import sys
+
+from . import vdeh_chunked, vdeh_logging, vdeh_resample, vdeh_series, vdeh_store
 
-# import os
 # import sys
 # import datetime
 
+# first fields of rows that open or close a section of a series block
+SECTION_MARKERS = {
+    "",
+    "No measurements found",
+    "Calculation",
+    "Measurement",
+    "Version Information",
+    "Series Notes",
+    "Application",
+}
+# file extensions of VevoLab reports found when searching directories
+REPORT_EXTENSIONS = {".txt", ".csv"}
+
+# compressed reports are decompressed while they are read, zip archives are
+# read member by member - a single member is addressed as 'archive.zip::member'
+COMPRESSION_OPENERS = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open}
+ARCHIVE_SEPARATOR = "::"
+
+# uncompressed reports with at least this many series blocks are indexed and
+# parsed by a pool of workers (when more than one parse worker is requested)
+PARALLEL_MIN_BLOCKS = 200
+
+# start of a series block while indexing the raw bytes of a report, which are
+# decoded as reading the report in text mode would
+SERIES_START = re.compile(rb'(?m)^"?Series Name"?,')
+REPORT_ENCODING = locale.getpreferredencoding(False)
+
+# calculations available in the derived data sheet
+DERIVED_CALCULATIONS = [
+    "Age(days)",
+    "Age(wks)",
+    "Age(Mo)",
+    "PostTreat(days)",
+    "PostTreat(wks)",
+    "PostTreat(Mo)",
+    "TimeInStudy(days)",
+    "TimeInStudy(wks)",
+    "TimeInStudy(Mo)",
+    "KOMP_STYLE",
+]
+
+# how copies of the same series found in overlapping reports are handled -
+# the first/last copy (in input order) is kept or an error is raised
+DUPLICATE_POLICIES = ["keep-first", "keep-last", "error"]
+
+# table formats that can be saved alongside the excel output, pyarrow is only
+# needed (and imported) for parquet/feather
+EXPORT_FORMATS = ["parquet", "feather", "csv"]
+CSV_CHUNKSIZE = 10000
+
+# series rows can be streamed (one row per series as it is parsed) in these
+# formats, '-' as a report path reads reports from stdin
+STREAM_FORMATS = ["ndjson", "csv"]
+STDIN_PATH = "-"
+
+# end of the first line of every VevoLab report - starts a new report in a
+# stream of concatenated reports
+REPORT_TITLE = "Measurement Export"
+
+# animal data column each derived calculation is measured from (the
+# calculations are named <prefix>(<unit>))
+DERIVED_SOURCES = {
+    "Age": "DOB",
+    "PostTreat": "Treatment Date",
+    "TimeInStudy": "Study Start Date",
+}
+
+# optional column of the timepoint data sheet, series within this many days of
+# the timepoint date are matched to the nearest timepoint
+TIMEPOINT_TOLERANCE = "tolerance (days)"
+
+# settings of the per outcome statistics and plot, part of the cache key of
+# memoized results
+OUTCOME_ANALYSIS_SETTINGS = {"ss_type": 3, "plot_kind": "barh"}
+
+
 # %% define functions
 
 
-def collect_data(report_paths, logger=None):
+def make_projection(keys):
+    """
+    prepare a set of requested measurement/calculation keys for use while
+    parsing. Returns None (keep everything) if no keys are given, otherwise a
+    tuple of the key set and the set of key prefixes that can be produced by
+    the Measurement field of a row ('<Measurement>_<Mode>_<Parameter>')
+    """
+    if keys is None:
+        return None
+    keys = set(keys)
+    prefixes = set()
+    for k in keys:
+        for m in re.finditer("_", k):
+            prefixes.add(k[: m.start()])
+    return keys, prefixes
+
+
+def split_report(report_text):
+    """
+    split the text of a VevoLab report into the study level header and the
+    text of each series block ('Series Name,' prefix removed, so the first
+    row of each block is the series name)
+    """
+    blocks = report_text.split("Series Name,")
+    return blocks[0], blocks[1:]
+
+
+def iter_report_blocks(lines):
+    """
+    split the lines of a VevoLab report (quotes removed) into the study level
+    header and the text of each series block as they are read, yields the
+    header first and then each block (same text as split_report, without
+    holding the whole report in memory)
+    """
+    current = []
+    for line in lines:
+        if line.startswith("Series Name,"):
+            yield "".join(current)
+            current = [line[len("Series Name,") :]]
+        else:
+            current.append(line)
+    yield "".join(current)
+
+
+def iter_report_stream(lines):
+    """
+    split the lines of one or more concatenated VevoLab reports (quotes
+    removed) into blocks as they are read, yields ("header", text) for the
+    study header of each report and ("series", text) for each series block
+    (text as in iter_report_blocks)
+    """
+    kind = "header"
+    current = []
+    for line in lines:
+        if line.startswith("Series Name,"):
+            if current:
+                yield kind, "".join(current)
+            kind, current = "series", [line[len("Series Name,") :]]
+        elif "," not in line and line.lstrip("\ufeff").rstrip().endswith(REPORT_TITLE):
+            if current:
+                yield kind, "".join(current)
+            kind, current = "header", [line]
+        else:
+            current.append(line)
+    if current:
+        yield kind, "".join(current)
+
+
+def parse_study_header(header, column_names):
+    """
+    Parameters
+    ----------
+    header : string
+        text of the report preceding the first series block
+    column_names : dict of lists
+        running collection of field names, updated in place
+
+    Returns
+    -------
+    study_dict : dict
+        study level metadata (study information, version information, notes)
+
+    """
+    study_dict = {}
+    header_rows = header.split("\n")
+
+    FLAG_version = 0
+    FLAG_notes = 0
+
+    for r in header_rows[1:]:
+        columns = []
+        columns = r.split(",")
+        study_notes = []
+
+        if columns[0] == "" or columns[0] == "No measurements found":
+            FLAG_version = 0
+            continue
+
+        elif columns[0] == "Version Information":
+            FLAG_version = 1
+            FLAG_notes = 0
+            continue
+
+        elif columns[0] == "Study Notes":
+            FLAG_version = 0
+            FLAG_notes = 1
+            if len(columns) > 1:
+                study_notes.append(",".join(columns[1:]))
+
+        elif FLAG_version > 0:
+            if FLAG_version == 1:
+                version_header = r
+                column_names["MetaData Fields"].append(version_header)
+
+            else:
+                study_dict[version_header] = ",".join(columns)
+            FLAG_version += 1
+
+        elif FLAG_notes > 0:
+            if FLAG_notes == 1:
+                study_notes.append(r)
+                study_dict["Study Notes"] = "\n".join(study_notes)
+                column_names["MetaData Fields"].append("Study Notes")
+
+        else:
+            if len(columns) > 1:
+                study_dict[columns[0]] = ",".join(columns[1:])
+                column_names["MetaData Fields"].append(columns[0])
+
+    return study_dict
+
+
+def parse_series_block(
+    block, study_dict, column_names, source="", logger=None, projection=None
+):
+    """
+    Parameters
+    ----------
+    block : string
+        text of a single series block, first row is the series name
+    study_dict : dict
+        study level metadata for the report, version information found in
+        the series block is added to it
+    column_names : dict of lists
+        running collection of field names, updated in place
+    source : string, optional
+        name of the report the block came from (used for log messages)
+    projection : tuple, optional
+        output of make_projection, Calculation and Measurement rows that are
+        not requested are skipped before they are split or converted
+
+    Returns
+    -------
+    series_name : string
+    series_dict : dict
+        series level metadata and measurements, number suffixed replicates
+        are collapsed to their mean and their raw values kept under
+        vdeh_series.REPLICATES as (keys, counts, values) - the replicated
+        measurement keys, number of values of each and a flat array of the
+        values key by key
+
+    """
+    rows = []
+    rows = block.split("\n")
+
+    # measurement values are kept flat, cell_ids holds the position of each
+    # value's measurement in cells
+    cells = {}
+    cell_ids = []
+    raw_values = []
+    replicated = []
+
+    FLAG_calculations = 0
+    FLAG_measurements = 0
+    FLAG_version = 0
+    FLAG_notes = 0
+
+    series_notes = []
+
+    series_dict = {"Series Name": rows[0]}
+    for r in rows[1:]:
+        # skip unrequested calculations/measurements using only the first field
+        if projection and (FLAG_calculations or FLAG_measurements):
+            first = r.partition(",")[0]
+            if first not in SECTION_MARKERS:
+                if FLAG_calculations and first not in projection[0]:
+                    continue
+                if FLAG_measurements and (
+                    first.rstrip("0123456789") not in projection[1]
+                ):
+                    continue
+
+        columns = []
+        columns = r.split(",")
+
+        # clear flags indicating calculation or measurement section
+        if columns[0] == "" or columns[0] == "No measurements found":
+            FLAG_calculations = 0
+            FLAG_measurements = 0
+            FLAG_version = 0
+
+            continue
+
+        # check and set flags for whether the line indicates
+        # transition between calculation, measurement, or other
+        # section
+        elif columns[0] == "Calculation":
+            FLAG_calculations = 1
+            FLAG_measurements = 0
+            FLAG_version = 0
+            FLAG_notes = 0
+            continue
+
+        elif columns[0] == "Measurement":
+            FLAG_measurements = 1
+            FLAG_calculations = 0
+            FLAG_version = 0
+            FLAG_notes = 0
+            continue
+
+        elif columns[0] == "Version Information":
+            FLAG_version = 1
+            FLAG_calculations = 0
+            FLAG_measurements = 0
+            FLAG_notes = 0
+            continue
+
+        elif columns[0] == "Series Notes":
+            FLAG_version = 0
+            FLAG_calculations = 0
+            FLAG_measurements = 0
+            FLAG_notes = 1
+            if len(columns) > 1:
+                series_notes.append(",".join(columns[1:]))
+
+        # !!! need to add check for bad case of user entering "Application" in series notes !!!
+        elif columns[0] == "Application":
+            FLAG_version = 0
+            FLAG_calculations = 0
+            FLAG_measurements = 0
+            FLAG_notes = 0
+
+        # if row is not a transition indicator, extract data if
+        # row is calculation or measurement data (add to list)
+        if (
+            FLAG_calculations == 0
+            and FLAG_measurements == 0
+            and FLAG_version == 0
+            and FLAG_notes == 0
+        ):
+            column_names["MetaData Fields"].append(columns[0])
+            series_dict[columns[0]] = ",".join(columns[1:])
+
+        elif FLAG_notes > 0:
+            if FLAG_notes == 1:
+                series_dict["Series Notes"] = "\n".join(series_notes)
+
+            else:
+                series_notes.append(r)
+                series_dict["Series Notes"] = "\n".join(series_notes)
+            FLAG_notes += 1
+
+        elif FLAG_version > 0:
+            if FLAG_version == 1:
+                version_header = r
+
+            else:
+                study_dict[version_header] = ",".join(columns)
+            FLAG_version += 1
+
+        elif FLAG_calculations == 1:
+            column_names["VevoLab Measurement_Mode_Parameter or Calculation"].append(
+                columns[0]
+            )
+            series_dict[columns[0]] = columns[3]
+
+        elif FLAG_measurements == 1:
+            # screen for cases of measurements with number suffix
+            suffixed = columns[0][-1].isdigit()
+            if suffixed:
+                # if measurement is number suffixed, grab the
+                # initial portion
+                columns[0] = re.search(
+                    "(?P<text>.*?)(?P<digit>\d+$)", columns[0]
+                ).group("text")
+            key = "_".join(columns[0:3])
+            if projection and key not in projection[0]:
+                continue
+            column_names["VevoLab Measurement_Mode_Parameter or Calculation"].append(
+                key
+            )
+            # place the data
+            cell = cells.get(key)
+            if cell is None:
+                # keep the field order of the report, the mean is set below
+                series_dict[key] = None
+                cell = cells[key] = len(cells)
+                replicated.append(False)
+            replicated[cell] = replicated[cell] or suffixed
+            cell_ids.append(cell)
+            raw_values.append(columns[4])
+
+    if not cells:
+        return rows[0], series_dict
+
+    # collapse repeated measurements (affects AutoLV) to a mean()
+    sums = [0.0] * len(cells)
+    counts = [0] * len(cells)
+    failed = [False] * len(cells)
+    values = array.array("d")
+    for cell, v in zip(cell_ids, raw_values):
+        try:
+            x = float(v)
+        except ValueError:
+            failed[cell] = True
+            x = math.nan
+        values.append(x)
+        sums[cell] += x
+        counts[cell] += 1
+
+    for k, cell in cells.items():
+        if failed[cell]:
+            if logger:
+                logger.log(
+                    "error",
+                    ("issue summarizing collected data " + f"{source}:{rows[0]} - {k}"),
+                )
+            series_dict[k] = "ERROR_NA"
+        else:
+            series_dict[k] = sums[cell] / counts[cell]
+
+    # raw values of number suffixed measurements are kept key by key
+    keys = [k for k, cell in cells.items() if replicated[cell]]
+    if keys:
+        order = sorted(
+            (i for i, cell in enumerate(cell_ids) if replicated[cell]),
+            key=cell_ids.__getitem__,
+        )
+        series_dict[vdeh_series.REPLICATES] = (
+            keys,
+            [counts[cells[k]] for k in keys],
+            array.array("d", (values[i] for i in order)),
+        )
+
+    return rows[0], series_dict
+
+
+def block_fingerprint(block):
+    """
+    identify a series block by Series Name, Animal ID, Series Date and a hash
+    of its rows - only the first field of the metadata rows is read, trailing
+    blank lines (which differ between the last and other blocks of a report)
+    are not part of the hash
+    """
+    series_name, _, rest = block.partition("\n")
+    metadata = {}
+    for r in rest.split("\n"):
+        first, _, value = r.partition(",")
+        if first in ["Calculation", "Measurement"]:
+            break
+        if first in ["Animal ID", "Series Date"]:
+            metadata[first] = value
+    return (
+        series_name,
+        metadata.get("Animal ID"),
+        metadata.get("Series Date"),
+        hashlib.sha1(block.rstrip().encode()).hexdigest(),
+    )
+
+
+def parse_report(
+    report_text,
+    column_names,
+    source="",
+    logger=None,
+    projection=None,
+    fingerprints=None,
+    claim=None,
+):
+    """
+    Parameters
+    ----------
+    report_text : string or iterable of strings
+        contents (or lines, e.g. an open report) of a VevoLab report with
+        quotes removed
+    column_names : dict of lists
+        running collection of field names, updated in place
+    source : string, optional
+        path of the report (used as the study id if no Study Name is found)
+    projection : tuple, optional
+        output of make_projection, limits the parsed calculations and
+        measurements to the requested keys
+    fingerprints : dict, optional
+        block_fingerprint and position of each parsed series block, keyed by
+        series name, updated in place
+    claim : callable, optional
+        called with the fingerprint, position and series name of each block
+        before it is parsed, blocks are skipped if it returns False (see
+        SeriesDeduplicator)
+
+    Returns
+    -------
+    study_id : string
+        key linking the series of the report to its study level metadata
+    study_dict : dict
+        study level metadata
+    report_dict : dict of dicts
+        series level data keyed by series name, each series carries the
+        study id instead of a copy of the study level metadata
+
+    """
+    if isinstance(report_text, str):
+        report_text = report_text.splitlines(keepends=True)
+    blocks = iter_report_blocks(report_text)
+    study_dict = parse_study_header(next(blocks), column_names)
+
+    report_dict = {}
+    for i, b in enumerate(blocks):
+        if fingerprints is not None or claim is not None:
+            fingerprint = block_fingerprint(b)
+            if claim is not None and not claim(fingerprint, i, fingerprint[0]):
+                continue
+        series_name, series_dict = parse_series_block(
+            b, study_dict, column_names, source, logger, projection
+        )
+        report_dict[series_name] = series_dict
+        if fingerprints is not None:
+            fingerprints[series_name] = (fingerprint, i)
+
+    study_id = study_dict.get("Study Name") or report_stem(source)
+    for series_dict in report_dict.values():
+        series_dict["Study ID"] = study_id
+
+    return study_id, study_dict, report_dict
+
+
+def stream_series(report_paths, logger=None, keys=None, stdin=None):
+    """
+    Parameters
+    ----------
+    report_paths : list of strings
+        report paths, '-' reads (any number of concatenated) reports from
+        stdin
+    keys : collection of strings, optional
+        only parse these measurements/calculations
+    stdin : text stream, optional
+        stream read for '-', default sys.stdin
+
+    Yields
+    ------
+    series_dict : dict
+        series level metadata and measurements (as numbers) with the Study ID
+        of each series, as soon as its series block has been read - only the
+        current block is held in memory, repeated copies of a series are
+        skipped
+
+    """
+    projection = make_projection(keys)
+    seen = set()
+    for report_path in report_paths:
+        if report_path == STDIN_PATH:
+            source = "stdin"
+            opened = contextlib.nullcontext(stdin or sys.stdin)
+        else:
+            source = report_path
+            opened = open_report(report_path)
+
+        with opened as lines:
+            reports = 0
+            study_dict = {}
+            study_id = report_stem(source)
+            for kind, text in iter_report_stream(r.replace('"', "") for r in lines):
+                column_names = {
+                    "MetaData Fields": [],
+                    "VevoLab Measurement_Mode_Parameter or Calculation": [],
+                }
+                if kind == "header":
+                    reports += 1
+                    study_dict = parse_study_header(text, column_names)
+                    study_id = study_dict.get("Study Name") or (
+                        f"{report_stem(source)}-{reports}"
+                        if reports > 1
+                        else report_stem(source)
+                    )
+                    continue
+
+                fingerprint = block_fingerprint(text)
+                if fingerprint in seen:
+                    if logger:
+                        logger.log(
+                            "debug",
+                            f"duplicate series {fingerprint[0]} in {source} skipped",
+                        )
+                    continue
+                seen.add(fingerprint)
+
+                series_name, series_dict = parse_series_block(
+                    text, study_dict, column_names, source, logger, projection
+                )
+                series_dict.pop(vdeh_series.REPLICATES, None)
+                # calculations are read as text, measurements as numbers
+                for k in column_names[
+                    "VevoLab Measurement_Mode_Parameter or Calculation"
+                ]:
+                    try:
+                        series_dict[k] = float(series_dict[k])
+                    except (TypeError, ValueError):
+                        pass
+                series_dict["Study ID"] = study_id
+                yield series_dict
+
+
+class SeriesStreamWriter:
+    """
+    writes series rows to a text stream as they are parsed, one json object
+    per line (ndjson) or one csv row per series - the csv columns are those
+    of the first series (or the columns given), fields only found later are
+    left out with a warning. Each row is flushed as it is written
+    """
+
+    def __init__(self, out, fmt="ndjson", columns=None, logger=None):
+        if fmt not in STREAM_FORMATS:
+            raise ValueError(f"Unknown stream format: {fmt}")
+        self.out = out
+        self.fmt = fmt
+        self.columns = list(columns) if columns else None
+        self.logger = logger
+        self.writer = None
+        self.dropped = set()
+        self.rows = 0
+
+    def write(self, row):
+        if self.fmt == "ndjson":
+            self.out.write(
+                json.dumps(
+                    {
+                        k: None if isinstance(v, float) and math.isnan(v) else v
+                        for k, v in row.items()
+                    },
+                    default=str,
+                )
+                + "\n"
+            )
+        else:
+            if self.writer is None:
+                self.columns = self.columns or list(row)
+                self.writer = csv.DictWriter(
+                    self.out, self.columns, extrasaction="ignore"
+                )
+                self.writer.writeheader()
+            new = set(row).difference(self.columns, self.dropped)
+            if new:
+                self.dropped.update(new)
+                if self.logger:
+                    self.logger.log(
+                        "warning",
+                        "fields not in the csv columns are left out: "
+                        + ", ".join(sorted(new)),
+                    )
+            self.writer.writerow(row)
+        self.out.flush()
+        self.rows += 1
+
+
+def stream_reports(report_paths, out, fmt="ndjson", logger=None, keys=None):
+    """
+    parse the reports ('-' reads stdin) and write one row per series to out
+    as each series is parsed (see stream_series and SeriesStreamWriter),
+    returns the number of series written
+    """
+    columns = None
+    if keys and fmt == "csv":
+        columns = ["Study ID", "Series Name", "Animal ID", "Series Date"] + list(keys)
+    writer = SeriesStreamWriter(out, fmt, columns, logger)
+    paths = []
+    for p in report_paths:
+        paths += [p] if p == STDIN_PATH else expand_report_paths([p])
+    for series_dict in stream_series(paths, logger, keys):
+        writer.write(series_dict)
+    return writer.rows
+
+
+def split_archive_path(report_path):
+    """
+    split 'archive.zip::member' into the archive path and the member name,
+    returns (report_path, None) for reports that are not zip members
+    """
+    archive, sep, member = report_path.partition(ARCHIVE_SEPARATOR)
+    if sep and archive.lower().endswith(".zip"):
+        return archive, member
+    return report_path, None
+
+
+def report_stem(report_path):
+    """
+    name of a report without folders, compression and report extensions
+    """
+    archive, member = split_archive_path(report_path)
+    stem, ext = os.path.splitext(os.path.basename(member or archive))
+    if ext.lower() in COMPRESSION_OPENERS:
+        stem = os.path.splitext(stem)[0]
+    return stem
+
+
+def is_report_name(name):
+    """
+    True if name has a report extension (optionally followed by a
+    compression extension, e.g. '.csv.gz')
+    """
+    stem, ext = os.path.splitext(name.lower())
+    if ext in COMPRESSION_OPENERS:
+        ext = os.path.splitext(stem)[1]
+    return ext in REPORT_EXTENSIONS
+
+
+def archive_members(archive_path):
+    """
+    report paths ('archive.zip::member') of the reports within a zip archive
+    """
+    with zipfile.ZipFile(archive_path) as zf:
+        return [
+            f"{archive_path}{ARCHIVE_SEPARATOR}{n}"
+            for n in sorted(zf.namelist())
+            if not n.endswith("/") and is_report_name(n)
+        ]
+
+
+def read_report_bytes(report_path):
+    """
+    contents of a report file (or zip member) as stored - .gz/.bz2/.xz
+    reports stay compressed until they are parsed (see open_report)
+    """
+    archive, member = split_archive_path(report_path)
+    if member is None:
+        with open(report_path, "rb") as f:
+            return f.read()
+    with zipfile.ZipFile(archive) as zf:
+        return zf.read(member)
+
+
+def prefetch(paths, read, depth=2):
+    """
+    yield (path, read(path), seconds spent reading) for each path in order -
+    up to depth paths are read ahead by a thread pool while the caller works
+    on the current one, no more are read until the caller moves on (so at
+    most depth + 1 results are held in memory), depth 0 reads in turn
+    """
+
+    def timed_read(p):
+        start = time.perf_counter()
+        data = read(p)
+        return data, time.perf_counter() - start
+
+    if depth < 1:
+        for p in paths:
+            yield (p,) + timed_read(p)
+        return
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=depth) as executor:
+        pending = collections.deque()
+        for p in paths:
+            pending.append((p, executor.submit(timed_read, p)))
+            if len(pending) > depth:
+                q, future = pending.popleft()
+                yield (q,) + future.result()
+        while pending:
+            q, future = pending.popleft()
+            yield (q,) + future.result()
+
+
+@contextlib.contextmanager
+def open_report(report_path, data=None):
+    """
+    open a report as a text stream - plain files, .gz/.bz2/.xz files and zip
+    members ('archive.zip::member', which may be compressed themselves) are
+    decompressed as they are read, nothing is extracted to disk. Each call
+    opens its own handle, so members of one archive can be read concurrently.
+    data (from read_report_bytes) is used instead of reading the file again
+    """
+    archive, member = split_archive_path(report_path)
+    with contextlib.ExitStack() as stack:
+        if data is not None:
+            raw = io.BytesIO(data)
+        elif member is None:
+            raw = stack.enter_context(open(report_path, "rb"))
+        else:
+            zf = stack.enter_context(zipfile.ZipFile(archive))
+            raw = stack.enter_context(zf.open(member))
+        ext = os.path.splitext(member or archive)[1].lower()
+        if ext in COMPRESSION_OPENERS:
+            raw = stack.enter_context(COMPRESSION_OPENERS[ext](raw, "rb"))
+        yield stack.enter_context(io.TextIOWrapper(raw))
+
+
+def file_fingerprint(path):
+    """
+    identify the current version of a file by path, modification time and size
+    (zip members are identified by the archive and the member name)
+    """
+    archive, member = split_archive_path(path)
+    stat = os.stat(archive)
+    path = os.path.abspath(archive) + (ARCHIVE_SEPARATOR + member if member else "")
+    return path, stat.st_mtime_ns, stat.st_size
+
+
+def is_indexable(report_path):
+    """
+    True if the report can be read at random offsets (plain, uncompressed files)
+    """
+    archive, member = split_archive_path(report_path)
+    return member is None and (
+        os.path.splitext(report_path)[1].lower() not in COMPRESSION_OPENERS
+    )
+
+
+def index_report(report_path):
+    """
+    fast pre-pass over an uncompressed report recording the byte offsets of
+    the study header and each series block
+
+    Returns
+    -------
+    index : dict
+        'fingerprint' - file_fingerprint of the indexed file
+        'header' - [offset, length] of the study header
+        'blocks' - [offset, length, series name] of each series block
+
+    """
+    fingerprint = list(file_fingerprint(report_path))
+    starts, names = [], []
+    with open(report_path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size > 0:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for m in SERIES_START.finditer(mm):
+                    end = mm.find(b"\n", m.end())
+                    starts.append(m.start())
+                    names.append(
+                        decode_report_bytes(
+                            mm[m.end() : end if end >= 0 else size]
+                        ).strip()
+                    )
+    ends = starts[1:] + [size]
+    return {
+        "fingerprint": fingerprint,
+        "header": [0, starts[0] if starts else size],
+        "blocks": [[s, e - s, n] for s, e, n in zip(starts, ends, names)],
+    }
+
+
+def report_index_dir(checkpoint_dir):
+    # report offset indexes are kept beside the stage checkpoints
+    return os.path.join(checkpoint_dir, "index") if checkpoint_dir else None
+
+
+def report_plot_dir(checkpoint_dir):
+    # rendered plots are cached beside the stage checkpoints
+    return os.path.join(checkpoint_dir, "plots") if checkpoint_dir else None
+
+
+def load_report_index(report_path, index_dir=None):
+    """
+    offset index of a report (see index_report), reused from index_dir while
+    the report is unchanged and saved there after indexing
+    """
+    fingerprint = list(file_fingerprint(report_path))
+    index_path = None
+    if index_dir:
+        index_path = os.path.join(
+            index_dir, hashlib.sha1(fingerprint[0].encode()).hexdigest() + ".json"
+        )
+        try:
+            with open(index_path) as f:
+                index = json.load(f)
+            if index["fingerprint"] == fingerprint:
+                return index
+        except (OSError, ValueError, KeyError):
+            pass
+
+    index = index_report(report_path)
+    if index_path:
+        os.makedirs(index_dir, exist_ok=True)
+        with open(index_path + ".tmp", "w") as f:
+            json.dump(index, f)
+        os.replace(index_path + ".tmp", index_path)
+    return index
+
+
+def decode_report_bytes(data):
+    # same text as reading the report in text mode, with quotes removed
+    return (
+        data.decode(REPORT_ENCODING)
+        .replace("\r\n", "\n")
+        .replace("\r", "\n")
+        .replace('"', "")
+    )
+
+
+def read_report_range(report_path, offset, length):
+    """
+    text (quotes removed) of length bytes of a report starting at offset
+    """
+    with open(report_path, "rb") as f:
+        f.seek(offset)
+        return decode_report_bytes(f.read(length))
+
+
+def parse_series_blocks(report_path, blocks, projection=None):
+    """
+    Parameters
+    ----------
+    report_path : string
+        filepath of an uncompressed VevoLab report
+    blocks : list of tuples
+        (position, offset, length) of the series blocks to parse
+    projection : tuple, optional
+        output of make_projection
+
+    Returns
+    -------
+    results : list of tuples
+        (position, series name, series dict, block_fingerprint) per block
+    column_names : dict of lists
+        field names found in the blocks
+    study_dict : dict
+        study level version information found in the blocks
+
+    runs in parallel workers, messages are logged through the worker logger
+    (see vdeh_logging.pool_options) if the pool has one
+    """
+    column_names = {}
+    column_names["MetaData Fields"] = []
+    column_names["VevoLab Measurement_Mode_Parameter or Calculation"] = []
+    study_dict = {}
+    results = []
+    with open(report_path, "rb") as f:
+        for position, offset, length in blocks:
+            f.seek(offset)
+            block = decode_report_bytes(f.read(length))[len("Series Name,") :]
+            series_name, series_dict = parse_series_block(
+                block,
+                study_dict,
+                column_names,
+                report_path,
+                vdeh_logging.worker_logger,
+                projection,
+            )
+            results.append(
+                (position, series_name, series_dict, block_fingerprint(block))
+            )
+    return results, column_names, study_dict
+
+
+def parse_indexed_report(
+    report_path,
+    index,
+    column_names,
+    workers,
+    projection=None,
+    fingerprints=None,
+    claim=None,
+    logger=None,
+):
+    """
+    same as parse_report for an indexed report, the series blocks are parsed
+    in chunks by a pool of worker processes (results are merged in block
+    order, so the output matches parse_report) - duplicate series are claimed
+    once their block is parsed, workers log through logger's queue (if any)
+    """
+    study_dict = parse_study_header(
+        read_report_range(report_path, *index["header"]), column_names
+    )
+
+    tasks = [(i, b[0], b[1]) for i, b in enumerate(index["blocks"])]
+    chunksize = max(16, len(tasks) // (workers * 4))
+    chunks = [tasks[k : k + chunksize] for k in range(0, len(tasks), chunksize)]
+
+    report_dict = {}
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers, **vdeh_logging.pool_options(logger)
+    ) as executor:
+        for results, chunk_column_names, chunk_study_dict in executor.map(
+            functools.partial(parse_series_blocks, report_path, projection=projection),
+            chunks,
+        ):
+            for k, v in chunk_column_names.items():
+                column_names[k] += v
+            study_dict.update(chunk_study_dict)
+            for position, series_name, series_dict, fingerprint in results:
+                if claim is not None and not claim(fingerprint, position, series_name):
+                    continue
+                report_dict[series_name] = series_dict
+                if fingerprints is not None:
+                    fingerprints[series_name] = (fingerprint, position)
+
+    study_id = study_dict.get("Study Name") or report_stem(report_path)
+    for series_dict in report_dict.values():
+        series_dict["Study ID"] = study_id
+
+    return study_id, study_dict, report_dict
+
+
+def extract_series(report_path, series_name, projection=None, index_dir=None):
+    """
+    re-extract a single series of a report - for uncompressed reports only the
+    study header and the block of that series are read (using the offset
+    index), other reports are parsed in full
+
+    Returns
+    -------
+    study_id, study_dict : see parse_report
+    series_dict : dict
+        series level data, None if the series is not in the report
+
+    """
+    column_names = {}
+    column_names["MetaData Fields"] = []
+    column_names["VevoLab Measurement_Mode_Parameter or Calculation"] = []
+
+    if not is_indexable(report_path):
+        column_names, study_id, study_dict, report_dict = load_report(
+            report_path, projection=projection
+        )
+        return study_id, study_dict, report_dict.get(series_name)
+
+    index = load_report_index(report_path, index_dir)
+    study_dict = parse_study_header(
+        read_report_range(report_path, *index["header"]), column_names
+    )
+    study_id = study_dict.get("Study Name") or report_stem(report_path)
+    series_dict = None
+    for offset, length, name in index["blocks"]:
+        if name == series_name:
+            block = read_report_range(report_path, offset, length)
+            series_name, series_dict = parse_series_block(
+                block[len("Series Name,") :],
+                study_dict,
+                column_names,
+                report_path,
+                None,
+                projection,
+            )
+            series_dict["Study ID"] = study_id
+    return study_id, study_dict, series_dict
+
+
+def report_cache_key(report_path, projection=None):
+    # parsed reports are cached per file version and projection
+    return (
+        file_fingerprint(report_path),
+        None if projection is None else frozenset(projection[0]),
+    )
+
+
+def load_reports(
+    report_paths,
+    logger=None,
+    projection=None,
+    cache=None,
+    dedup=None,
+    workers=1,
+    index_dir=None,
+    prefetch_depth=2,
+):
+    """
+    load_report for each report in report_paths (directories and zip
+    archives are expanded), the next prefetch_depth reports are read in the
+    background while the current one is parsed - yields (position, path,
+    load_report result) in input order and logs the read and parse time of
+    each report
+    """
+
+    def read(report_path):
+        # cached reports and reports parsed from their offset index are not
+        # read ahead
+        if cache is not None and report_cache_key(report_path, projection) in cache:
+            return None
+        if workers > 1 and is_indexable(report_path):
+            return None
+        return read_report_bytes(report_path)
+
+    start = time.perf_counter()
+    read_total = parse_total = 0
+    report_paths = expand_report_paths(report_paths)
+    for rank, (report_path, data, read_seconds) in enumerate(
+        prefetch(report_paths, read, prefetch_depth)
+    ):
+        if logger:
+            logger.log("info", f"collecting data from {report_path}")
+        parse_start = time.perf_counter()
+        result = load_report(
+            report_path,
+            logger,
+            projection,
+            cache,
+            dedup,
+            rank,
+            workers,
+            index_dir,
+            data,
+        )
+        parse_seconds = time.perf_counter() - parse_start
+        read_total += read_seconds
+        parse_total += parse_seconds
+        if logger:
+            logger.log(
+                "debug",
+                f"{report_path} - read {read_seconds:.3f} s, "
+                + f"parse {parse_seconds:.3f} s",
+            )
+        yield rank, report_path, result
+
+    if logger:
+        logger.log(
+            "debug",
+            f"{len(report_paths)} reports - read {read_total:.2f} s, "
+            + f"parse {parse_total:.2f} s, "
+            + f"elapsed {time.perf_counter() - start:.2f} s",
+        )
+
+
+def load_report(
+    report_path,
+    logger=None,
+    projection=None,
+    cache=None,
+    dedup=None,
+    rank=0,
+    workers=1,
+    index_dir=None,
+    data=None,
+):
+    """
+    Parameters
+    ----------
+    report_path : string
+        filepath of a VevoLab report (may be compressed or a zip member, see
+        open_report)
+    projection : tuple, optional
+        output of make_projection
+    cache : LRUCache, optional
+        parsed reports are reused from (and added to) the cache, keyed by the
+        file fingerprint and the projection
+    dedup : SeriesDeduplicator, optional
+        series already claimed by another report are skipped before they are
+        parsed (and then left out of the result)
+    rank : int, optional
+        position of the report in the input order, used by dedup
+    workers : int, optional
+        number of worker processes - large uncompressed reports are indexed
+        and their series blocks parsed in parallel when more than 1
+    index_dir : string, optional
+        directory where report offset indexes are kept (see load_report_index)
+    data : bytes, optional
+        contents of the report already read with read_report_bytes
+
+    Returns
+    -------
+    column_names : dict of lists
+        field names found in this report
+    study_id, study_dict, report_dict
+        see parse_report
+
+    """
+    if cache is not None:
+        cache_key = report_cache_key(report_path, projection)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            if logger:
+                logger.log("debug", f"using cached parse of {report_path}")
+            column_names, study_id, study_dict, report_dict, fingerprints = cached
+            if dedup is not None:
+                report_dict = {
+                    k: v
+                    for k, v in report_dict.items()
+                    if dedup.claim(
+                        fingerprints[k][0], (rank, fingerprints[k][1]), report_path
+                    )
+                }
+            return column_names, study_id, study_dict, report_dict
+
+    column_names = {}
+    column_names["MetaData Fields"] = []
+    column_names["VevoLab Measurement_Mode_Parameter or Calculation"] = []
+    fingerprints = {}
+    skipped = []
+
+    def claim(fingerprint, position, series_name):
+        if dedup is None or dedup.claim(fingerprint, (rank, position), report_path):
+            return True
+        skipped.append(series_name)
+        return False
+
+    index = None
+    if workers > 1 and is_indexable(report_path):
+        index = load_report_index(report_path, index_dir)
+        if len(index["blocks"]) < PARALLEL_MIN_BLOCKS:
+            index = None
+
+    if index is not None:
+        if logger:
+            logger.log(
+                "debug",
+                f"parsing {len(index['blocks'])} series of {report_path} "
+                + f"with {workers} workers",
+            )
+        study_id, study_dict, report_dict = parse_indexed_report(
+            report_path,
+            index,
+            column_names,
+            workers,
+            projection,
+            fingerprints,
+            claim,
+            logger,
+        )
+    else:
+        # lines are decompressed and parsed block by block as they are read
+        with open_report(report_path, data) as opfi:
+            study_id, study_dict, report_dict = parse_report(
+                (r.replace('"', "") for r in opfi),
+                column_names,
+                report_path,
+                logger,
+                projection,
+                fingerprints,
+                claim,
+            )
+
+    # reports with skipped series are incomplete and not cached
+    if cache is not None and not skipped:
+        cache.put(
+            cache_key, (column_names, study_id, study_dict, report_dict, fingerprints)
+        )
+    return column_names, study_id, study_dict, report_dict
+
+
+def collect_series(
+    report_paths,
+    logger=None,
+    keys=None,
+    cache=None,
+    duplicate_policy="keep-first",
+    workers=1,
+    index_dir=None,
+    prefetch_depth=2,
+):
+    """
+    Parameters
+    ----------
+    report_paths : list of strings
+        list of filepaths to check for candidate column names within
+    keys : list of strings, optional
+        VevoLab Measurement_Mode_Parameter or Calculation keys to extract,
+        all calculations and measurements are extracted if not given
+    cache : LRUCache, optional
+        cache of parsed reports (see load_report)
+    duplicate_policy : string, optional
+        handling of series found in more than one report, one of
+        DUPLICATE_POLICIES
+    workers, index_dir : optional
+        parallel parsing of large reports (see load_report)
+    prefetch_depth : int, optional
+        number of reports read ahead while parsing (see load_reports)
+
+    Returns
+    -------
+    column_names : dict of lists
+        dict with 2 entries.
+            'MetaData Fields' - fields that are likely metadata containing
+            'VevoLab Measurement_Mode_Parameter or Calculation' - fields that
+                appear to contain measurements of calculations
+    table : vdeh_series.SeriesTable
+        series metadata and the measurements in long format, study level
+        metadata is referenced by the 'Study ID' column
+    study_df : pandas.DataFrame
+        one row per study, keyed by 'Study ID'
+
+    """
+
+    column_names = {}
+    column_names["MetaData Fields"] = []
+    column_names["VevoLab Measurement_Mode_Parameter or Calculation"] = []
+    studies = {}
+    reports = []
+    projection = make_projection(keys)
+    dedup = SeriesDeduplicator(duplicate_policy, logger)
+
+    # iterate through files (zip archives are read member by member), the
+    # next files are read while the current one is parsed
+    for rank, f, result in load_reports(
+        report_paths,
+        logger,
+        projection,
+        cache,
+        dedup,
+        workers,
+        index_dir,
+        prefetch_depth,
+    ):
+        file_column_names, study_id, study_dict, report_dict = result
+        for k, v in file_column_names.items():
+            column_names[k] += v
+        studies.setdefault(study_id, {}).update(study_dict)
+        reports.append(report_dict)
+
+    # drop copies replaced by a later report (keep-last), measurements are
+    # kept in long format so the cost follows the number of values present
+    # rather than series x every key found
+    table = vdeh_series.SeriesTable.from_reports(
+        (dedup.kept(rank, report_dict) for rank, report_dict in enumerate(reports)),
+        column_names["VevoLab Measurement_Mode_Parameter or Calculation"],
+    )
+    dedup.log_summary()
+
+    study_df = (
+        pandas.DataFrame.from_dict(studies, orient="index")
+        .rename_axis("Study ID")
+        .reset_index()
+    )
+
+    # clean up columns names to remove duplicates
+    for k, v in column_names.items():
+        column_names[k] = list(set(v))
+
+    return column_names, table, study_df
+
+
+def collect_data(
+    report_paths,
+    logger=None,
+    keys=None,
+    cache=None,
+    duplicate_policy="keep-first",
+    workers=1,
+    index_dir=None,
+    prefetch_depth=2,
+    sparse=False,
+):
+    """
+    same as collect_series, with the series as a wide DataFrame (one row per
+    series, measurement columns are pandas sparse columns if sparse is True)
+    instead of a SeriesTable
+    """
+    column_names, table, study_df = collect_series(
+        report_paths,
+        logger,
+        keys,
+        cache,
+        duplicate_policy,
+        workers,
+        index_dir,
+        prefetch_depth,
+    )
+    return column_names, table.wide(sparse=sparse), study_df
+
+
+def join_study_data(df, study_df):
+    """
+    produce the wide view of the extracted data, with the study level
+    metadata repeated on each series row (only done at export time)
+    """
+    if "Study ID" not in df.columns or study_df.shape[0] == 0:
+        return df
+    return df.join(study_df.set_index("Study ID"), on="Study ID", rsuffix=" (study)")
+
+
+def indexed_lookup(table, key_column, keys):
+    """
+    look up the row of table matching each entry of keys (key_column of the
+    table is made the index and probed once per distinct key, the keys are
+    categorical). Returns the rows aligned with keys (missing values where
+    there is no match) and the list of distinct keys without a match
+    """
+    lookup = table.drop_duplicates(key_column).set_index(key_column, drop=False)
+    keys = pandas.Series(keys).astype("category")
+    categories = keys.cat.categories
+    unmatched = list(categories[~categories.isin(lookup.index)])
+
+    rows = (
+        lookup.reindex(categories)
+        .reset_index(drop=True)
+        .reindex(keys.cat.codes.values)
+        .reset_index(drop=True)
+    )
+    return rows, unmatched
+
+
+def timepoint_windows(timepoint_data):
+    """
+    prepare the timepoint data sheet for matching - every row gets a window
+    [lo, hi) of series dates it matches: start to end if either is given
+    (dates without a time include the whole end day), the day of its date
+    widened by 'tolerance (days)' if given, otherwise the day of its date.
+    The center of a window (the middle of its date, else of start to end)
+    picks between windows that both contain a series
+    """
+    timepoints = timepoint_data.reset_index(drop=True).copy()
+    none = pandas.Series(pandas.NaT, index=timepoints.index, dtype="datetime64[ns]")
+
+    def dates(name):
+        if name not in timepoints.columns:
+            return none
+        return pandas.to_datetime(timepoints[name], errors="coerce")
+
+    if "date" in timepoints.columns:
+        timepoints["date"] = dates("date").dt.normalize()
+    date = dates("date")
+    start = dates("start")
+    end = dates("end")
+    end = end.where(end != end.dt.normalize(), end + pandas.Timedelta(days=1))
+    if TIMEPOINT_TOLERANCE in timepoints.columns:
+        tolerance = pandas.to_timedelta(
+            pandas.to_numeric(timepoints[TIMEPOINT_TOLERANCE], errors="coerce"),
+            unit="D",
+        )
+    else:
+        tolerance = pandas.Series(
+            pandas.NaT, index=timepoints.index, dtype="timedelta64[ns]"
+        )
+
+    explicit = start.notna() | end.notna()
+    windows = pandas.DataFrame(index=timepoints.index)
+    windows["nearest"] = ~explicit & tolerance.notna()
+    windows["window"] = ~windows["nearest"]
+    day = pandas.Timedelta(days=1)
+    windows["lo"] = start.fillna(pandas.Timestamp.min).where(
+        explicit, date - tolerance.fillna(pandas.Timedelta(0))
+    )
+    windows["hi"] = end.fillna(pandas.Timestamp.max).where(
+        explicit, date + day + tolerance.fillna(pandas.Timedelta(0))
+    )
+    # distances are measured from the middle of the day of the date, windows
+    # without a date from the middle of start to end (or their bounded side)
+    middle = (start + (end - start) / 2).fillna(start).fillna(end)
+    windows["center"] = (date + day / 2).fillna(middle)
+    if "Animal ID" in timepoints.columns:
+        animal = timepoints["Animal ID"]
+        windows["animal"] = animal.where(animal.notna(), "").astype(str).str.strip()
+    else:
+        windows["animal"] = ""
+
+    return timepoints, windows
+
+
+def nearest_windows(t, lo, hi, center, width, window_group, series_group):
+    """
+    index of the window [lo, hi) of the same group that contains each time t
+    and has the nearest center (then the narrowest, then the first), -1 where
+    no window contains t. Windows are sorted by group and lo, the candidates of
+    a time are the windows starting before it back to the first that may still
+    be open (a running maximum of hi), overlapping or nested windows are only
+    compared within that range
+    """
+    # group and rank of lo/hi/t as one sortable int64 key
+    ranks = numpy.unique(numpy.concatenate([lo, hi, t]), return_inverse=True)[1]
+    ranks = ranks.reshape(-1).astype("int64")
+    scale = ranks.max() + 1
+    lo_key = window_group * scale + ranks[: lo.size]
+    hi_key = window_group * scale + ranks[lo.size : 2 * lo.size]
+    t_key = series_group * scale + ranks[2 * lo.size :]
+
+    order = numpy.argsort(lo_key, kind="stable")
+    first = numpy.searchsorted(
+        numpy.maximum.accumulate(hi_key[order]), t_key, side="right"
+    )
+    last = numpy.searchsorted(lo_key[order], t_key, side="right")
+    counts = numpy.maximum(last - first, 0)
+
+    # one (time, candidate window) pair per window in the range of each time
+    pair_time = numpy.repeat(numpy.arange(t.size), counts)
+    offsets = numpy.arange(counts.sum()) - numpy.repeat(
+        counts.cumsum() - counts, counts
+    )
+    pair_window = order[numpy.repeat(first, counts) + offsets]
+    inside = hi_key[pair_window] > t_key[pair_time]
+    pair_time, pair_window = pair_time[inside], pair_window[inside]
+
+    distance = numpy.abs(t[pair_time].astype("float64") - center[pair_window])
+    best = numpy.lexsort((pair_window, width[pair_window], distance, pair_time))
+    pair_time, pair_window = pair_time[best], pair_window[best]
+    head = numpy.ones(pair_time.size, bool)
+    head[1:] = pair_time[1:] != pair_time[:-1]
+
+    choice = numpy.full(t.size, -1)
+    choice[pair_time[head]] = pair_window[head]
+    return choice
+
+
+def match_timepoints(timepoint_data, series_dates, animal_ids=None, logger=None):
+    """
+    Parameters
+    ----------
+    timepoint_data : pandas.DataFrame
+        timepoint data sheet - a 'timepoint' per row matched by its 'date',
+        'start'/'end' window or 'tolerance (days)' around its date, rows with
+        an 'Animal ID' only match series of that animal
+    series_dates : array-like
+        Series Date of every series
+    animal_ids : array-like, optional
+        Animal ID of every series
+
+    Returns
+    -------
+    rows : pandas.DataFrame
+        timepoint data row matched to each series (missing values where
+        there is no match)
+    matched : numpy.ndarray of bool
+        which series were matched
+
+    """
+    timepoints, windows = timepoint_windows(timepoint_data)
+    times = pandas.Series(pandas.to_datetime(series_dates)).reset_index(drop=True)
+    if animal_ids is None:
+        animals = pandas.Series("", index=times.index)
+    else:
+        animals = pandas.Series(animal_ids).astype(str).reset_index(drop=True)
+    match = numpy.full(len(times), -1)
+    if windows.shape[0] == 0:
+        return timepoints.reindex(match).reset_index(drop=True), match >= 0
+
+    # dates as ns since the epoch, distances and widths as floats (unbounded
+    # windows would overflow int64)
+    t = times.values.astype("datetime64[ns]").view("int64")
+    lo = windows["lo"].values.astype("datetime64[ns]").view("int64")
+    hi = windows["hi"].values.astype("datetime64[ns]").view("int64")
+    center = windows["center"].values.astype("datetime64[ns]").view("int64")
+    width = hi.astype("float64") - lo.astype("float64")
+    usable = windows["lo"].notna().values & windows["hi"].notna().values
+    usable &= windows["center"].notna().values
+    codes = pandas.factorize(pandas.concat([windows["animal"], animals]))[0]
+    window_animal, series_animal = codes[: len(windows)], codes[len(windows) :]
+
+    # every window that contains a series is a candidate, the one with the
+    # nearest center is matched (then the narrowest, then the first row). Animal
+    # specific rows take precedence over rows shared by all animals, windows
+    # over nearest dates
+    for per_animal in [True, False]:
+        for kind in ["window", "nearest"]:
+            rows = numpy.flatnonzero(
+                windows[kind].values
+                & usable
+                & ((windows["animal"] != "").values == per_animal)
+            )
+            pending = numpy.flatnonzero((match < 0) & times.notna().values)
+            if rows.size == 0 or pending.size == 0:
+                continue
+
+            if per_animal:
+                groups = window_animal[rows], series_animal[pending]
+            else:
+                groups = numpy.zeros(rows.size, int), numpy.zeros(pending.size, int)
+            choice = nearest_windows(
+                t[pending], lo[rows], hi[rows], center[rows], width[rows], *groups
+            )
+            found = choice >= 0
+            match[pending[found]] = rows[choice[found]]
+
+    matched = match >= 0
+    rows = timepoints.reindex(match).reset_index(drop=True)
+    return rows, matched
+
+
+def join_metadata(df, animal_data, timepoint_data, logger=None):
+    """
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        accumulated series data for all reports, with 'Animal ID' and
+        'Series Date' columns
+    animal_data : pandas.DataFrame
+        animal data sheet, keyed by 'Animal ID'
+    timepoint_data : pandas.DataFrame
+        timepoint data sheet, matched to the Series Date by match_timepoints
+
+    Returns
+    -------
+    pandas.DataFrame
+        animal metadata, timepoint metadata and series data for every series
+        (series without a matching animal or timepoint are kept)
+
+    """
+    df = df.reset_index(drop=True)
+    parts = []
+
+    if animal_data.shape[0] > 0:
+        animals = animal_data.copy()
+        animals["Animal ID"] = animals["Animal ID"].astype(str)
+        animal_rows, unmatched = indexed_lookup(
+            animals, "Animal ID", df["Animal ID"].astype(str).values
+        )
+        if unmatched and logger:
+            logger.log(
+                "warning",
+                "Animal ID not found in animal data: "
+                + ", ".join([str(i) for i in unmatched]),
+            )
+        parts.append(animal_rows)
+
+    if timepoint_data.shape[0] > 0:
+        timepoint_rows, matched = match_timepoints(
+            timepoint_data, df["Series Date"].values, df["Animal ID"].values
+        )
+        if not matched.all() and logger:
+            unmatched = df.loc[~matched, ["Animal ID", "Series Date"]]
+            listed = [f"{a} {d}" for a, d in unmatched.head(20).itertuples(index=False)]
+            if unmatched.shape[0] > len(listed):
+                listed.append(f"... {unmatched.shape[0] - len(listed)} more")
+            logger.log(
+                "warning",
+                f"{unmatched.shape[0]} series not matched to a timepoint: "
+                + ", ".join(listed),
+            )
+        parts.append(timepoint_rows)
+
+    joined_columns = [c for p in parts for c in p.columns]
+    parts = [p[[c for c in p.columns if c not in df.columns]] for p in parts]
+    parts.insert(0, df[[c for c in joined_columns if c in df.columns]])
+    parts.append(df[[c for c in df.columns if c not in joined_columns]])
+
+    return pandas.concat(parts, axis=1)
+
+
+def expand_report_paths(paths):
+    """
+    expand any directories in paths to the VevoLab reports they contain
+    (searched recursively, sorted) and zip archives to their report members,
+    other files are passed through unchanged
+    """
+    report_paths = []
+    for p in paths:
+        if os.path.isdir(p):
+            for root, dirs, files in os.walk(p):
+                dirs.sort()
+                for f in sorted(files):
+                    if is_report_name(f):
+                        report_paths.append(os.path.join(root, f))
+                    elif f.lower().endswith(".zip"):
+                        report_paths += archive_members(os.path.join(root, f))
+        elif p.lower().endswith(".zip") and os.path.isfile(p):
+            report_paths += archive_members(p)
+        else:
+            report_paths.append(p)
+    return report_paths
+
+
+def scan_report(report_path):
+    """
+    header-only scan of one report (see scan_reports) - only the first field
+    of each row (and mode/parameter of measurement rows) is read, values are
+    not converted and no DataFrame is built for the series
+
+    Returns
+    -------
+    scan : dict
+        'fingerprint' - file_fingerprint of the scanned file
+        'file keys' - [field type, key] of every key in the report
+        'series keys' - [field type, key, number of series] of every key
+            found in a series
+        'series' - [Animal ID, Series Date] of each series
+
+    """
+    series_counts = collections.Counter()
+    file_keys = set()
+    series = []
+    series_keys = set()
+    series_values = {}
+    in_header = True
+    section = None
+
+    def end_series():
+        series_counts.update(series_keys)
+        file_keys.update(series_keys)
+        if not in_header:
+            series.append(
+                [series_values.get("Animal ID"), series_values.get("Series Date")]
+            )
+
+    with open_report(report_path) as opfi:
+        for r in opfi:
+            first, sep, rest = r.rstrip("\n").replace('"', "").partition(",")
+
+            if first == "Series Name":
+                end_series()
+                series_keys = set()
+                series_values = {}
+                in_header = False
+                section = None
+                continue
+
+            if first in SECTION_MARKERS:
+                if first == "" or first == "No measurements found":
+                    if section != "notes":
+                        section = None
+                    continue
+                elif first == "Calculation":
+                    section = "calculation"
+                    continue
+                elif first == "Measurement":
+                    section = "measurement"
+                    continue
+                elif first == "Version Information":
+                    section = "version"
+                    continue
+                elif first == "Series Notes":
+                    section = "notes"
+                elif first == "Application":
+                    section = None
+
+            if in_header:
+                if section is None and sep:
+                    file_keys.add(("Study MetaData", first))
+            elif section == "calculation":
+                series_keys.add(("Calculation", first))
+            elif section == "measurement":
+                mode, _, rest = rest.partition(",")
+                parameter = rest.partition(",")[0]
+                series_keys.add(
+                    (
+                        "Measurement",
+                        "_".join([first.rstrip("0123456789"), mode, parameter]),
+                    )
+                )
+            elif section is None:
+                series_keys.add(("MetaData", first))
+                if first in ["Animal ID", "Series Date"]:
+                    series_values[first] = rest.partition(",")[0].strip()
+            elif first == "Series Notes":
+                series_keys.add(("MetaData", first))
+
+    end_series()
+
+    return {
+        "fingerprint": list(file_fingerprint(report_path)),
+        "file keys": sorted(file_keys),
+        "series keys": sorted([k[0], k[1], n] for k, n in series_counts.items()),
+        "series": series,
+    }
+
+
+def load_report_scan(report_path, index_dir=None):
+    """
+    header-only scan of a report (see scan_report), reused from index_dir
+    while the report is unchanged and saved there after scanning
+    """
+    fingerprint = list(file_fingerprint(report_path))
+    scan_path = None
+    if index_dir:
+        scan_path = os.path.join(
+            index_dir,
+            hashlib.sha1(fingerprint[0].encode()).hexdigest() + ".scan.json",
+        )
+        try:
+            with open(scan_path) as f:
+                scan = json.load(f)
+            if scan["fingerprint"] == fingerprint:
+                return scan
+        except (OSError, ValueError, KeyError):
+            pass
+
+    scan = scan_report(report_path)
+    if scan_path:
+        os.makedirs(index_dir, exist_ok=True)
+        with open(scan_path + ".tmp", "w") as f:
+            json.dump(scan, f)
+        os.replace(scan_path + ".tmp", scan_path)
+    return scan
+
+
+def scan_reports(report_paths, logger=None, index_dir=None, series=None):
+    """
+    Parameters
+    ----------
+    report_paths : list of strings
+        filepaths or directories (searched recursively) of VevoLab reports
+    index_dir : string, optional
+        directory where the scan of each report is kept, unchanged reports
+        are not scanned again
+    series : list, optional
+        if given, the Animal ID and Series Date of every series are appended
+        to it
+
+    Returns
+    -------
+    catalog : pandas.DataFrame
+        one row per key found in the reports with columns
+            'Field Type' - 'Study MetaData', 'MetaData', 'Calculation' or
+                'Measurement'
+            'Key' - metadata field name or VevoLab
+                Measurement_Mode_Parameter or Calculation
+            'Series' - number of series containing the key
+            'Files' - number of reports containing the key
+
+    """
+    series_counts = collections.Counter()
+    file_counts = collections.Counter()
+
+    for f in expand_report_paths(report_paths):
+        if logger:
+            logger.log("debug", f"scanning {f}")
+        scan = load_report_scan(f, index_dir)
+        file_counts.update(tuple(k) for k in scan["file keys"])
+        series_counts.update({(t, k): n for t, k, n in scan["series keys"]})
+        if series is not None:
+            series.extend(scan["series"])
+
+    catalog = pandas.DataFrame(
+        [
+            {
+                "Field Type": k[0],
+                "Key": k[1],
+                "Series": series_counts.get(k, 0),
+                "Files": n,
+            }
+            for k, n in file_counts.items()
+        ],
+        columns=["Field Type", "Key", "Series", "Files"],
+    )
+    return catalog.sort_values(["Field Type", "Key"]).reset_index(drop=True)
+
+
+def write_settings_template(catalog, output_path, logger=None):
+    """
+    write a settings file, ready to edit, from the catalog of scan_reports -
+    the column names sheet lists every calculation/measurement found (rows
+    that are not needed can be deleted and the Output Name edited)
+    """
+    measurements = catalog[catalog["Field Type"].isin(["Calculation", "Measurement"])]
+    simple_export(
+        {
+            "animal data": pandas.DataFrame(
+                columns=["Animal ID", "DOB", "Treatment Date", "Study Start Date"]
+            ),
+            "timepoint data": pandas.DataFrame(
+                columns=["date", "timepoint", "start", "end", TIMEPOINT_TOLERANCE]
+            ),
+            "derived data": pandas.DataFrame(
+                {"calculation": DERIVED_CALCULATIONS, "Include": 0}
+            ),
+            "column names": pandas.DataFrame(
+                {
+                    "VevoLab Measurement_Mode_Parameter or Calculation": measurements[
+                        "Key"
+                    ],
+                    "Output Name": measurements["Key"],
+                    "Series": measurements["Series"],
+                }
+            ),
+            "model": pandas.DataFrame(columns=["factors"]),
+            "catalog": catalog,
+        },
+        output_path,
+        logger,
+    )
+
+
+def simple_export(dict_of_dfs, output_path, logger=None):
+    writer = pandas.ExcelWriter(output_path, engine="xlsxwriter")
+
+    try:
+        for k, v in dict_of_dfs.items():
+            v.to_excel(writer, sheet_name=k, index=False)
+        writer.close()
+        if logger:
+            logger.log("info", f"Data Saved to file - {output_path}")
+
+    except Exception as e:
+        if logger:
+            logger.log("error", f"Unable to save output - {e}")
+        if logger:
+            logger.log("error", traceback.format_exc())
+
+
+def columnar_frame(df):
+    """
+    copy of df that columnar formats can store with its types intact - object
+    columns holding only numbers become numeric, only datetimes become
+    datetime64 and any other mixture is stored as text
+    """
+    df = df.reset_index(drop=True)
+    df.columns = [str(c) for c in df.columns]
+    for c in df.columns[[isinstance(t, pandas.SparseDtype) for t in df.dtypes]]:
+        df[c] = df[c].sparse.to_dense()
+    for c in df.columns[df.dtypes == object]:
+        inferred = pandas.api.types.infer_dtype(df[c], skipna=True)
+        if inferred in ["integer", "floating", "mixed-integer-float", "decimal"]:
+            df[c] = pandas.to_numeric(df[c], errors="coerce")
+        elif inferred in ["datetime", "datetime64", "date"]:
+            df[c] = pandas.to_datetime(df[c], errors="coerce")
+        elif inferred not in ["string", "empty"]:
+            df[c] = df[c].where(df[c].isna(), df[c].astype(str))
+    return df
+
+
+def table_export(dict_of_dfs, output_path, formats, logger=None):
+    """
+    Parameters
+    ----------
+    dict_of_dfs : dict of pandas.DataFrames
+        tables to export, keyed by table name
+    output_path : string
+        path of the excel output, tables are saved beside it as
+        <output name>_<table name>.<format>
+    formats : list of strings
+        formats to save the tables in (see EXPORT_FORMATS)
+
+    """
+    base_path = os.path.splitext(output_path)[0]
+    for fmt in formats or []:
+        if fmt in ["parquet", "feather"]:
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                if logger:
+                    logger.log(
+                        "error", f"pyarrow is required for {fmt} export - skipping"
+                    )
+                continue
+
+        for name, df in dict_of_dfs.items():
+            table_path = f"{base_path}_{name}.{fmt}"
+            try:
+                if fmt == "parquet":
+                    columnar_frame(df).to_parquet(table_path, index=False)
+                elif fmt == "feather":
+                    columnar_frame(df).to_feather(table_path)
+                elif fmt == "csv":
+                    df.to_csv(table_path, index=False, chunksize=CSV_CHUNKSIZE)
+                else:
+                    if logger:
+                        logger.log("warning", f"Unknown export format: {fmt}")
+                    break
+                if logger:
+                    logger.log("info", f"Data Saved to file - {table_path}")
+            except Exception as e:
+                if logger:
+                    logger.log("error", f"Unable to save {table_path} - {e}")
+                if logger:
+                    logger.log("error", traceback.format_exc())
+
+
+def fingerprint_frame(df, *settings):
+    """
+    content hash of a DataFrame (values, column names and dtypes) together
+    with any settings that affect results computed from it
+    """
+    h = hashlib.sha256()
+    h.update(pandas.util.hash_pandas_object(df, index=False).values.tobytes())
+    h.update(repr([(c, str(t)) for c, t in df.dtypes.items()]).encode())
+    h.update(repr(settings).encode())
+    return h.hexdigest()
+
+
+def summary_plot_key(agg_df, title, labels, settings):
+    """
+    content hash of everything that ends up in a summary plot - the plotted
+    group values, title, axis labels, style settings and matplotlib version
+    """
+    import matplotlib
+
+    return fingerprint_frame(
+        agg_df,
+        title,
+        labels,
+        {k: v for k, v in settings.items() if k.startswith("plot_")},
+        matplotlib.__version__,
+    )
+
+
+def render_summary_plot(agg_df, title, labels, settings=OUTCOME_ANALYSIS_SETTINGS):
+    """
+    render the summary plot (mean +/- sem per group) of agg_df, returns png
+    bytes
+    """
+    from matplotlib import pyplot
+
+    temp_plot = agg_df.plot(
+        kind=settings["plot_kind"],
+        title=title,
+        legend=True,
+        y="mean",
+        x="axis",
+    )
+    temp_plot.errorbar(
+        agg_df["mean"],
+        agg_df["axis"],
+        xerr=agg_df["sem"],
+        ecolor="black",
+        linewidth=0,
+        elinewidth=1,
+        capsize=4,
+    )
+    temp_plot.set(xlabel=labels[0], ylabel=labels[1])
+    temp_plot = temp_plot.get_figure()
+
+    png_buffer = io.BytesIO()
+    temp_plot.savefig(png_buffer, format="png", bbox_inches="tight")
+    pyplot.close(temp_plot)
+    return png_buffer.getvalue()
+
+
+def write_if_changed(path, content):
+    """
+    write bytes to path unless the file already holds exactly these bytes,
+    returns True if the file was written
+    """
+    try:
+        if os.path.getsize(path) == len(content):
+            with open(path, "rb") as f:
+                if f.read() == content:
+                    return False
+    except OSError:
+        pass
+    with open(path, "wb") as f:
+        f.write(content)
+    return True
+
+
+def analyze_outcome(
+    temp_df, c, ind_vars, settings=OUTCOME_ANALYSIS_SETTINGS, plot_cache=None
+):
+    """
+    Parameters
+    ----------
+    temp_df : pandas.DataFrame
+        cleaned data for one outcome measure - numeric column c and the
+        independent factor columns, no missing values
+    c : string
+        name of the outcome measure column
+    ind_vars : list of strings
+        independent factors from the model
+    settings : dict, optional
+        test and plot settings
+    plot_cache : PlotCache, optional
+        cache of rendered plots, the plot is only rendered if its data,
+        labels or style are not in the cache
+
+    Returns
+    -------
+    table : pandas.DataFrame
+        ANOVA table with levene and shapiro p values
+    pairwise_df : pandas.DataFrame
+        pairwise comparisons (t-test and mann-whitney)
+    png_bytes : bytes
+        summary plot (mean +/- sem per group) as png
+
+    """
+    # imported here, the stats libraries are slow to import and only needed
+    # once an analysis runs
+    import pingouin
+
+    temp_df = temp_df.copy()
+    iv_dict_rev = {}
+
+    # prepare key for independent factors
+    # - column names #note reserved format style
+    for k in range(len(ind_vars)):
+        iv_dict_rev["__F{}__".format(k)] = ind_vars[k]
+
+    temp_df["om"] = temp_df[c]
+    temp_df["gp"] = ""
+
+    for k in iv_dict_rev:
+        temp_df[k] = temp_df[iv_dict_rev[k]]
+        temp_df["gp"] += temp_df[k].astype(str)
+
+    homosced = pingouin.homoscedasticity(temp_df, dv="om", group="gp")["pval"].values[0]
+    try:
+        normal = pingouin.normality(temp_df, dv="om", group="gp")["pval"].values[0]
+    except:
+        normal = "unable to test"
+    table = pingouin.anova(
+        data=temp_df,
+        dv="om",
+        between=list(iv_dict_rev.keys()),
+        ss_type=settings["ss_type"],
+    )
+    table["levene pval"] = str(homosced)
+    table["shapiro pval"] = str(normal)
+
+    # replace independent factor placeholders with original names
+    for k in iv_dict_rev:
+        table["Source"] = table["Source"].replace(k, iv_dict_rev[k], regex=True)
+    table["outcome_measure"] = c
+
+    # create data frame to assist with summary plot generation
+    #   (uses pandas agg function)
+    agg_df = (
+        temp_df.groupby(ind_vars)[c]
+        .agg(mean="mean", len="count", sem="sem")
+        .reset_index()
+    )
+    agg_df["axis"] = agg_df[ind_vars].astype(str).agg("_".join, axis=1)
+
+    title = c + " [mean+/-sem]"
+    labels = (c, "_".join(ind_vars))
+
+    # re-render only if the plotted values, labels or style changed
+    plot_key = summary_plot_key(agg_df, title, labels, settings)
+    png_bytes = plot_cache.get(plot_key) if plot_cache is not None else None
+    if png_bytes is None:
+        png_bytes = render_summary_plot(agg_df, title, labels, settings)
+        if plot_cache is not None:
+            plot_cache.put(plot_key, png_bytes)
+
+    # produce pairwise comparisons
+    pairwise_list = []
+    pairwise_rows = []
+
+    for i in range(len(iv_dict_rev)):
+        pairwise_list += list(itertools.combinations(iv_dict_rev, i + 1))
+
+    for i in pairwise_list:
+        if len(i) > 1:
+            temp_df["*".join(i)] = (
+                temp_df[[j for j in i]].astype(str).agg(" * ".join, axis=1)
+            )
+
+        pairs = list(itertools.combinations(temp_df["*".join(i)].unique(), 2))
+        for p in pairs:
+
+            if (
+                len(temp_df[temp_df["*".join(i)] == p[0]]) < 2
+                or len(temp_df[temp_df["*".join(i)] == p[1]]) < 2
+            ):
+                pairwise_rows.append(
+                    pandas.DataFrame(
+                        {
+                            "outcome_measure": [c],
+                            "comparison": [" vs ".join([str(q) for q in p])],
+                            "notes": ["cannot compare"],
+                        }
+                    )
+                )
+                continue
+
+            temp_p_df = pingouin.ttest(
+                temp_df[temp_df["*".join(i)] == p[0]]["om"],
+                temp_df[temp_df["*".join(i)] == p[1]]["om"],
+            )
+            temp_np_df = pingouin.mwu(
+                temp_df[temp_df["*".join(i)] == p[0]]["om"],
+                temp_df[temp_df["*".join(i)] == p[1]]["om"],
+            )
+            pw_stats_df = temp_p_df
+            pw_stats_df.index = ["PAIRWISE"]
+            pw_stats_df["ttest pval"] = temp_p_df["p-val"]
+            pw_stats_df["mwu pval"] = temp_np_df["p-val"].values[0]
+            pw_stats_df.pop("p-val")
+            pw_stats_df["outcome_measure"] = c
+            pw_stats_df["comparison"] = " vs ".join([str(q) for q in (p)])
+            pairwise_rows.append(pw_stats_df)
+
+    pairwise_df = pandas.concat(pairwise_rows) if pairwise_rows else pandas.DataFrame()
+
+    return table, pairwise_df, png_bytes
+
+
+# %% define classes
+
+
+# stages of generate_full_report, in order - each stage is cached on a key
+# built from the key of the stage it depends on and its own settings, so a
+# re-run starts from the first stage whose inputs changed
+REPORT_STAGES = ["parse", "merge", "derived", "sort", "reshape", "stats"]
+
+
+def stage_key(stage, previous_key, *parts):
+    """
+    key of a report stage - hash of the key of the stage it depends on and the
+    settings (DataFrames or plain values) used by the stage
+    """
+    h = hashlib.sha256()
+    h.update(f"{stage}:{previous_key}".encode())
+    for p in parts:
+        if isinstance(p, pandas.DataFrame):
+            h.update(fingerprint_frame(p).encode())
+        else:
+            h.update(repr(p).encode())
+    return f"{stage}-{h.hexdigest()[:32]}"
+
+
+def run_stage(
+    stage, key, func, cache=None, checkpoint_dir=None, reuse=True, logger=None
+):
+    """
+    Parameters
+    ----------
+    stage : string
+        name of the stage (one of REPORT_STAGES)
+    key : string
+        key of the stage returned by stage_key
+    func : callable
+        runs the stage and returns its outputs
+    cache : LRUCache, optional
+        in memory cache of stage outputs
+    checkpoint_dir : string, optional
+        directory for stage checkpoints (pickled outputs)
+    reuse : bool, optional
+        if False the stage is always run (outputs are still cached)
+
+    Returns
+    -------
+    outputs
+        outputs of the stage (as returned by func)
+
+    """
+    outputs = cache.get(key) if cache is not None and reuse else None
+    if outputs is not None:
+        if logger:
+            logger.log("debug", f"stage {stage} - using cached outputs")
+        return outputs
+
+    checkpoint_path = (
+        os.path.join(checkpoint_dir, key + ".pkl") if checkpoint_dir else None
+    )
+    if reuse and checkpoint_path and os.path.exists(checkpoint_path):
+        try:
+            with open(checkpoint_path, "rb") as f:
+                outputs = pickle.load(f)
+            if logger:
+                logger.log("debug", f"stage {stage} - loaded {checkpoint_path}")
+        except Exception as e:
+            if logger:
+                logger.log("warning", f"Unable to load checkpoint for {stage}: {e}")
+
+    if outputs is None:
+        start = time.perf_counter()
+        outputs = func()
+        if logger:
+            logger.log(
+                "debug",
+                f"stage {stage} - finished in {time.perf_counter() - start:.2f} s",
+            )
+        if checkpoint_path:
+            try:
+                os.makedirs(checkpoint_dir, exist_ok=True)
+                with open(checkpoint_path + ".tmp", "wb") as f:
+                    pickle.dump(outputs, f)
+                os.replace(checkpoint_path + ".tmp", checkpoint_path)
+            except Exception as e:
+                if logger:
+                    logger.log("warning", f"Unable to save checkpoint for {stage}: {e}")
+
+    if cache is not None:
+        cache.put(key, outputs)
+    return outputs
+
+
+def parse_reports(
+    input_paths,
+    column_names,
+    logger=None,
+    cache=None,
+    duplicate_policy="keep-first",
+    workers=1,
+    index_dir=None,
+    prefetch_depth=2,
+):
+    """
+    Parameters
+    ----------
+    input_paths : list of strings
+        filepaths of VevoLab reports
+    column_names : pandas.DataFrame
+        column names sheet of the settings
+    cache : LRUCache, optional
+        cache of parsed reports (see load_report)
+    duplicate_policy : string, optional
+        handling of series found in more than one report, one of
+        DUPLICATE_POLICIES
+    workers, index_dir : optional
+        parallel parsing of large reports (see load_report)
+    prefetch_depth : int, optional
+        number of reports read ahead while parsing (see load_reports)
+
+    Returns
+    -------
+    primary_df : pandas.DataFrame
+        one row per series with Animal ID, Series Date and the requested
+        measurements (renamed to their output names)
+    column_styles : dict
+        output name of every requested measurement found in the reports
+
+    """
+    column_styles = dict(
+        column_names[
+            [
+                "VevoLab Measurement_Mode_Parameter or Calculation",
+                "Output Name",
+            ]
+        ]
+        .dropna()
+        .values
+    )
+
+    # grab data from the reports - only the measurements named in the column
+    # names sheet are parsed
+    found_keys = set()
+    projection = make_projection(column_styles.keys())
+    dedup = SeriesDeduplicator(duplicate_policy, logger)
+    reports = []
+    for rank, current_file, result in load_reports(
+        input_paths,
+        logger,
+        projection,
+        cache,
+        dedup,
+        workers,
+        index_dir,
+        prefetch_depth,
+    ):
+        file_column_names, study_id, study_dict, report_dict = result
+        found_keys.update(
+            file_column_names["VevoLab Measurement_Mode_Parameter or Calculation"]
+        )
+        reports.append(report_dict)
+    dedup.log_summary()
+
+    # only the requested columns of the long format series are made wide
+    table = vdeh_series.SeriesTable.from_reports(
+        (dedup.kept(rank, report_dict) for rank, report_dict in enumerate(reports)),
+        found_keys,
+    )
+    primary_df = table.wide(["Animal ID", "Series Date"] + list(column_styles))
+    primary_df["Series Date"] = pandas.to_datetime(primary_df["Series Date"])
+    primary_df = primary_df.rename(columns=column_styles)
+
+    # report requested columns that were not found in any report once, and
+    # leave them out of the rest of the analysis
+    missing_keys = [k for k in column_styles if k not in found_keys]
+    if missing_keys:
+        if logger:
+            logger.log(
+                "warning",
+                "Requested columns not found in any report: " + ", ".join(missing_keys),
+            )
+        primary_df = primary_df.drop(
+            columns=[column_styles.pop(k) for k in missing_keys]
+        )
+
+    return primary_df, column_styles
+
+
+def spill_reports(
+    input_paths,
+    column_names,
+    spill_dir,
+    animal_data,
+    timepoint_data,
+    derived_data,
+    factors,
+    chunk_series=vdeh_chunked.CHUNK_SERIES,
+    logger=None,
+    duplicate_policy="keep-first",
+    workers=1,
+    index_dir=None,
+    prefetch_depth=2,
+):
+    """
+    out-of-core version of the parse, merge and derived stages - series are
+    collected in chunks of chunk_series, each chunk is joined to the animal
+    and timepoint metadata, gets its derived columns and is written to
+    spill_dir as parquet (see vdeh_chunked.read_chunks), then only its factor
+    cell statistics are kept
+
+    Parameters
+    ----------
+    input_paths, column_names, logger, duplicate_policy, workers, index_dir,
+    prefetch_depth
+        see parse_reports
+    spill_dir : string
+        directory of the chunks, chunks of an earlier run are removed
+    animal_data, timepoint_data : pandas.DataFrame
+        metadata sheets (see join_metadata)
+    derived_data : pandas.DataFrame
+        derived data sheet (see calculate_derived_data)
+    factors : list of strings
+        independent factors of the model, the cells of the accumulator
+    chunk_series : int, optional
+        number of series per chunk
+
+    Returns
+    -------
+    accumulator : vdeh_chunked.GroupAccumulator
+        cell statistics of every outcome measure found in the reports
+    column_styles : dict
+        output name of every requested measurement found in the reports
+    chunks : list of tuples
+        (path, number of series) of every chunk written
+
+    """
+    column_styles = dict(
+        column_names[
+            [
+                "VevoLab Measurement_Mode_Parameter or Calculation",
+                "Output Name",
+            ]
+        ]
+        .dropna()
+        .values
+    )
+    if duplicate_policy == "keep-last":
+        # a later copy can not replace a series that was already spilled
+        if logger:
+            logger.log(
+                "warning", "keep-last is not available out-of-core, using keep-first"
+            )
+        duplicate_policy = "keep-first"
+
+    found_keys = set()
+    projection = make_projection(column_styles.keys())
+    dedup = SeriesDeduplicator(duplicate_policy, logger)
+    accumulator = vdeh_chunked.GroupAccumulator(factors, column_styles.values())
+    vdeh_chunked.clear_chunks(spill_dir)
+    chunks = []
+    pending = []
+
+    def spill(series):
+        table = vdeh_series.SeriesTable.from_reports(
+            [dict(enumerate(series))], found_keys
+        )
+        # every chunk has every requested column, so the chunks share a layout
+        df = table.wide(["Animal ID", "Series Date"] + list(column_styles))
+        df["Series Date"] = pandas.to_datetime(df["Series Date"])
+        df = df.rename(columns=column_styles)
+        df = join_metadata(df, animal_data, timepoint_data, logger)
+        df = calculate_derived_data(df, derived_data, logger)
+        accumulator.update(df)
+        path = vdeh_chunked.write_chunk(columnar_frame(df), spill_dir, len(chunks))
+        chunks.append((path, df.shape[0]))
+        if logger:
+            logger.log("debug", f"{df.shape[0]} series spilled to {path}")
+
+    # reports are parsed without the report cache, which would keep every
+    # report in memory
+    for rank, current_file, result in load_reports(
+        input_paths,
+        logger,
+        projection,
+        None,
+        dedup,
+        workers,
+        index_dir,
+        prefetch_depth,
+    ):
+        file_column_names, study_id, study_dict, report_dict = result
+        found_keys.update(
+            file_column_names["VevoLab Measurement_Mode_Parameter or Calculation"]
+        )
+        pending.extend(dedup.kept(rank, report_dict).values())
+        while len(pending) >= chunk_series:
+            spill(pending[:chunk_series])
+            pending = pending[chunk_series:]
+    if pending or not chunks:
+        spill(pending)
+    dedup.log_summary()
+
+    missing_keys = [k for k in column_styles if k not in found_keys]
+    if missing_keys:
+        if logger:
+            logger.log(
+                "warning",
+                "Requested columns not found in any report: " + ", ".join(missing_keys),
+            )
+        for k in missing_keys:
+            column_styles.pop(k)
+
+    if logger:
+        logger.log(
+            "info",
+            f"{accumulator.rows} series spilled to {len(chunks)} chunks in {spill_dir}",
+        )
+    return accumulator, column_styles, chunks
+
+
+def chunked_stats(accumulator, column_styles, logger=None, plot_cache=None):
+    """
+    Returns
+    -------
+    summary_df : pandas.DataFrame
+        N, mean, variance, SD and SEM of every outcome measure per factor cell
+    stats_df : pandas.DataFrame
+        anova tables of every outcome measure, from the cell statistics
+    plots : list of tuples
+        (outcome measure, png bytes) of the plot of every outcome measure
+
+    """
+    outcomes = list(column_styles.values())
+    summary_df = accumulator.summary(outcomes)
+    stats_tables = []
+    plots = []
+    for c in outcomes:
+        try:
+            stats_tables.append(
+                accumulator.anova(c, OUTCOME_ANALYSIS_SETTINGS["ss_type"])
+            )
+        except Exception as e:
+            if logger:
+                logger.log("error", f"Unable to run ANOVA of {c}: {e}")
+            continue
+
+        agg_df = accumulator.plot_frame(c)
+        title = c + " [mean+/-sem]"
+        labels = (c, "_".join(accumulator.factors))
+        plot_key = summary_plot_key(agg_df, title, labels, OUTCOME_ANALYSIS_SETTINGS)
+        png_bytes = plot_cache.get(plot_key) if plot_cache is not None else None
+        if png_bytes is None:
+            png_bytes = render_summary_plot(agg_df, title, labels)
+            if plot_cache is not None:
+                plot_cache.put(plot_key, png_bytes)
+        plots.append((c, png_bytes))
+
+    stats_df = pandas.concat(stats_tables) if stats_tables else pandas.DataFrame()
+    return summary_df, stats_df, plots
+
+
+def validate_settings(
+    catalog, series, animal_data, timepoint_data, derived_data, column_names, model
+):
+    """
+    Parameters
+    ----------
+    catalog : pandas.DataFrame
+        keys found in the reports (see scan_reports)
+    series : pandas.DataFrame
+        'Animal ID' and 'Series Date' of every series in the reports
+    animal_data, timepoint_data, derived_data, column_names, model :
+        pandas.DataFrame
+        settings sheets
+
+    Returns
+    -------
+    problems : pandas.DataFrame
+        one row per problem found with columns
+            'Severity' - 'error' (the report can not be produced as set up)
+                or 'warning' (parts of the report will be missing)
+            'Sheet' - settings sheet the problem was found in
+            'Item' - column, key or calculation concerned
+            'Problem' - description of the problem
+
+    only the settings and the header-level scan of the reports are used, so
+    the check runs before any report is parsed
+
+    """
+    problems = []
+
+    def problem(severity, sheet, item, text):
+        problems.append([severity, sheet, str(item), text])
+
+    def listed(values, limit=10):
+        values = [str(v) for v in values]
+        more = f" ... {len(values) - limit} more" if len(values) > limit else ""
+        return ", ".join(values[:limit]) + more
+
+    series = series.reset_index(drop=True)
+    animals = series["Animal ID"].fillna("").astype(str)
+    available = ["Animal ID", "Series Date"]
+
+    # requested measurements should be in at least one report
+    key_column = "VevoLab Measurement_Mode_Parameter or Calculation"
+    if column_names.shape[0] > 0:
+        if not {key_column, "Output Name"} <= set(column_names.columns):
+            problem(
+                "error",
+                "column names",
+                "",
+                f"the sheet needs '{key_column}' and 'Output Name' columns",
+            )
+        else:
+            requested = column_names[[key_column, "Output Name"]].dropna()
+            found = set(
+                catalog.loc[
+                    catalog["Field Type"].isin(["Calculation", "Measurement"]), "Key"
+                ]
+            )
+            missing = [k for k in requested[key_column] if k not in found]
+            if missing and len(missing) == requested.shape[0]:
+                problem(
+                    "error",
+                    "column names",
+                    listed(missing),
+                    "none of the requested columns are in the reports",
+                )
+            else:
+                for k in missing:
+                    problem("warning", "column names", k, "not found in any report")
+            names = requested["Output Name"]
+            for n in names[names.duplicated()].unique():
+                problem(
+                    "error",
+                    "column names",
+                    n,
+                    "output name used for more than one column",
+                )
+            available += list(names)
+
+    # every animal in the reports should have animal data
+    animal_values = None
+    if animal_data.shape[0] > 0:
+        if "Animal ID" not in animal_data.columns:
+            problem("error", "animal data", "Animal ID", "the sheet has no Animal ID")
+        else:
+            ids = animal_data["Animal ID"].astype(str)
+            for i in ids[ids.duplicated()].unique():
+                problem(
+                    "warning",
+                    "animal data",
+                    i,
+                    "Animal ID listed more than once, the first row is used",
+                )
+            unknown = animals[~animals.isin(set(ids))].unique()
+            if len(unknown) > 0:
+                problem(
+                    "warning",
+                    "animal data",
+                    listed(unknown),
+                    f"{len(unknown)} animals in the reports have no animal data",
+                )
+            animal_values = (
+                animal_data.assign(**{"Animal ID": ids})
+                .drop_duplicates("Animal ID")
+                .set_index("Animal ID")
+                .reindex(animals.values)
+                .reset_index(drop=True)
+            )
+            available += list(animal_data.columns)
+
+    # every series should fall on a timepoint
+    timepoint_values = None
+    if timepoint_data.shape[0] > 0:
+        date_columns = [
+            c for c in ["date", "start", "end"] if c in timepoint_data.columns
+        ]
+        if not date_columns:
+            problem(
+                "error",
+                "timepoint data",
+                "date",
+                "the sheet needs a 'date' column or 'start'/'end' windows",
+            )
+        for c in date_columns:
+            values = timepoint_data[c]
+            bad = values[
+                values.notna() & pandas.to_datetime(values, errors="coerce").isna()
+            ]
+            for v in bad.unique():
+                problem("error", "timepoint data", c, f"'{v}' is not a date")
+        if date_columns and not any(
+            p[0] == "error" and p[1] == "timepoint data" for p in problems
+        ):
+            timepoint_values, matched = match_timepoints(
+                timepoint_data,
+                pandas.to_datetime(series["Series Date"], errors="coerce"),
+                animals.values,
+            )
+            if not matched.all():
+                unmatched = series[~matched]
+                problem(
+                    "warning",
+                    "timepoint data",
+                    listed(f"{a} {d}" for a, d in unmatched.itertuples(index=False)),
+                    f"{unmatched.shape[0]} of {series.shape[0]} series match "
+                    + "no timepoint",
+                )
+        available += list(timepoint_data.columns)
+
+    # included derived calculations need the dates they are calculated from
+    # for every series
+    if derived_data.shape[0] > 0:
+        if not {"calculation", "Include"} <= set(derived_data.columns):
+            problem(
+                "error",
+                "derived data",
+                "",
+                "the sheet needs 'calculation' and 'Include' columns",
+            )
+        else:
+            for calc in DERIVED_CALCULATIONS:
+                if calc not in derived_data["calculation"].values:
+                    problem(
+                        "warning",
+                        "derived data",
+                        calc,
+                        "row missing, related calculations may be skipped",
+                    )
+            included = derived_data.loc[derived_data["Include"] == 1, "calculation"]
+            for calc in included:
+                source = DERIVED_SOURCES.get(str(calc).partition("(")[0])
+                if source is None:
+                    continue
+                available.append(calc)
+                if timepoint_values is None or "date" not in timepoint_values:
+                    problem(
+                        "error",
+                        "derived data",
+                        calc,
+                        "needs the 'date' column of the timepoint data",
+                    )
+                elif timepoint_values["date"].isna().any():
+                    problem(
+                        "error",
+                        "derived data",
+                        calc,
+                        f"{timepoint_values['date'].isna().sum()} series have "
+                        + "no timepoint date",
+                    )
+                if animal_values is None or source not in animal_values:
+                    problem(
+                        "error",
+                        "derived data",
+                        calc,
+                        f"needs the '{source}' column of the animal data",
+                    )
+                elif animal_values[source].isna().any():
+                    problem(
+                        "error",
+                        "derived data",
+                        calc,
+                        f"no {source} for animals "
+                        + listed(animals[animal_values[source].isna()].unique()),
+                    )
+
+    # model factors must be columns of the report
+    if model.shape[0] > 0:
+        if "factors" not in model.columns:
+            problem("error", "model", "factors", "the sheet has no factors column")
+        else:
+            for f in model["factors"].dropna():
+                if f not in available:
+                    problem(
+                        "error",
+                        "model",
+                        f,
+                        "factor is not a column of the animal data, timepoint "
+                        + "data, derived data or column names",
+                    )
+                    continue
+                for values in [animal_values, timepoint_values]:
+                    if values is not None and f in values and values[f].isna().any():
+                        problem(
+                            "warning",
+                            "model",
+                            f,
+                            f"{values[f].isna().sum()} series have no value "
+                            + "and are left out of the stats",
+                        )
+
+    return pandas.DataFrame(problems, columns=["Severity", "Sheet", "Item", "Problem"])
+
+
+def log_problems(problems, logger=None):
+    """
+    log each problem found by validate_settings at its severity
+    """
+    if not logger:
+        return
+    for severity, sheet, item, text in problems.itertuples(index=False):
+        logger.log(
+            severity, f"{sheet} - {item}: {text}" if item else f"{sheet}: {text}"
+        )
+    errors = (problems["Severity"] == "error").sum()
+    logger.log(
+        "error" if errors else "info",
+        f"settings check - {errors} errors, {problems.shape[0] - errors} warnings",
+    )
+
+
+def calculate_derived_data(primary_df, derived_data, logger=None):
+    """
+    add the derived data columns (ages, time post treatment and time in study)
+    selected in the derived data sheet to a copy of primary_df
+    """
+    primary_df = primary_df.copy()
+    if derived_data.shape[0] == 0:
+        return primary_df
+
+    try:
+        if (
+            derived_data[derived_data["calculation"] == "Age(days)"]["Include"].values[
+                0
+            ]
+            == 1
+        ):
+            primary_df["Age(days)"] = (
+                (primary_df["date"] - primary_df["DOB"]) / numpy.timedelta64(1, "D")
+            ).astype(int)
+
+        if (
+            derived_data[derived_data["calculation"] == "Age(wks)"]["Include"].values[0]
+            == 1
+        ):
+            primary_df["Age(wks)"] = (
+                (primary_df["date"] - primary_df["DOB"]) / numpy.timedelta64(7, "D")
+            ).astype(int)
+
+        if (
+            derived_data[derived_data["calculation"] == "Age(Mo)"]["Include"].values[0]
+            == 1
+        ):
+            primary_df["Age(Mo)"] = (
+                (primary_df["date"] - primary_df["DOB"]) / numpy.timedelta64(28, "D")
+            ).astype(int)
+    except Exception as e:
+        if logger:
+            logger.log("error", f"Unable to calculate Age Data: {e}")
+        if logger:
+            logger.log("error", traceback.format_exc())
+
+    # calculate days post treatment
+    try:
+        if (
+            derived_data[derived_data["calculation"] == "PostTreat(days)"][
+                "Include"
+            ].values[0]
+            == 1
+        ):
+            primary_df["PostTreat(days)"] = (
+                (primary_df["date"] - primary_df["Treatment Date"])
+                / numpy.timedelta64(1, "D")
+            ).astype(int)
+
+        if (
+            derived_data[derived_data["calculation"] == "PostTreat(wks)"][
+                "Include"
+            ].values[0]
+            == 1
+        ):
+            primary_df["PostTreat(wks)"] = (
+                (primary_df["date"] - primary_df["Treatment Date"])
+                / numpy.timedelta64(7, "D")
+            ).astype(int)
+
+        if (
+            derived_data[derived_data["calculation"] == "PostTreat(Mo)"][
+                "Include"
+            ].values[0]
+            == 1
+        ):
+            primary_df["PostTreat(Mo)"] = (
+                (primary_df["date"] - primary_df["Treatment Date"])
+                / numpy.timedelta64(28, "D")
+            ).astype(int)
+    except Exception as e:
+        if logger:
+            logger.log("error", f"Unable to calculate PostTreatment time: {e}")
+        if logger:
+            logger.log("error", traceback.format_exc())
+
+    # calculate days within study
+    try:
+        if (
+            derived_data[derived_data["calculation"] == "TimeInStudy(days)"][
+                "Include"
+            ].values[0]
+            == 1
+        ):
+            primary_df["TimeInStudy(days)"] = (
+                (primary_df["date"] - primary_df["Study Start Date"])
+                / numpy.timedelta64(1, "D")
+            ).astype(int)
+
+        if (
+            derived_data[derived_data["calculation"] == "TimeInStudy(wks)"][
+                "Include"
+            ].values[0]
+            == 1
+        ):
+            primary_df["TimeInStudy(wks)"] = (
+                (primary_df["date"] - primary_df["Study Start Date"])
+                / numpy.timedelta64(7, "D")
+            ).astype(int)
+
+        if (
+            derived_data[derived_data["calculation"] == "TimeInStudy(Mo)"][
+                "Include"
+            ].values[0]
+            == 1
+        ):
+            primary_df["TimeInStudy(Mo)"] = (
+                (primary_df["date"] - primary_df["Study Start Date"])
+                / numpy.timedelta64(28, "D")
+            ).astype(int)
+    except Exception as e:
+        if logger:
+            logger.log("error", f"Unable to calculate Time In Study: {e}")
+        if logger:
+            logger.log("error", traceback.format_exc())
+
+    return primary_df
+
+
+def reshape_report(primary_df, model, animal_data, column_styles):
+    """
+    Returns
+    -------
+    secondary_df : pandas.DataFrame
+        repeated measures style output (one row per animal, columns split by
+        the first model factor) for use with spss
+    tertiery_df : pandas.DataFrame
+        prism style output (secondary_df also split by the last model factor)
+
+    """
+    # repeated measures style output for use with spss
+    horiz_split_var = model["factors"].values[0]
+    horiz_split_values = list(primary_df[horiz_split_var].unique())
+    horiz_split_values.sort()
+
+    secondary_df = primary_df[primary_df[horiz_split_var] == horiz_split_values[0]]
+    secondary_df.columns = [
+        (
+            "{}_[{}]".format(c, horiz_split_values[0])
+            if c not in animal_data.columns
+            else c
+        )
+        for c in secondary_df.columns
+    ]
+
+    for i in range(len(horiz_split_values) - 1):
+        t = horiz_split_values[i + 1]
+
+        temp_df = primary_df[primary_df[horiz_split_var] == t][
+            ["Animal ID"] + ["Series Date"] + list(column_styles.values())
+        ]
+        temp_df.columns = [
+            "{}_[{}]".format(c, t) if c != "Animal ID" else c for c in temp_df.columns
+        ]
+
+        secondary_df = pandas.merge(
+            secondary_df,
+            temp_df,
+            how="outer",
+            on="Animal ID",
+            suffixes=(
+                "_[{}]".format(horiz_split_values[i]),
+                "_[{}]".format(t),
+            ),
+        )
+    # % prism style output
+    split_var = model["factors"].values[-1]
+    group_splits = list(secondary_df[split_var].unique())
+    group_splits.sort()
+
+    col_split = re.compile("(((?P<col>.+)_\[(?P<tp>.*)\])|((?P<alt>.+)))")
+
+    tertiery_df = secondary_df[secondary_df[split_var] == group_splits[0]]
+    new_cols = []
+    for c in tertiery_df.columns:
+        temp_re = re.search(col_split, c)
+        if temp_re["col"] is not None:
+            new_cols.append(
+                "{}_[{}]_[{}]".format(
+                    re.search(col_split, c)["col"],
+                    group_splits[0],
+                    re.search(col_split, c)["tp"],
+                )
+            )
+        else:
+            new_cols.append("{}_[{}]".format(c, group_splits[0]))
+    tertiery_df.columns = new_cols
+
+    for i in range(len(group_splits) - 1):
+        g = group_splits[i + 1]
+
+        temp_df = secondary_df[secondary_df[split_var] == g]
+        new_cols = []
+        for c in temp_df.columns:
+            temp_re = re.search(col_split, c)
+            if temp_re["col"] is not None:
+                new_cols.append(
+                    "{}_[{}]_[{}]".format(
+                        re.search(col_split, c)["col"],
+                        g,
+                        re.search(col_split, c)["tp"],
+                    )
+                )
+            else:
+                new_cols.append("{}_[{}]".format(c, g))
+        temp_df.columns = new_cols
+
+        tertiery_df = pandas.concat(
+            [tertiery_df, temp_df],
+            axis=1,
+            sort=True,  # added because of future warning
+        )
+    tc = list(tertiery_df.columns)
+    tc.sort()
+    tertiery_df = tertiery_df[tc]
+    tertiery_df = tertiery_df.fillna("")
+
+    return secondary_df, tertiery_df
+
+
+def sort_by_model(primary_df, model, logger=None):
+    """
+    sort the series by the model factors (then Animal ID)
+    """
+    try:
+        if model.shape[0] > 0:
+            primary_df = primary_df.sort_values(
+                by=list(model["factors"].values) + ["Animal ID"]
+            )
+    except Exception as e:
+        if logger:
+            logger.log("error", f"Unable to parse data model: {e}")
+        if logger:
+            logger.log("error", traceback.format_exc())
+    return primary_df
+
+
+def outcome_stats(
+    primary_df,
+    model,
+    column_styles,
+    result_cache=None,
+    logger=None,
+    plot_cache=None,
+    resampling=None,
+):
     """
-    Parameters
-    ----------
-    report_paths : list of strings
-        list of filepaths to check for candidate column names within
+    resampling is an optional dict of vdeh_resample.resample_pairwise options
+    (iterations, seed, workers) - if given the pairwise comparisons also get
+    a bootstrap confidence interval of the difference in means and a
+    permutation p value, computed for every outcome measure at once
 
     Returns
     -------
-    column_names : dict of lists
-        dict with 2 entries.
-            'MetaData Fields' - fields that are likely metadata containing
-            'VevoLab Measurement_Mode_Parameter or Calculation' - fields that
-                appear to contain measurements of calculations
+    stats_df : pandas.DataFrame
+        anova tables of every outcome measure
+    pairwise_df : pandas.DataFrame
+        pairwise comparisons of every outcome measure
+    plots : list of tuples
+        (outcome measure, png bytes) of the plot of every outcome measure
 
     """
-
-    column_names = {}
-    column_names["MetaData Fields"] = []
-    column_names["VevoLab Measurement_Mode_Parameter or Calculation"] = []
-    df = pandas.DataFrame()
-
-    # iterate through files
-    for f in report_paths:
-        # open files
+    # get list of independent factors
+    ind_vars = list(model["factors"].values)
+
+    # prepare stats dataframe to be used for easy export
+    stats_tables = []
+    pairwise_tables = []
+    plots = []
+
+    # iterate through outcome measure columns and clean data for ANOVA, results
+    # are memoized on the cleaned data of each outcome
+    for c in column_styles.values():
+        temp_df = primary_df[[c] + ind_vars].copy()
+        temp_df[c] = pandas.to_numeric(temp_df[c], errors="coerce")
+        temp_df = temp_df.dropna()
+
+        result_key = fingerprint_frame(temp_df, c, ind_vars, OUTCOME_ANALYSIS_SETTINGS)
+        result = result_cache.get(result_key) if result_cache is not None else None
+        if result is None:
+            result = analyze_outcome(
+                temp_df, c, ind_vars, OUTCOME_ANALYSIS_SETTINGS, plot_cache
+            )
+            if result_cache is not None:
+                result_cache.put(result_key, result)
+        elif logger:
+            logger.log("debug", f"reusing cached results for {c}")
+        table, outcome_pairwise_df, png_bytes = result
+
+        stats_tables.append(table)
+        pairwise_tables.append(outcome_pairwise_df)
+        plots.append((c, png_bytes))
+
+    stats_df = pandas.concat(stats_tables)
+    pairwise_df = pandas.concat(pairwise_tables).reset_index()
+
+    if resampling and resampling.get("iterations"):
+        start = time.perf_counter()
+        resampled_df = vdeh_resample.resample_pairwise(
+            primary_df, ind_vars, list(column_styles.values()), **resampling
+        )
+        pairwise_df = pairwise_df.merge(
+            resampled_df, how="left", on=["outcome_measure", "comparison"]
+        )
         if logger:
-            logger.log("info", f"collecting data from {f}")
-        with open(f, "r") as opfi:
-            report_text = opfi.read().replace('"', "")
-            report_dict = {}
-            study_dict = {}
-            # iterate through series (split using 'Series Name' - first row
-            # will contain text attributable to Series Name)
-            # first part of split is study level metadata and is reviewed first
-            # it is otherwise skipped
-            header = report_text.split("Series Name")[0]
-            header_rows = []
-            header_rows = header.split("\n")
+            logger.log(
+                "debug",
+                f"{resampling['iterations']} bootstrap resamples and permutations "
+                + f"in {time.perf_counter() - start:.2f} s",
+            )
+    pairwise_df = pairwise_df.reindex(
+        columns=["outcome_measure", "comparison"]
+        + [
+            j
+            for j in pairwise_df
+            if j not in ["outcome_measure", "comparison", "notes"]
+        ]
+        + ["notes"]
+    )
 
-            FLAG_version = 0
-            FLAG_notes = 0
+    return stats_df, pairwise_df, plots
 
-            for r in header_rows[1:]:
-                columns = []
-                columns = r.split(",")
-                study_notes = []
 
-                if columns[0] == "" or columns[0] == "No measurements found":
-                    FLAG_version = 0
-                    continue
+class DuplicateSeriesError(ValueError):
+    pass
 
-                elif columns[0] == "Version Information":
-                    FLAG_version = 1
-                    FLAG_notes = 0
-                    continue
 
-                elif columns[0] == "Study Notes":
-                    FLAG_version = 0
-                    FLAG_notes = 1
-                    if len(columns) > 1:
-                        study_notes.append(",".join(columns[1:]))
+class SeriesDeduplicator:
+    """
+    decides which copy of a series found in more than one report is kept -
+    copies are identified by block_fingerprint and ranked by position (report
+    order, then block order), so the outcome does not depend on the order the
+    reports are parsed in and one instance can be shared by parallel workers
+    """
 
-                elif FLAG_version > 0:
-                    if FLAG_version == 1:
-                        version_header = r
-                        column_names["MetaData Fields"].append(version_header)
+    def __init__(self, policy="keep-first", logger=None):
+        if policy not in DUPLICATE_POLICIES:
+            raise ValueError(f"Unknown duplicate policy: {policy}")
+        self.policy = policy
+        self.logger = logger
+        self.lock = threading.Lock()
+        self.winners = {}
+        self.claimed = {}
+        self.duplicates = 0
+
+    def claim(self, fingerprint, rank, source):
+        """
+        True if this copy of the series (at rank = (report position, block
+        position) in source) is the one to keep of the copies seen so far
+        """
+        with self.lock:
+            current = self.winners.get(fingerprint)
+            if current is not None:
+                self.duplicates += 1
+                if self.policy == "error":
+                    raise DuplicateSeriesError(
+                        f"Series {fingerprint[0]} (Animal ID {fingerprint[1]}, "
+                        + f"Series Date {fingerprint[2]}) found in {current[1]} "
+                        + f"and {source}"
+                    )
+                keep_new = (rank > current[0]) == (self.policy == "keep-last")
+                if self.logger:
+                    self.logger.log(
+                        "debug",
+                        f"duplicate series {fingerprint[0]} - keeping the copy "
+                        + f"in {source if keep_new else current[1]}, skipping "
+                        + f"the copy in {current[1] if keep_new else source}",
+                    )
+                if not keep_new:
+                    return False
+            self.winners[fingerprint] = (rank, source)
+            self.claimed[(rank[0], fingerprint[0])] = fingerprint
+            return True
+
+    def kept(self, report_rank, report_dict):
+        """
+        series of report_dict (the report at position report_rank) that were
+        not replaced by a copy in another report
+        """
+        with self.lock:
+            return {
+                k: v
+                for k, v in report_dict.items()
+                if (report_rank, k) not in self.claimed
+                or self.winners[self.claimed[(report_rank, k)]][0][0] == report_rank
+            }
+
+    def log_summary(self):
+        if self.duplicates and self.logger:
+            self.logger.log(
+                "info",
+                f"{self.duplicates} duplicate series found ({self.policy})",
+            )
 
-                    else:
-                        study_dict[",".join(version_header)] = ",".join(columns)
-                    FLAG_version += 1
 
-                elif FLAG_notes > 0:
-                    if FLAG_notes == 1:
-                        study_notes.append(r)
-                        study_dict["Study Notes"] = "\n".join(study_notes)
-                        column_names["MetaData Fields"].append("Study Notes")
+class LRUCache:
+    """
+    bounded mapping that evicts the least recently used entry once more than
+    maxsize entries are stored
+    """
 
-                else:
-                    if len(columns) > 1:
-                        study_dict[columns[0]] = ",".join(columns[1:])
-                        column_names["MetaData Fields"].append(columns[0])
-
-            for i, b in enumerate(report_text.split("Series Name,")[1:]):
-
-                # iterate through sections
-                rows = []
-                rows = b.split("\n")
-
-                # iterate through rows
-
-                FLAG_calculations = 0
-                FLAG_measurements = 0
-                FLAG_version = 0
-                FLAG_notes = 0
-
-                series_notes = []
-
-                # prepare the report dict
-                report_dict[rows[0]] = {"Series Name": rows[0]}
-                for r in rows[1:]:
-                    columns = []
-                    columns = r.split(",")
-
-                    # populate report_dict, key will be the series name
-                    # 1st block will be study info metadata
-
-                    # clear flags indicating calculation or measurement section
-                    if columns[0] == "" or columns[0] == "No measurements found":
-                        FLAG_calculations = 0
-                        FLAG_measurements = 0
-                        FLAG_version = 0
-
-                        continue
-
-                    # check and set flags for whether the line indicates
-                    # transition between calculation, measurement, or other
-                    # section
-                    elif columns[0] == "Calculation":
-                        FLAG_calculations = 1
-                        FLAG_measurements = 0
-                        FLAG_version = 0
-                        FLAG_notes = 0
-                        continue
-
-                    elif columns[0] == "Measurement":
-                        FLAG_measurements = 1
-                        FLAG_calculations = 0
-                        FLAG_version = 0
-                        FLAG_notes = 0
-                        continue
-
-                    elif columns[0] == "Version Information":
-                        FLAG_version = 1
-                        FLAG_calculations = 0
-                        FLAG_measurements = 0
-                        FLAG_notes = 0
-                        continue
-
-                    elif columns[0] == "Series Notes":
-                        FLAG_version = 0
-                        FLAG_calculations = 0
-                        FLAG_measurements = 0
-                        FLAG_notes = 1
-                        if len(columns) > 1:
-                            series_notes.append(",".join(columns[1:]))
-
-                    # !!! need to add check for bad case of user entering "Application" in series notes !!!
-                    elif columns[0] == "Application":
-                        FLAG_version = 0
-                        FLAG_calculations = 0
-                        FLAG_measurements = 0
-                        FLAG_notes = 0
-
-                    # if row is not a transition indicator, extract data if
-                    # row is calculation or measurement data (add to list)
-                    if (
-                        FLAG_calculations == 0
-                        and FLAG_measurements == 0
-                        and FLAG_version == 0
-                        and FLAG_notes == 0
-                    ):
-                        column_names["MetaData Fields"].append(columns[0])
-                        report_dict[rows[0]][columns[0]] = ",".join(columns[1:])
-
-                        if i == 0:
-                            study_dict[columns[0]] = columns[1]
-
-                    elif FLAG_notes > 0:
-                        if FLAG_notes == 1:
-                            report_dict[rows[0]]["Series Notes"] = "\n".join(
-                                series_notes
-                            )
-
-                        else:
-                            series_notes.append(r)
-                            report_dict[rows[0]]["Series Notes"] = "\n".join(
-                                series_notes
-                            )
-                        FLAG_notes += 1
-
-                    elif FLAG_version > 0:
-                        if FLAG_version == 1:
-                            version_header = r
-
-                        else:
-                            study_dict[version_header] = ",".join(columns)
-                        FLAG_version += 1
-
-                    elif FLAG_calculations == 1:
-                        column_names[
-                            "VevoLab Measurement_Mode_Parameter or Calculation"
-                        ].append(columns[0])
-                        report_dict[rows[0]][columns[0]] = columns[3]
-
-                    elif FLAG_measurements == 1:
-                        # screen for cases of measurements with number suffix
-                        if columns[0][-1].isdigit():
-                            # if measurement is number suffixed, grab the
-                            # initial portion
-                            columns[0] = re.search(
-                                "(?P<text>.*?)(?P<digit>\d+$)", columns[0]
-                            ).group("text")
-                        column_names[
-                            "VevoLab Measurement_Mode_Parameter or Calculation"
-                        ].append("_".join(columns[0:3]))
-                        # place the data
-                        if "_".join(columns[0:3]) in report_dict[rows[0]]:
-                            report_dict[rows[0]]["_".join(columns[0:3])].append(
-                                columns[4]
-                            )
-                        else:
-                            report_dict[rows[0]]["_".join(columns[0:3])] = [columns[4]]
-                for k, v in study_dict.items():
-                    report_dict[rows[0]][k] = v
-
-        for first_key in report_dict:
-            for second_key in report_dict[first_key]:
-                if type(report_dict[first_key][second_key]) is list:
-                    data_list = []
-                    try:
-                        data_list = [
-                            float(i) for i in report_dict[first_key][second_key]
-                        ]
-                        report_dict[first_key][second_key] = sum(data_list) / len(
-                            data_list
-                        )
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.data = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
 
-                    except Exception:
-                        if logger:
-                            logger.log(
-                                "error",
-                                (
-                                    "issue summarizing collected data "
-                                    + "{f}:{first_key} - {second_key}"
-                                ),
-                            )
-                        if logger:
-                            logger.log("error", traceback.format_exc())
-                        report_dict[first_key][second_key] = "ERROR_NA"
+    def __len__(self):
+        return len(self.data)
 
-        current_df = pandas.DataFrame.from_dict(report_dict, orient="index")
+    def __contains__(self, key):
+        return key in self.data
 
-        df = pandas.concat([df, current_df], axis=0, join="outer")
+    def get(self, key, default=None):
+        if key in self.data:
+            self.data.move_to_end(key)
+            self.hits += 1
+            return self.data[key]
+        self.misses += 1
+        return default
 
-    # clean up columns names to remove duplicates
-    for k, v in column_names.items():
-        column_names[k] = list(set(v))
+    def put(self, key, value):
+        self.data[key] = value
+        self.data.move_to_end(key)
+        while len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
 
-    return column_names, df
+    def clear(self):
+        self.data.clear()
 
 
-def simple_export(dict_of_dfs, output_path, logger=None):
-    writer = pandas.ExcelWriter(output_path, engine="xlsxwriter")
+class PlotCache:
+    """
+    directory of rendered plots named by their content key (see
+    summary_plot_key) - files are touched when reused and the least recently
+    used are removed once the directory holds more than max_bytes
+    """
 
-    try:
-        for k, v in dict_of_dfs.items():
-            v.to_excel(writer, sheet_name=k, index=False)
-        writer.close()
-        if logger:
-            logger.log(f"Data Saved to file - {output_path}")
+    def __init__(self, directory, max_bytes=64 * 1024**2):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
 
-    except Exception as e:
-        if logger:
-            logger.log("error", f"Unable to save output - {e}")
-        if logger:
-            logger.log("error", traceback.format_exc())
+    def path(self, key):
+        return os.path.join(self.directory, key + ".png")
 
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                content = f.read()
+            os.utime(path)
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return content
+
+    def put(self, key, content):
+        # write to a temporary file and swap it in, several processes may
+        # share the directory
+        temp_path = f"{self.path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(content)
+        os.replace(temp_path, self.path(key))
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".png"):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
 
-# %% define classes
+    def clear(self):
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".png"):
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
 
 
 @dataclass
@@ -305,17 +3301,46 @@ class vdeh_model:
     input_paths: list = None
     output_path: str = str()
     settings_path: str = str()
+    store_path: str = str()
 
     # settings
-    animal_data: pandas.DataFrame = pandas.DataFrame()
-    timepoint_data: pandas.DataFrame = pandas.DataFrame()
-    derived_data: pandas.DataFrame = pandas.DataFrame()
-    column_names: pandas.DataFrame = pandas.DataFrame()
-    model_data: pandas.DataFrame = pandas.DataFrame()
-    model: pandas.DataFrame = pandas.DataFrame()
+    animal_data: pandas.DataFrame = field(default_factory=pandas.DataFrame)
+    timepoint_data: pandas.DataFrame = field(default_factory=pandas.DataFrame)
+    derived_data: pandas.DataFrame = field(default_factory=pandas.DataFrame)
+    column_names: pandas.DataFrame = field(default_factory=pandas.DataFrame)
+    model_data: pandas.DataFrame = field(default_factory=pandas.DataFrame)
+    series_table: vdeh_series.SeriesTable = None
+    study_data: pandas.DataFrame = field(default_factory=pandas.DataFrame)
+    model: pandas.DataFrame = field(default_factory=pandas.DataFrame)
+    catalog: pandas.DataFrame = field(default_factory=pandas.DataFrame)
+    problems: pandas.DataFrame = field(default_factory=pandas.DataFrame)
 
     settings_changed: bool = False
+    wide_export: bool = False
+    sparse_columns: bool = False
+    replicate_export: bool = False
+    animal_index: vdeh_series.AnimalIndex = None
+    longitudinal_export: bool = False
+    export_formats: list = None
+    duplicate_policy: str = "keep-first"
+    parse_workers: int = 1
+    prefetch_depth: int = 2
     version_info: str = str()
+    result_cache: LRUCache = None
+    result_cache_size: int = 256
+    report_cache: LRUCache = None
+    settings_cache: LRUCache = None
+    stage_cache: LRUCache = None
+    stage_cache_size: int = 32
+    checkpoint_dir: str = str()
+    plot_cache: PlotCache = None
+    plot_cache_dir: str = str()
+    plot_cache_size: int = 64 * 1024**2
+    resample_iterations: int = 0
+    resample_seed: int = 0
+    resample_workers: int = 1
+    spill_dir: str = str()
+    chunk_series: int = vdeh_chunked.CHUNK_SERIES
     log_level: str = "INFO"
     log_file_path: str = str()
 
@@ -323,51 +3348,86 @@ class vdeh_model:
         self.logger = logger
 
     def load_settings_from_file(self):
-        try:
-            self.animal_data = pandas.read_excel(
-                self.settings_path,
-                sheet_name="animal data",
-                dtype={"Animal ID": str},
-            )
-        except Exception:
-            if self.logger:
-                self.logger.log("info", "No Animal Data Found")
+        # settings workbooks are reused from the settings cache (if any) while
+        # the file is unchanged
+        if self.settings_cache is not None:
+            cache_key = file_fingerprint(self.settings_path)
+            cached = self.settings_cache.get(cache_key)
+            if cached is not None:
+                for k, v in cached.items():
+                    setattr(self, k, v)
+                if self.logger:
+                    self.logger.log("debug", "using cached settings")
+                return
 
-        try:
-            self.timepoint_data = pandas.read_excel(
-                self.settings_path, sheet_name="timepoint data"
-            )
-        except Exception:
-            if self.logger:
-                self.logger.log("info", "No Timepoint Data Found")
+        with pandas.ExcelFile(self.settings_path) as settings_file:
+            try:
+                self.animal_data = pandas.read_excel(
+                    settings_file,
+                    sheet_name="animal data",
+                    dtype={"Animal ID": str},
+                )
+            except Exception:
+                if self.logger:
+                    self.logger.log("info", "No Animal Data Found")
 
-        try:
-            self.model = pandas.read_excel(self.settings_path, sheet_name="model")
-        except Exception:
-            if self.logger:
-                self.logger.log("info", "No Model Information Found")
+            try:
+                self.timepoint_data = pandas.read_excel(
+                    settings_file, sheet_name="timepoint data"
+                )
+            except Exception:
+                if self.logger:
+                    self.logger.log("info", "No Timepoint Data Found")
 
-        try:
-            self.column_names = pandas.read_excel(
-                self.settings_path, sheet_name="column names"
-            )
-        except Exception:
-            if self.logger:
-                self.logger.log(
-                    "warning",
-                    "No Column Names Found - default columns will be used",
+            try:
+                self.model = pandas.read_excel(settings_file, sheet_name="model")
+            except Exception:
+                if self.logger:
+                    self.logger.log("info", "No Model Information Found")
+
+            cacheable = True
+            try:
+                self.column_names = pandas.read_excel(
+                    settings_file, sheet_name="column names"
+                )
+            except Exception:
+                # default columns depend on the reports, not only the settings
+                cacheable = False
+                if self.logger:
+                    self.logger.log(
+                        "warning",
+                        "No Column Names Found - default columns will be used",
+                    )
+                self.column_names, self.model_data, self.study_data = collect_data(
+                    self.input_paths,
+                    self.logger,
+                    cache=self.report_cache,
+                    duplicate_policy=self.duplicate_policy,
+                    workers=self.parse_workers,
+                    index_dir=report_index_dir(self.checkpoint_dir),
+                    prefetch_depth=self.prefetch_depth,
+                    sparse=self.sparse_columns,
                 )
-            self.column_names, self.model_data = collect_data(
-                self.input_paths, self.logger
-            )
 
-        try:
-            self.derived_data = pandas.read_excel(
-                self.settings_path, sheet_name="derived data"
+            try:
+                self.derived_data = pandas.read_excel(
+                    settings_file, sheet_name="derived data"
+                )
+            except Exception:
+                if self.logger:
+                    self.logger.log("info", "No Settings For Derived Data Found")
+
+        if self.settings_cache is not None and cacheable:
+            self.settings_cache.put(
+                cache_key,
+                {
+                    "animal_data": self.animal_data,
+                    "timepoint_data": self.timepoint_data,
+                    "model": self.model,
+                    "column_names": self.column_names,
+                    "derived_data": self.derived_data,
+                },
             )
-        except Exception:
-            if self.logger:
-                self.logger.log("info", "No Settings For Derived Data Found")
 
     def save_settings_to_file(self, new_settings_path):
         writer = pandas.ExcelWriter(self.new_settings_path, engine="xlsxwriter")
@@ -388,413 +3448,301 @@ class vdeh_model:
         if self.model.shape[0] > 0:
             self.model.to_excel(writer, sheet_name="model", index=False)
 
-        writer.save()
+        writer.close()
 
     def check_data(self):
-        self.column_names, self.model_data = collect_data(self.input_paths, self.logger)
+        # series are kept in long format, the wide view is built for export
+        self.column_names, self.series_table, self.study_data = collect_series(
+            self.input_paths,
+            self.logger,
+            cache=self.report_cache,
+            duplicate_policy=self.duplicate_policy,
+            workers=self.parse_workers,
+            index_dir=report_index_dir(self.checkpoint_dir),
+            prefetch_depth=self.prefetch_depth,
+        )
+        self.model_data = self.series_table.wide(sparse=self.sparse_columns)
+        self.animal_index = vdeh_series.AnimalIndex.from_frame(self.model_data)
+
+    def preflight_check(self):
+        # header-only check of the settings against the reports, run before
+        # any report is parsed - returns the problems found (see
+        # validate_settings)
+        start = time.perf_counter()
+        series = []
+        self.catalog = scan_reports(
+            self.input_paths,
+            self.logger,
+            index_dir=report_index_dir(self.checkpoint_dir),
+            series=series,
+        )
+        self.problems = validate_settings(
+            self.catalog,
+            pandas.DataFrame(series, columns=["Animal ID", "Series Date"]),
+            self.animal_data,
+            self.timepoint_data,
+            self.derived_data,
+            self.column_names,
+            self.model,
+        )
+        log_problems(self.problems, self.logger)
+        if self.logger:
+            self.logger.log(
+                "debug", f"settings checked in {time.perf_counter() - start:.3f} s"
+            )
+        return self.problems
+
+    def scan_data(self):
+        # header-only scan of the reports for the available keys
+        self.catalog = scan_reports(self.input_paths, self.logger)
+        if self.logger:
+            self.logger.log(
+                "info",
+                f"{self.catalog.shape[0]} keys found in "
+                + f"{len(expand_report_paths(self.input_paths))} reports",
+            )
 
-    def generate_full_report(self):
-        # grab column name settings
-        try:
-            ColumnStyles = dict(
-                zip(
-                    self.column_names[
-                        "VevoLab Measurement_Mode_Parameter or Calculation"
-                    ],
-                    self.column_names["Output Name"],
-                )
+    def export_extracted_data(self):
+        # study level metadata is kept in its own sheet unless the user asks
+        # for it to be joined onto every series row
+        if self.wide_export:
+            dict_of_dfs = {
+                "simple_summary": join_study_data(self.model_data, self.study_data)
+            }
+        else:
+            dict_of_dfs = {
+                "simple_summary": self.model_data,
+                "study_summary": self.study_data,
+            }
+        # replicate statistics and values of number suffixed measurements
+        if self.replicate_export and self.series_table is not None:
+            dict_of_dfs["replicate_summary"] = self.series_table.replicate_summary()
+            dict_of_dfs["replicates"] = self.series_table.replicate_values()
+        # per animal change over time of every measurement
+        if self.longitudinal_export and self.animal_index is not None:
+            if self.series_table is not None:
+                measurements = self.series_table.keys
+            else:
+                measurements = [
+                    c
+                    for c in self.model_data.columns
+                    if c not in vdeh_store.KEY_COLUMNS
+                    and pandas.api.types.is_numeric_dtype(self.model_data[c])
+                ]
+            dict_of_dfs["longitudinal"] = self.animal_index.longitudinal_summary(
+                self.model_data,
+                [c for c in measurements if c in self.model_data.columns],
             )
+        simple_export(dict_of_dfs, self.output_path, self.logger)
+        table_export(dict_of_dfs, self.output_path, self.export_formats, self.logger)
 
-            # % grab data from the reports
-            primary_df = pandas.DataFrame()
-            Study_Name = ""
-            for current_file in self.report_path:
-                if self.logger:
-                    self.logger.log("info", f"working on {current_file}")
-                with open(current_file, "r") as opfi:
-                    report_text = opfi.read().replace('"', "")
-
-                # parse the report into blocks (b), and rows (r) and columns (c)
-                report_dict = {}
-                for b in report_text.split("Series Name,"):
-
-                    rows = []
-                    rows = b.split("\n")
-
-                    for r in b.split("\n"):
-                        columns = []
-                        columns = r.split(",")
-                        if columns[0] == "Study Name":
-                            Study_Name = columns[1]
-
-                    report_dict[rows[0]] = {}
-                    FLAG_calculations = 0
-                    FLAG_measurements = 0
-                    FLAG_notes = 0
-
-                    for r in b.split("\n"):
-                        columns = []
-                        columns = r.split(",")
-
-                        # collect calculation values
-                        if columns[0] == "":
-                            FLAG_calculations = 0
-                            FLAG_measurements = 0
-                            continue
-
-                        # check and set flags for whether the line indicates
-                        # transition between calculation, measurement, or other
-                        # section
-                        elif columns[0] == "Calculation":
-                            FLAG_calculations = 1
-                            FLAG_measurements = 0
-                            FLAG_notes = 0
-                            continue
-
-                        elif columns[0] == "Measurement":
-                            FLAG_measurements = 1
-                            FLAG_calculations = 0
-                            FLAG_notes = 0
-                            continue
-
-                        elif columns[0] == "Series Notes":
-                            FLAG_calculations = 0
-                            FLAG_measurements = 0
-                            FLAG_notes = 1
-
-                        # if row is not a transition indicator, extract data if
-                        # row is calculation or measurement data (add to list) -...
-                        # take average at the end
-                        if FLAG_calculations == 1:
-                            report_dict[rows[0]][columns[0]] = columns[3]
-
-                        if FLAG_measurements == 1:
-                            # screen for cases of measurements with number suffix
-                            if columns[0][-1].isdigit():
-                                # if measurement is number suffixed, grab the
-                                # initial portion
-                                columns[0] = re.search(
-                                    "(?P<text>.*?)(?P<digit>\d+$)", columns[0]
-                                ).group("text")
-                            # place the data
-                            if "_".join(columns[0:3]) in report_dict[rows[0]]:
-                                report_dict[rows[0]]["_".join(columns[0:3])].append(
-                                    columns[4]
-                                )
-                            else:
-                                report_dict[rows[0]]["_".join(columns[0:3])] = [
-                                    columns[4]
-                                ]
-
-                        if columns[0] == "Series Date":
-                            report_dict[rows[0]][columns[0]] = pandas.to_datetime(
-                                columns[1]
-                            )
-
-                        if columns[0] == "Animal ID":
-                            report_dict[rows[0]][columns[0]] = columns[1]
-                            report_dict[rows[0]]["Study Name"] = Study_Name
-                            report_dict[rows[0]]["Series Name"] = rows[0]
-                        if columns[0] == "Sex":
-                            report_dict[rows[0]][columns[0]] = columns[1]
-
-                        if columns[0] == "Weight":
-                            report_dict[rows[0]][columns[0]] = columns[1]
-
-                # After the end of the data scraping - collapse to a mean() all
-                # entries containing a list of repeated measurements
-                # (affects AutoLV)
-
-                for first_key in report_dict:
-                    for second_key in report_dict[first_key]:
-                        if type(report_dict[first_key][second_key]) is list:
-                            data_list = []
-                            try:
-                                data_list = [
-                                    float(i) for i in report_dict[first_key][second_key]
-                                ]
-                                report_dict[first_key][second_key] = sum(
-                                    data_list
-                                ) / len(data_list)
-
-                            except Exception:
-                                logging.error("ERROR: issue summarizing collected data")
-                                logging.error(traceback.format_exc())
-                                report_dict[first_key][second_key] = "ERROR_NA"
-
-                current_df = pandas.DataFrame.from_dict(report_dict, orient="index")
-
-                current_df = current_df.rename(columns=ColumnStyles)
-                output_df_columns = ["Animal ID", "Series Date"] + list(
-                    ColumnStyles.values()
+    def update_store(self):
+        # upsert the collected data into the local series store
+        try:
+            conn = vdeh_store.open_store(self.store_path)
+            try:
+                n = vdeh_store.upsert_collected_data(
+                    conn, self.column_names, self.model_data, self.study_data
                 )
+            finally:
+                conn.close()
+            if self.logger:
+                self.logger.log("info", f"{n} series saved to store {self.store_path}")
+        except Exception as e:
+            if self.logger:
+                self.logger.log("error", f"Unable to update store: {e}")
+            if self.logger:
+                self.logger.log("error", traceback.format_exc())
 
-                output_df = current_df[output_df_columns]
-
-                if self.timepoint_data.shape[0] > 0:
-                    output_df = pandas.merge(
-                        self.timepoint_data,
-                        output_df,
-                        how="right",
-                        left_on="date",
-                        right_on="Series Date",
-                    )
+    def load_from_store(
+        self, animal_ids=None, measurements=None, start_date=None, end_date=None
+    ):
+        # build the extracted data from a selection of the local series store
+        conn = vdeh_store.open_store(self.store_path)
+        self.series_table = None
+        try:
+            self.model_data = vdeh_store.select_report(
+                conn,
+                animal_ids=animal_ids,
+                measurements=measurements,
+                start_date=start_date,
+                end_date=end_date,
+            )
+            self.study_data = pandas.read_sql_query(
+                "SELECT study_id, field, value FROM studies", conn
+            ).pivot(index="study_id", columns="field", values="value")
+        finally:
+            conn.close()
+        self.study_data = self.study_data.rename_axis("Study ID").reset_index()
+        self.animal_index = vdeh_series.AnimalIndex.from_frame(self.model_data)
+        self.study_data = self.study_data[
+            self.study_data["Study ID"].isin(self.model_data["Study ID"])
+        ]
+        if self.logger:
+            self.logger.log(
+                "info",
+                f"{self.model_data.shape[0]} series selected from store {self.store_path}",
+            )
 
-                if self.animal_data.shape[0] > 0:
-                    output_df = pandas.merge(
-                        self.animal_data,
-                        output_df,
-                        how="right",
-                        on="Animal ID",
-                    )
+    def generate_full_report(self, from_stage=None):
+        # the report is built in stages (see REPORT_STAGES), outputs of each
+        # stage are reused while its inputs are unchanged - from_stage forces
+        # that stage and every stage after it to run again
+        if from_stage is not None and from_stage not in REPORT_STAGES:
+            if self.logger:
+                self.logger.log("warning", f"Unknown report stage: {from_stage}")
+            from_stage = None
+        rerun = REPORT_STAGES[REPORT_STAGES.index(from_stage) :] if from_stage else []
+
+        if self.stage_cache is None:
+            self.stage_cache = LRUCache(self.stage_cache_size)
+        if self.result_cache is None:
+            self.result_cache = LRUCache(self.result_cache_size)
+        # rendered plots are kept in the plot cache directory, or with the
+        # stage checkpoints if no directory was set
+        plot_dir = self.plot_cache_dir or report_plot_dir(self.checkpoint_dir)
+        if plot_dir and (
+            self.plot_cache is None or self.plot_cache.directory != plot_dir
+        ):
+            self.plot_cache = PlotCache(plot_dir, self.plot_cache_size)
+
+        def stage(name, key, func):
+            return run_stage(
+                name,
+                key,
+                func,
+                cache=self.stage_cache,
+                checkpoint_dir=self.checkpoint_dir or None,
+                reuse=name not in rerun,
+                logger=self.logger,
+            )
 
-                primary_df = primary_df.append(output_df)
+        try:
+            parse_key = stage_key(
+                "parse",
+                "",
+                [file_fingerprint(p) for p in expand_report_paths(self.input_paths)],
+                self.column_names,
+                self.duplicate_policy,
+            )
+            primary_df, column_styles = stage(
+                "parse",
+                parse_key,
+                lambda: parse_reports(
+                    self.input_paths,
+                    self.column_names,
+                    self.logger,
+                    self.report_cache,
+                    self.duplicate_policy,
+                    self.parse_workers,
+                    report_index_dir(self.checkpoint_dir),
+                    self.prefetch_depth,
+                ),
+            )
 
+            # link the animal and timepoint metadata once all series are collected
+            merge_key = stage_key(
+                "merge", parse_key, self.animal_data, self.timepoint_data
+            )
+            primary_df = stage(
+                "merge",
+                merge_key,
+                lambda: join_metadata(
+                    primary_df, self.animal_data, self.timepoint_data, self.logger
+                ),
+            )
         except Exception as e:
             if self.logger:
                 self.logger.log("error", f"ERROR: Unable to collect data: {e}")
             if self.logger:
                 self.logger.log("error", traceback.format_exc())
+            return
 
         # perform derived data calculations if selected
-        # calculate ages
-        if self.derived_data.shape[0] > 0:
-            try:
-                if (
-                    self.derived_data[self.derived_data["calculation"] == "Age(days)"][
-                        "Include"
-                    ].values[0]
-                    == 1
-                ):
-                    primary_df["Age(days)"] = (
-                        (primary_df["date"] - primary_df["DOB"])
-                        / numpy.timedelta64(1, "D")
-                    ).astype(int)
-
-                if (
-                    self.derived_data[self.derived_data["calculation"] == "Age(wks)"][
-                        "Include"
-                    ].values[0]
-                    == 1
-                ):
-                    primary_df["Age(wks)"] = (
-                        (primary_df["date"] - primary_df["DOB"])
-                        / numpy.timedelta64(7, "D")
-                    ).astype(int)
-
-                if (
-                    self.derived_data[self.derived_data["calculation"] == "Age(Mo)"][
-                        "Include"
-                    ].values[0]
-                    == 1
-                ):
-                    primary_df["Age(Mo)"] = (
-                        (primary_df["date"] - primary_df["DOB"])
-                        / numpy.timedelta64(28, "D")
-                    ).astype(int)
-            except Exception as e:
-                if self.logger:
-                    self.logger.log("error", f"Unable to calculate Age Data: {e}")
-                if self.logger:
-                    self.logger.log("error", traceback.format_exc())
-
-            # calculate days post treatment
-            try:
-                if (
-                    self.derived_data[
-                        self.derived_data["calculation"] == "PostTreat(days)"
-                    ]["Include"].values[0]
-                    == 1
-                ):
-                    primary_df["PostTreat(days)"] = (
-                        (primary_df["date"] - primary_df["Treatment Date"])
-                        / numpy.timedelta64(1, "D")
-                    ).astype(int)
-
-                if (
-                    self.derived_data[
-                        self.derived_data["calculation"] == "PostTreat(wks)"
-                    ]["Include"].values[0]
-                    == 1
-                ):
-                    primary_df["PostTreat(wks)"] = (
-                        (primary_df["date"] - primary_df["Treatment Date"])
-                        / numpy.timedelta64(7, "D")
-                    ).astype(int)
-
-                if (
-                    self.derived_data[
-                        self.derived_data["calculation"] == "PostTreat(Mo)"
-                    ]["Include"].values[0]
-                    == 1
-                ):
-                    primary_df["PostTreat(Mo)"] = (
-                        (primary_df["date"] - primary_df["Treatment Date"])
-                        / numpy.timedelta64(28, "D")
-                    ).astype(int)
-            except Exception as e:
-                if self.logger:
-                    self.logger.log(
-                        "error", f"Unable to calculate PostTreatment time: {e}"
-                    )
-                if self.logger:
-                    self.logger.log("error", traceback.format_exc())
-
-            # calculate days within study
-            try:
-                if (
-                    self.derived_data[
-                        self.derived_data["calculation"] == "TimeInStudy(days)"
-                    ]["Include"].values[0]
-                    == 1
-                ):
-                    primary_df["TimeInStudy(days)"] = (
-                        (primary_df["date"] - primary_df["Study Start Date"])
-                        / numpy.timedelta64(1, "D")
-                    ).astype(int)
-
-                if (
-                    self.derived_data[
-                        self.derived_data["calculation"] == "TimeInStudy(wks)"
-                    ]["Include"].values[0]
-                    == 1
-                ):
-                    primary_df["TimeInStudy(wks)"] = (
-                        (primary_df["date"] - primary_df["Study Start Date"])
-                        / numpy.timedelta64(7, "D")
-                    ).astype(int)
-
-                if (
-                    self.derived_data[
-                        self.derived_data["calculation"] == "TimeInStudy(Mo)"
-                    ]["Include"].values[0]
-                    == 1
-                ):
-                    primary_df["TimeInStudy(Mo)"] = (
-                        (primary_df["date"] - primary_df["Study Start Date"])
-                        / numpy.timedelta64(28, "D")
-                    ).astype(int)
-            except Exception as e:
-                if self.logger:
-                    self.logger.log("error", f"Unable to calculate Time In Study: {e}")
-                if self.logger:
-                    self.logger.log("error", traceback.format_exc())
-
+        derived_key = stage_key("derived", merge_key, self.derived_data)
+        primary_df = stage(
+            "derived",
+            derived_key,
+            lambda: calculate_derived_data(primary_df, self.derived_data, self.logger),
+        )
+
+        sort_key = stage_key("sort", derived_key, self.model)
+        primary_df = stage(
+            "sort",
+            sort_key,
+            lambda: sort_by_model(primary_df, self.model, self.logger),
+        )
+
+        # series rows of each animal in date order, for per animal queries
+        # and the longitudinal summary
+        longitudinal_df = None
         try:
-            if self.model.shape[0] > 0:
-                primary_df = primary_df.sort_values(
-                    by=list(self.model["factors"].values) + ["Animal ID"]
+            self.animal_index = vdeh_series.AnimalIndex.from_frame(primary_df)
+            if self.longitudinal_export:
+                longitudinal_df = self.animal_index.longitudinal_summary(
+                    primary_df, list(column_styles.values())
                 )
         except Exception as e:
             if self.logger:
-                self.logger.log("error", f"Unable to parse data model: {e}")
+                self.logger.log("error", f"unable to index animals: {e}")
             if self.logger:
                 self.logger.log("error", traceback.format_exc())
 
         # prepare summary ouputs
-
-        try:
-            if all(
+        analysis_ready = all(
+            [
                 self.animal_data.shape[0] > 0,
                 self.timepoint_data.shape[0] > 0,
                 self.derived_data.shape[0] > 0,
                 self.model.shape[0] > 0,
-            ):
-
-                # repeated measures style output for use with spss
-                horiz_split_var = self.model["factors"].values[0]
-                horiz_split_values = list(primary_df[horiz_split_var].unique())
-                horiz_split_values.sort()
-
-                secondary_df = primary_df[
-                    primary_df[horiz_split_var] == horiz_split_values[0]
-                ]
-                secondary_df.columns = [
-                    (
-                        "{}_[{}]".format(c, horiz_split_values[0])
-                        if c not in self.animal_data.columns
-                        else c
-                    )
-                    for c in secondary_df.columns
-                ]
-
-                for i in range(len(horiz_split_values) - 1):
-                    t = horiz_split_values[i + 1]
-
-                    temp_df = primary_df[primary_df[horiz_split_var] == t][
-                        ["Animal ID"] + ["Series Date"] + list(ColumnStyles.values())
-                    ]
-                    temp_df.columns = [
-                        "{}_[{}]".format(c, t) if c != "Animal ID" else c
-                        for c in temp_df.columns
-                    ]
-
-                    secondary_df = pandas.merge(
-                        secondary_df,
-                        temp_df,
-                        how="outer",
-                        on="Animal ID",
-                        suffixes=(
-                            "_[{}]".format(horiz_split_values[i]),
-                            "_[{}]".format(t),
-                        ),
-                    )
-                # % prism style output
-                split_var = self.model["factors"].values[-1]
-                group_splits = list(secondary_df[split_var].unique())
-                group_splits.sort()
-
-                col_split = re.compile("(((?P<col>.+)_\[(?P<tp>.*)\])|((?P<alt>.+)))")
-
-                tertiery_df = secondary_df[secondary_df[split_var] == group_splits[0]]
-                new_cols = []
-                for c in tertiery_df.columns:
-                    temp_re = re.search(col_split, c)
-                    if temp_re["col"] is not None:
-                        new_cols.append(
-                            "{}_[{}]_[{}]".format(
-                                re.search(col_split, c)["col"],
-                                group_splits[0],
-                                re.search(col_split, c)["tp"],
-                            )
-                        )
-                    else:
-                        new_cols.append("{}_[{}]".format(c, group_splits[0]))
-                tertiery_df.columns = new_cols
-
-                for i in range(len(group_splits) - 1):
-                    g = group_splits[i + 1]
-
-                    temp_df = secondary_df[secondary_df[split_var] == g]
-                    new_cols = []
-                    for c in temp_df.columns:
-                        temp_re = re.search(col_split, c)
-                        if temp_re["col"] is not None:
-                            new_cols.append(
-                                "{}_[{}]_[{}]".format(
-                                    re.search(col_split, c)["col"],
-                                    g,
-                                    re.search(col_split, c)["tp"],
-                                )
-                            )
-                        else:
-                            new_cols.append("{}_[{}]".format(c, g))
-                    temp_df.columns = new_cols
-
-                    tertiery_df = pandas.concat(
-                        [tertiery_df, temp_df],
-                        axis=1,
-                        sort=True,  # added because of future warning
-                    )
-                tc = list(tertiery_df.columns)
-                tc.sort()
-                tertiery_df = tertiery_df[tc]
-                tertiery_df = tertiery_df.fillna("")
+            ]
+        )
+        secondary_df = tertiery_df = stats_df = pairwise_df = None
+        plots = []
+        try:
+            if analysis_ready:
+                secondary_df, tertiery_df = stage(
+                    "reshape",
+                    stage_key("reshape", sort_key, column_styles),
+                    lambda: reshape_report(
+                        primary_df, self.model, self.animal_data, column_styles
+                    ),
+                )
 
-            # % prepare for excel export
-            stats_df = pandas.DataFrame()
-            graphs_df = pandas.DataFrame()
+                # % run stats
+                resampling = {
+                    "iterations": self.resample_iterations,
+                    "seed": self.resample_seed,
+                    "workers": self.resample_workers,
+                }
+                stats_df, pairwise_df, plots = stage(
+                    "stats",
+                    stage_key(
+                        "stats",
+                        sort_key,
+                        column_styles,
+                        OUTCOME_ANALYSIS_SETTINGS,
+                        # workers do not change the results
+                        {k: v for k, v in resampling.items() if k != "workers"},
+                    ),
+                    lambda: outcome_stats(
+                        primary_df,
+                        self.model,
+                        column_styles,
+                        self.result_cache,
+                        self.logger,
+                        self.plot_cache if plot_dir else None,
+                        resampling,
+                    ),
+                )
+        except Exception as e:
+            if self.logger:
+                self.logger.log("error", f"unable to process data: {e}")
+            if self.logger:
+                self.logger.log("error", traceback.format_exc())
 
+        # % prepare for excel export
+        try:
             writer = pandas.ExcelWriter(self.output_path, engine="xlsxwriter")
 
             try:
@@ -824,199 +3772,150 @@ class vdeh_model:
                 if self.logger:
                     self.logger.log("error", traceback.format_exc())
 
-            primary_df.to_excel(writer, "vertical", index=False)
+            primary_df.to_excel(writer, sheet_name="vertical", index=False)
 
-            if all(
-                self.animal_data.shape[0] > 0,
-                self.timepoint_data.shape[0] > 0,
-                self.derived_data.shape[0] > 0,
-                self.model.shape[0] > 0,
-            ):
+            if secondary_df is not None:
+                secondary_df.to_excel(writer, sheet_name="horizontal", index=False)
+                tertiery_df.to_excel(writer, sheet_name="split", index=False)
 
-                secondary_df.to_excel(writer, "horizontal", index=False)
-                tertiery_df.to_excel(writer, "split", index=False)
-                graphs_df.to_excel(writer, "graphs", index=False)
+            if stats_df is not None:
+                pandas.DataFrame().to_excel(writer, sheet_name="graphs", index=False)
                 worksheet = writer.sheets["graphs"]
-
-                # % run stats
-                # get list of independent factors
-                ind_vars = list(self.model["factors"].values)
-                iv_dict = {}
-                iv_dict_rev = {}
-
-                # prepare stats dataframe to be used for easy export
-                stats_df = pandas.DataFrame()
-                pairwise_df = pandas.DataFrame()
-
-                # prepare key for independent factors
-                # - column names #note reserved format style
-                for k in range(len(ind_vars)):
-                    iv_dict[ind_vars[k]] = "__F{}__".format(k)
-                    iv_dict_rev["__F{}__".format(k)] = ind_vars[k]
-
-                # iterate through outcome measure columns and clean data for ANOVA
-                counter = 0
-                for c in ColumnStyles.values():
-                    temp_df = primary_df[[c] + list(self.model["factors"].values)]
-                    temp_df.loc[:, c] = pandas.to_numeric(temp_df[c], errors="coerce")
-                    temp_df = temp_df.dropna()
-
-                    temp_df["om"] = temp_df[c]
-                    temp_df["gp"] = ""
-
-                    for k in iv_dict_rev:
-                        temp_df[k] = temp_df[iv_dict_rev[k]]
-                        temp_df["gp"] += temp_df[k].astype(str)
-
-                    homosced = pingouin.homoscedasticity(temp_df, dv="om", group="gp")[
-                        "pval"
-                    ].values[0]
-                    try:
-                        normal = pingouin.normality(temp_df, dv="om", group="gp")[
-                            "pval"
-                        ].values[0]
-                    except:
-                        normal = "unable to test"
-                    table = temp_df.anova(
-                        "om", between=list(iv_dict_rev.keys()), ss_type=3
-                    )
-                    table["levene pval"] = str(homosced)
-                    table["shapiro pval"] = str(normal)
-
-                    # replace independent factor placeholders with original names
-                    for k in iv_dict_rev:
-                        table["Source"] = table["Source"].replace(
-                            k, iv_dict_rev[k], regex=True
-                        )
-                    table["outcome_measure"] = c
-                    stats_df = stats_df.append(table)
-
-                    # create data frame to assist with summary plot generation
-                    #   (uses pandas agg function)
-                    agg_df = (
-                        temp_df.groupby(ind_vars)
-                        .agg([numpy.mean, len, scipy.stats.sem])
-                        .reset_index()
-                    )
-                    agg_cols = agg_df.columns
-                    agg_df.columns = [i[0] if i[0] != c else i[1] for i in agg_cols]
-                    agg_df["axis"] = agg_df[ind_vars].astype(str).agg("_".join, axis=1)
-
-                    temp_plot = agg_df.plot(
-                        kind="barh",
-                        title=c + " [mean+/-sem]",
-                        legend=True,
-                        y="mean",
-                        x="axis",
-                    )
-                    temp_plot.errorbar(
-                        agg_df["mean"],
-                        agg_df["axis"],
-                        xerr=agg_df["sem"],
-                        ecolor="black",
-                        linewidth=0,
-                        elinewidth=1,
-                        capsize=4,
-                    )
-                    temp_plot.set(xlabel=c, ylabel="_".join(ind_vars))
-                    temp_plot = temp_plot.get_figure()
-
-                    temp_plot.savefig(
-                        self.output_path
-                        + "_"
-                        + re.sub(r'[\\/\:*"<>\|\.%\$\^&£]', "", c)
-                        + ".png",
-                        bbox_inches="tight",
-                    )
-                    worksheet.insert_image(
-                        "B{}".format(2 + counter * 20),
+                for counter, (c, png_bytes) in enumerate(plots):
+                    png_path = (
                         self.output_path
                         + "_"
                         + re.sub(r'[\\/\:*"<>\|\.%\$\^&£]', "", c)
-                        + ".png",
+                        + ".png"
                     )
-                    counter += 1
+                    write_if_changed(png_path, png_bytes)
+                    worksheet.insert_image("B{}".format(2 + counter * 20), png_path)
 
-                    # produce pairwise comparisons
-                    pairwise_list = []
+                stats_df.to_excel(writer, sheet_name="stats", index=False)
+                pairwise_df.to_excel(writer, sheet_name="pairwise", index=False)
 
-                    for i in range(len(iv_dict_rev)):
-                        pairwise_list += list(
-                            itertools.combinations(iv_dict_rev, i + 1)
-                        )
+            if longitudinal_df is not None:
+                longitudinal_df.to_excel(writer, sheet_name="longitudinal", index=False)
+
+            writer.close()
+            if self.logger:
+                self.logger.log("info", f"Output Saved - {self.output_path}")
 
-                    for i in pairwise_list:
-                        if len(i) > 1:
-                            temp_df["*".join(i)] = (
-                                temp_df[[j for j in i]]
-                                .astype(str)
-                                .agg(" * ".join, axis=1)
-                            )
+            table_export(
+                {
+                    k: v
+                    for k, v in {
+                        "vertical": primary_df,
+                        "horizontal": secondary_df,
+                        "stats": stats_df,
+                        "pairwise": pairwise_df,
+                        "longitudinal": longitudinal_df,
+                    }.items()
+                    if v is not None
+                },
+                self.output_path,
+                self.export_formats,
+                self.logger,
+            )
 
-                        pairs = list(
-                            itertools.combinations(temp_df["*".join(i)].unique(), 2)
-                        )
-                        for p in pairs:
-
-                            if (
-                                len(temp_df[temp_df["*".join(i)] == p[0]]) < 2
-                                or len(temp_df[temp_df["*".join(i)] == p[1]]) < 2
-                            ):
-                                pairwise_df = pairwise_df.append(
-                                    pandas.DataFrame(
-                                        {
-                                            "outcome_measure": [c],
-                                            "comparison": [
-                                                " vs ".join([str(q) for q in p])
-                                            ],
-                                            "notes": ["cannot compare"],
-                                        }
-                                    )
-                                )
-                                continue
-
-                            temp_p_df = pingouin.ttest(
-                                temp_df[temp_df["*".join(i)] == p[0]]["om"],
-                                temp_df[temp_df["*".join(i)] == p[1]]["om"],
-                            )
-                            temp_np_df = pingouin.mwu(
-                                temp_df[temp_df["*".join(i)] == p[0]]["om"],
-                                temp_df[temp_df["*".join(i)] == p[1]]["om"],
-                            )
-                            pw_stats_df = temp_p_df
-                            pw_stats_df.index = ["PAIRWISE"]
-                            pw_stats_df["ttest pval"] = temp_p_df["p-val"]
-                            pw_stats_df["mwu pval"] = temp_np_df["p-val"].values[0]
-                            pw_stats_df.pop("p-val")
-                            pw_stats_df["outcome_measure"] = c
-                            pw_stats_df["comparison"] = " vs ".join(
-                                [str(q) for q in (p)]
-                            )
-                            pairwise_df = pairwise_df.append(pw_stats_df)
-
-                pairwise_df = pairwise_df.reset_index()
-                pairwise_df = pairwise_df[
-                    ["outcome_measure", "comparison"]
-                    + [
-                        j
-                        for j in pairwise_df
-                        if j not in ["outcome_measure", "comparison", "notes"]
-                    ]
-                    + ["notes"]
-                ]
+        except Exception as e:
+            if self.logger:
+                self.logger.log("error", f"Unable to save file: {e}")
+            if self.logger:
+                self.logger.log("error", traceback.format_exc())
+
+    def generate_chunked_report(self):
+        # out-of-core report - series rows are spilled to parquet chunks in
+        # spill_dir as the reports are parsed and only the cell statistics of
+        # the model factors are kept, so the group summary, anova tables and
+        # plots are built without holding every series in memory
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            if self.logger:
+                self.logger.log("error", "pyarrow is required for out-of-core reports")
+            return
+
+        plot_dir = self.plot_cache_dir or report_plot_dir(self.checkpoint_dir)
+        if plot_dir and (
+            self.plot_cache is None or self.plot_cache.directory != plot_dir
+        ):
+            self.plot_cache = PlotCache(plot_dir, self.plot_cache_size)
+
+        try:
+            accumulator, column_styles, chunks = spill_reports(
+                self.input_paths,
+                self.column_names,
+                self.spill_dir,
+                self.animal_data,
+                self.timepoint_data,
+                self.derived_data,
+                list(self.model["factors"].values) if self.model.shape[0] else [],
+                self.chunk_series,
+                self.logger,
+                self.duplicate_policy,
+                self.parse_workers,
+                report_index_dir(self.checkpoint_dir),
+                self.prefetch_depth,
+            )
+        except Exception as e:
+            if self.logger:
+                self.logger.log("error", f"ERROR: Unable to collect data: {e}")
+            if self.logger:
+                self.logger.log("error", traceback.format_exc())
+            return
 
-                stats_df.to_excel(writer, "stats", index=False)
-                pairwise_df.to_excel(writer, "pairwise", index=False)
+        summary_df = stats_df = None
+        plots = []
+        try:
+            if accumulator.factors:
+                summary_df, stats_df, plots = chunked_stats(
+                    accumulator,
+                    column_styles,
+                    self.logger,
+                    self.plot_cache if plot_dir else None,
+                )
+            elif self.logger:
+                self.logger.log("warning", "no model factors - only spilling series")
         except Exception as e:
             if self.logger:
                 self.logger.log("error", f"unable to process data: {e}")
             if self.logger:
                 self.logger.log("error", traceback.format_exc())
+
         try:
-            writer.save()
+            writer = pandas.ExcelWriter(self.output_path, engine="xlsxwriter")
+            pandas.DataFrame(chunks, columns=["chunk", "series"]).to_excel(
+                writer, sheet_name="chunks", index=False
+            )
+            if summary_df is not None:
+                summary_df.to_excel(writer, sheet_name="summary", index=False)
+                pandas.DataFrame().to_excel(writer, sheet_name="graphs", index=False)
+                worksheet = writer.sheets["graphs"]
+                for counter, (c, png_bytes) in enumerate(plots):
+                    png_path = (
+                        self.output_path
+                        + "_"
+                        + re.sub(r'[\\/\:*"<>\|\.%\$\^&£]', "", c)
+                        + ".png"
+                    )
+                    write_if_changed(png_path, png_bytes)
+                    worksheet.insert_image("B{}".format(2 + counter * 20), png_path)
+                stats_df.to_excel(writer, sheet_name="stats", index=False)
+            writer.close()
             if self.logger:
                 self.logger.log("info", f"Output Saved - {self.output_path}")
 
+            table_export(
+                {
+                    k: v
+                    for k, v in {"summary": summary_df, "stats": stats_df}.items()
+                    if v is not None
+                },
+                self.output_path,
+                self.export_formats,
+                self.logger,
+            )
         except Exception as e:
             if self.logger:
                 self.logger.log("error", f"Unable to save file: {e}")
@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+"""
+VDEH_resample
+
+bootstrap confidence intervals and permutation p values for the pairwise
+comparisons of the outcome measures - resampling index matrices are drawn
+once per group structure (the sizes of the two groups compared) and applied
+to every outcome measure at once. Iterations are split into fixed size
+chunks, each seeded from one seed, so results are reproducible and do not
+depend on the number of processes the chunks are spread over
+"""
+
+__component_version__ = "1.0"
+__license__ = "MIT License"
+
+# %% import modules/libraries
+import concurrent.futures
+import itertools
+import warnings
+
+import numpy
+import pandas
+
+# %% define functions
+
+# iterations per chunk, chunks are the unit of work of the worker processes
+CHUNK_SIZE = 1000
+
+
+def comparison_groups(df, ind_vars):
+    """
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        report data with the independent factor columns
+    ind_vars : list of strings
+        independent factors from the model
+
+    Returns
+    -------
+    comparisons : list of tuples
+        (comparison, rows_a, rows_b) of the pairwise comparisons made by
+        vdeh_model.analyze_outcome - every pair of levels of every
+        combination of factors, with the row positions of each group
+
+    """
+    comparisons = []
+    for k in range(len(ind_vars)):
+        for factors in itertools.combinations(ind_vars, k + 1):
+            labels = df[list(factors)].astype(str).agg(" * ".join, axis=1)
+            codes, levels = pandas.factorize(labels)
+            rows = [numpy.flatnonzero(codes == i) for i in range(len(levels))]
+            for a, b in itertools.combinations(range(len(levels)), 2):
+                comparisons.append((f"{levels[a]} vs {levels[b]}", rows[a], rows[b]))
+    return comparisons
+
+
+def _group_means(values, index):
+    # values (n x outcomes) taken at index (iterations x k), mean over k
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        return numpy.nanmean(values[index], axis=1)
+
+
+def resample_chunk(values, comparisons, iterations, seed):
+    """
+    run one chunk of bootstrap and permutation iterations
+
+    Parameters
+    ----------
+    values : numpy.ndarray
+        (series x outcomes) outcome values, nan where missing
+    comparisons : list of tuples
+        (rows_a, rows_b) of each comparison
+    iterations : int
+    seed : numpy.random.SeedSequence
+
+    Returns
+    -------
+    boot : numpy.ndarray
+        (comparisons x iterations x outcomes) bootstrap differences in means
+    exceed : numpy.ndarray
+        (comparisons x outcomes) number of permutations with an absolute
+        difference at least as large as the observed one
+    counts : numpy.ndarray
+        (comparisons x outcomes) number of permutations with a difference
+
+    """
+    rng = numpy.random.default_rng(seed)
+    boot = numpy.full((len(comparisons), iterations, values.shape[1]), numpy.nan)
+    exceed = numpy.zeros((len(comparisons), values.shape[1]), dtype="int64")
+    counts = numpy.zeros((len(comparisons), values.shape[1]), dtype="int64")
+
+    # index matrices are shared by every comparison with the same group sizes
+    draws = {}
+    for i, (rows_a, rows_b) in enumerate(comparisons):
+        na, nb = len(rows_a), len(rows_b)
+        if (na, nb) not in draws:
+            draws[(na, nb)] = (
+                rng.integers(0, na, size=(iterations, na)),
+                rng.integers(0, nb, size=(iterations, nb)),
+                rng.permuted(
+                    numpy.tile(numpy.arange(na + nb), (iterations, 1)), axis=1
+                ),
+            )
+        boot_a, boot_b, permutation = draws[(na, nb)]
+
+        a = values[rows_a]
+        b = values[rows_b]
+        boot[i] = _group_means(a, boot_a) - _group_means(b, boot_b)
+
+        observed = _group_means(a, numpy.arange(na)[None]) - _group_means(
+            b, numpy.arange(nb)[None]
+        )
+        pooled = numpy.concatenate([a, b])
+        permuted = _group_means(pooled, permutation[:, :na]) - _group_means(
+            pooled, permutation[:, na:]
+        )
+        # small tolerance so ties with the observed difference count
+        exceed[i] = (
+            numpy.abs(permuted) >= numpy.abs(observed) * (1 - 1e-9) - 1e-12
+        ).sum(axis=0)
+        counts[i] = (~numpy.isnan(permuted)).sum(axis=0)
+
+    return boot, exceed, counts
+
+
+def resample(values, comparisons, iterations=10000, seed=0, workers=1, confidence=0.95):
+    """
+    Parameters
+    ----------
+    values : numpy.ndarray
+        (series x outcomes) outcome values, nan where missing
+    comparisons : list of tuples
+        (rows_a, rows_b) of each comparison
+    iterations : int, optional
+        number of bootstrap resamples and permutations
+    seed : int, optional
+        results are reproducible for the same seed and iterations
+    workers : int, optional
+        number of processes the chunks of iterations are spread over
+    confidence : float, optional
+        level of the bootstrap (percentile) confidence intervals
+
+    Returns
+    -------
+    diff, low, high, pval : numpy.ndarray
+        (comparisons x outcomes) observed difference in means, bootstrap
+        confidence interval and permutation p value
+
+    """
+    sizes = [
+        min(CHUNK_SIZE, iterations - start)
+        for start in range(0, iterations, CHUNK_SIZE)
+    ]
+    seeds = numpy.random.SeedSequence(seed).spawn(len(sizes))
+    values = numpy.asarray(values, dtype="float64")
+
+    if workers > 1 and len(sizes) > 1:
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=min(workers, len(sizes))
+        ) as executor:
+            results = list(
+                executor.map(
+                    resample_chunk,
+                    itertools.repeat(values),
+                    itertools.repeat(comparisons),
+                    sizes,
+                    seeds,
+                )
+            )
+    else:
+        results = [
+            resample_chunk(values, comparisons, n, s) for n, s in zip(sizes, seeds)
+        ]
+
+    boot = numpy.concatenate([r[0] for r in results], axis=1)
+    exceed = sum(r[1] for r in results)
+    counts = sum(r[2] for r in results)
+
+    diff = numpy.array(
+        [
+            _group_means(values[a], numpy.arange(len(a))[None])[0]
+            - _group_means(values[b], numpy.arange(len(b))[None])[0]
+            for a, b in comparisons
+        ]
+    ).reshape(len(comparisons), values.shape[1])
+    tail = 100 * (1 - confidence) / 2
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        low, high = numpy.nanpercentile(boot, [tail, 100 - tail], axis=1)
+    with numpy.errstate(invalid="ignore", divide="ignore"):
+        pval = (exceed + 1) / (counts + 1)
+
+    # groups need 2 values to be compared (as for the parametric tests)
+    for i, (a, b) in enumerate(comparisons):
+        too_few = ((~numpy.isnan(values[a])).sum(axis=0) < 2) | (
+            (~numpy.isnan(values[b])).sum(axis=0) < 2
+        )
+        for result in [diff, low, high, pval]:
+            result[i, too_few] = numpy.nan
+
+    return diff, low, high, pval
+
+
+def resample_pairwise(
+    primary_df, ind_vars, outcomes, iterations=10000, seed=0, workers=1
+):
+    """
+    Parameters
+    ----------
+    primary_df : pandas.DataFrame
+        report data with the outcome and independent factor columns
+    ind_vars : list of strings
+        independent factors from the model
+    outcomes : list of strings
+        outcome measure columns
+    iterations, seed, workers
+        see resample
+
+    Returns
+    -------
+    pandas.DataFrame
+        one row per outcome measure and comparison (in both orders of the
+        groups) with the mean diff, bootstrap ci low/high and permutation
+        pval
+
+    """
+    df = primary_df.dropna(subset=ind_vars).reset_index(drop=True)
+    values = df[outcomes].apply(pandas.to_numeric, errors="coerce").to_numpy("float64")
+    groups = comparison_groups(df, ind_vars)
+    diff, low, high, pval = resample(
+        values, [(a, b) for _, a, b in groups], iterations, seed, workers
+    )
+
+    labels = [c for c, _, _ in groups]
+    reverse = [" vs ".join(c.split(" vs ")[::-1]) for c in labels]
+    # outcome measures vary fastest, matching the (comparison x outcome) arrays
+    forward = pandas.DataFrame(
+        {
+            "outcome_measure": numpy.tile(outcomes, len(labels)),
+            "comparison": numpy.repeat(labels, len(outcomes)),
+            "mean diff": diff.ravel(),
+            "bootstrap ci low": low.ravel(),
+            "bootstrap ci high": high.ravel(),
+            "permutation pval": pval.ravel(),
+        }
+    )
+    # the groups of a comparison are named in the order they are found in the
+    # data of each outcome, so both orders are listed
+    backward = forward.assign(
+        comparison=numpy.repeat(reverse, len(outcomes)),
+        **{
+            "mean diff": -forward["mean diff"],
+            "bootstrap ci low": -forward["bootstrap ci high"],
+            "bootstrap ci high": -forward["bootstrap ci low"],
+        },
+    )
+    return pandas.concat([forward, backward]).drop_duplicates(
+        ["outcome_measure", "comparison"]
+    )
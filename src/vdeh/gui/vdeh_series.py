@@ -0,0 +1,533 @@
+# -*- coding: utf-8 -*-
+"""
+VDEH_series
+
+long format in-memory store of extracted series - series level metadata is
+kept as one row per series and measurements/calculations as typed arrays of
+(series_id, measurement_id, value) holding only the values actually present,
+wide frames are built on demand for the columns an export or analysis needs,
+raw values of number suffixed (replicated) measurements are kept in a
+compressed sparse row store alongside, and an index of each animal's series
+in date order backs longitudinal (per animal over time) summaries
+"""
+
+__component_version__ = "1.0"
+__license__ = "MIT License"
+
+# %% import modules/libraries
+import numpy
+import pandas
+
+# %% define classes
+
+# key of the series dict entry holding the raw values of number suffixed
+# measurements, see vdeh_model.parse_series_block
+REPLICATES = "__replicates__"
+
+
+class ReplicateStore:
+    """
+    raw values of replicated measurements, one cell per (series,
+    measurement) with the values of cell i in values[offsets[i]:offsets[i + 1]]
+
+    Attributes
+    ----------
+    keys : list of strings
+        measurement key of each measurement_id (shared with the SeriesTable)
+    series_ids, measurement_ids : numpy.ndarray of int32
+        series and measurement of each cell
+    offsets : numpy.ndarray of int64
+        start of each cell in values, followed by the number of values
+    values : numpy.ndarray of float64
+        replicate values cell by cell, nan where the value is not a number
+
+    """
+
+    def __init__(self, keys, series_ids, measurement_ids, offsets, values):
+        self.keys = keys
+        self.series_ids = series_ids
+        self.measurement_ids = measurement_ids
+        self.offsets = offsets
+        self.values = values
+
+    def __len__(self):
+        return len(self.series_ids)
+
+    @property
+    def nbytes(self):
+        return (
+            self.series_ids.nbytes
+            + self.measurement_ids.nbytes
+            + self.offsets.nbytes
+            + self.values.nbytes
+        )
+
+    def counts(self):
+        return numpy.diff(self.offsets)
+
+    def stats(self):
+        """
+        Returns
+        -------
+        pandas.DataFrame
+            one row per cell with series_id, measurement and the N, Mean, SD,
+            CV (%), Min and Max of its (numeric) replicate values
+        """
+        starts = self.offsets[:-1]
+        if len(starts) == 0:
+            return pandas.DataFrame(
+                columns=["series_id", "measurement", "N", "Mean", "SD"]
+                + ["CV (%)", "Min", "Max"]
+            )
+        valid = ~numpy.isnan(self.values)
+        filled = numpy.where(valid, self.values, 0.0)
+
+        with numpy.errstate(invalid="ignore", divide="ignore"):
+            n = numpy.add.reduceat(valid.astype("int64"), starts)
+            mean = numpy.add.reduceat(filled, starts) / n
+            deviation = numpy.where(
+                valid, self.values - numpy.repeat(mean, self.counts()), 0.0
+            )
+            sd = numpy.sqrt(numpy.add.reduceat(deviation**2, starts) / (n - 1))
+            sd[n < 2] = numpy.nan
+            cv = 100 * sd / numpy.abs(mean)
+            lowest = numpy.fmin.reduceat(self.values, starts)
+            highest = numpy.fmax.reduceat(self.values, starts)
+
+        return pandas.DataFrame(
+            {
+                "series_id": self.series_ids,
+                "measurement": numpy.asarray(self.keys, dtype=object)[
+                    self.measurement_ids
+                ],
+                "N": n,
+                "Mean": mean,
+                "SD": sd,
+                "CV (%)": cv,
+                "Min": lowest,
+                "Max": highest,
+            }
+        )
+
+    def long(self):
+        """
+        Returns
+        -------
+        pandas.DataFrame
+            one row per replicate value with series_id, measurement,
+            replicate (numbered from 1 within each cell) and value
+        """
+        counts = self.counts()
+        cell = numpy.repeat(numpy.arange(len(self)), counts)
+        return pandas.DataFrame(
+            {
+                "series_id": self.series_ids[cell],
+                "measurement": numpy.asarray(self.keys, dtype=object)[
+                    self.measurement_ids[cell]
+                ],
+                "replicate": numpy.arange(len(self.values))
+                - self.offsets[:-1][cell]
+                + 1,
+                "value": self.values,
+            }
+        )
+
+
+class SeriesTable:
+    """
+    Attributes
+    ----------
+    metadata : pandas.DataFrame
+        series level metadata, one row per series (row number is the series_id)
+    keys : list of strings
+        VevoLab Measurement_Mode_Parameter or Calculation of each
+        measurement_id
+    series_ids, measurement_ids : numpy.ndarray of int32
+        series and measurement of each value
+    values : numpy.ndarray of float64
+        measurement values, nan where the value is not a number
+    text : pandas.DataFrame
+        series_id, measurement_id and text of values that are not numbers
+        (usually empty)
+    columns : list of strings
+        metadata fields and measurement keys in the order they were first
+        found, the column order of the full wide frame
+    replicates : ReplicateStore
+        raw values of the number suffixed measurements
+
+    """
+
+    def __init__(
+        self,
+        metadata,
+        keys,
+        series_ids,
+        measurement_ids,
+        values,
+        text,
+        columns,
+        replicates=None,
+    ):
+        self.metadata = metadata
+        self.keys = keys
+        self.series_ids = series_ids
+        self.measurement_ids = measurement_ids
+        self.values = values
+        self.text = text
+        self.columns = columns
+        if replicates is None:
+            replicates = ReplicateStore(
+                keys,
+                numpy.empty(0, dtype="int32"),
+                numpy.empty(0, dtype="int32"),
+                numpy.zeros(1, dtype="int64"),
+                numpy.empty(0),
+            )
+        self.replicates = replicates
+
+    @classmethod
+    def from_reports(cls, report_dicts, measurement_keys):
+        """
+        Parameters
+        ----------
+        report_dicts : iterable of dicts of dicts
+            series data of each report keyed by series name (see
+            vdeh_model.parse_report)
+        measurement_keys : collection of strings
+            fields holding measurements/calculations, any other field is
+            series metadata
+
+        """
+        measurement_keys = set(measurement_keys)
+        key_ids = {}
+        columns = {}
+        metadata = []
+        series_ids = []
+        measurement_ids = []
+        raw = []
+        replicate_series = []
+        replicate_measurements = []
+        replicate_counts = []
+        replicate_values = []
+
+        for report_dict in report_dicts:
+            for series_dict in report_dict.values():
+                series_id = len(metadata)
+                row = {}
+                for k, v in series_dict.items():
+                    if k == REPLICATES:
+                        keys, counts, values = v
+                        replicate_series += [series_id] * len(keys)
+                        replicate_measurements += [
+                            key_ids.setdefault(key, len(key_ids)) for key in keys
+                        ]
+                        replicate_counts += counts
+                        replicate_values.append(values)
+                        continue
+                    columns.setdefault(k, None)
+                    if k in measurement_keys:
+                        series_ids.append(series_id)
+                        measurement_ids.append(key_ids.setdefault(k, len(key_ids)))
+                        raw.append(v)
+                    else:
+                        row[k] = v
+                metadata.append(row)
+
+        raw = pandas.Series(raw, dtype=object)
+        values = pandas.to_numeric(raw, errors="coerce").to_numpy(dtype="float64")
+        series_ids = numpy.asarray(series_ids, dtype="int32")
+        measurement_ids = numpy.asarray(measurement_ids, dtype="int32")
+
+        # values that are not numbers (e.g. ERROR_NA) are kept as text
+        is_text = numpy.isnan(values) & raw.notna().to_numpy()
+        is_text[is_text] = raw[is_text].astype(str).str.strip().ne("").to_numpy()
+        text = pandas.DataFrame(
+            {
+                "series_id": series_ids[is_text],
+                "measurement_id": measurement_ids[is_text],
+                "text": raw[is_text].astype(str).to_numpy(),
+            }
+        )
+
+        keys = list(key_ids)
+        replicates = ReplicateStore(
+            keys,
+            numpy.asarray(replicate_series, dtype="int32"),
+            numpy.asarray(replicate_measurements, dtype="int32"),
+            numpy.concatenate([[0], numpy.cumsum(replicate_counts, dtype="int64")]),
+            numpy.concatenate(
+                [numpy.frombuffer(v, dtype="float64") for v in replicate_values]
+                or [numpy.empty(0)]
+            ),
+        )
+
+        return cls(
+            pandas.DataFrame.from_records(metadata),
+            keys,
+            series_ids,
+            measurement_ids,
+            values,
+            text,
+            list(columns),
+            replicates,
+        )
+
+    def __len__(self):
+        return self.metadata.shape[0]
+
+    @property
+    def nbytes(self):
+        return (
+            self.series_ids.nbytes
+            + self.measurement_ids.nbytes
+            + self.values.nbytes
+            + int(self.metadata.memory_usage(deep=True).sum())
+            + self.replicates.nbytes
+        )
+
+    def counts(self):
+        """
+        number of series with a value for each measurement key
+        """
+        return pandas.Series(
+            numpy.bincount(self.measurement_ids, minlength=len(self.keys)),
+            index=self.keys,
+        )
+
+    def replicate_summary(self, columns=("Series Name", "Animal ID", "Series Date")):
+        """
+        N, Mean, SD, CV (%), Min and Max of the replicates of each replicated
+        measurement of each series, with the given metadata columns
+        """
+        return self._with_metadata(self.replicates.stats(), columns)
+
+    def replicate_values(self, columns=("Series Name", "Animal ID", "Series Date")):
+        """
+        every replicate value (one row per value), with the given metadata
+        columns
+        """
+        return self._with_metadata(self.replicates.long(), columns)
+
+    def _with_metadata(self, df, columns):
+        metadata = self.metadata.reindex(columns=list(columns))
+        df = pandas.concat(
+            [
+                metadata.iloc[df["series_id"].to_numpy()].reset_index(drop=True),
+                df.drop(columns="series_id"),
+            ],
+            axis=1,
+        )
+        return df.rename(
+            columns={"measurement": "VevoLab Measurement_Mode_Parameter or Calculation"}
+        )
+
+    def wide(self, columns=None, sparse=False):
+        """
+        Parameters
+        ----------
+        columns : list of strings, optional
+            metadata fields and measurement keys to include (in this order,
+            unknown columns are all missing), default is every column
+        sparse : bool, optional
+            store measurement columns as pandas sparse columns
+
+        Returns
+        -------
+        pandas.DataFrame
+            one row per series
+
+        """
+        if columns is None:
+            columns = self.columns
+        key_ids = {k: i for i, k in enumerate(self.keys)}
+        wanted = [key_ids[c] for c in columns if c in key_ids]
+
+        # scatter the values of the wanted keys into a (series x wanted) array
+        position = numpy.full(len(self.keys), -1)
+        position[wanted] = numpy.arange(len(wanted))
+        selected = position[self.measurement_ids] >= 0 if wanted else None
+        dense = numpy.full((len(self), len(wanted)), numpy.nan)
+        if wanted:
+            dense[
+                self.series_ids[selected],
+                position[self.measurement_ids[selected]],
+            ] = self.values[selected]
+
+        frame = {}
+        text = self.text[self.text["measurement_id"].isin(wanted)]
+        for c in columns:
+            if c in key_ids:
+                column = dense[:, position[key_ids[c]]]
+                if key_ids[c] in text["measurement_id"].values:
+                    column = column.astype(object)
+                    rows = text[text["measurement_id"] == key_ids[c]]
+                    column[rows["series_id"].to_numpy()] = rows["text"].to_numpy()
+                    frame[c] = pandas.Series(column, dtype=object)
+                elif sparse:
+                    frame[c] = pandas.Series(
+                        pandas.arrays.SparseArray(column, fill_value=numpy.nan)
+                    )
+                else:
+                    frame[c] = pandas.Series(column)
+            elif c in self.metadata.columns:
+                frame[c] = self.metadata[c].reset_index(drop=True)
+            else:
+                frame[c] = pandas.Series(numpy.nan, index=range(len(self)))
+
+        return pandas.DataFrame(frame, index=pandas.RangeIndex(len(self)))
+
+
+class AnimalIndex:
+    """
+    series row positions of each animal in Series Date order, the rows of
+    animals[i] are order[offsets[i]:offsets[i + 1]] - built once from a
+    report frame and valid while its rows are not reordered
+
+    Attributes
+    ----------
+    animals : numpy.ndarray
+        Animal IDs, sorted
+    order : numpy.ndarray of int64
+        row positions grouped by animal, date sorted within each animal
+        (series without an Animal ID or Series Date are left out)
+    offsets : numpy.ndarray of int64
+        start of each animal in order, followed by the number of rows
+    dates : numpy.ndarray of datetime64
+        Series Date of each row in order
+
+    """
+
+    def __init__(self, animals, order, offsets, dates):
+        self.animals = animals
+        self.order = order
+        self.offsets = offsets
+        self.dates = dates
+        self.positions = {a: i for i, a in enumerate(animals)}
+
+    @classmethod
+    def from_frame(cls, df, animal_column="Animal ID", date_column="Series Date"):
+        # series without an Animal ID keep code -1 (not a "nan" animal)
+        present = df[animal_column].notna().to_numpy()
+        codes = numpy.full(len(df), -1, dtype="int64")
+        codes[present], animals = pandas.factorize(
+            df[animal_column][present].astype(str), sort=True
+        )
+        dates = pandas.to_datetime(df[date_column], errors="coerce").to_numpy()
+
+        keep = numpy.flatnonzero((codes >= 0) & ~numpy.isnat(dates))
+        order = keep[numpy.lexsort((dates[keep], codes[keep]))]
+        counts = numpy.bincount(codes[order], minlength=len(animals))
+        return cls(
+            numpy.asarray(animals, dtype=object),
+            order.astype("int64"),
+            numpy.concatenate([[0], numpy.cumsum(counts)]).astype("int64"),
+            dates[order],
+        )
+
+    def __len__(self):
+        return len(self.animals)
+
+    def __contains__(self, animal_id):
+        return str(animal_id) in self.positions
+
+    def rows(self, animal_id):
+        """
+        row positions of the series of animal_id in date order
+        """
+        i = self.positions.get(str(animal_id))
+        if i is None:
+            return self.order[:0]
+        return self.order[self.offsets[i] : self.offsets[i + 1]]
+
+    def trajectory(self, df, animal_id, columns=None):
+        """
+        Series Date and the given columns (default every column) of the
+        series of animal_id in date order
+        """
+        rows = df.iloc[self.rows(animal_id)]
+        return rows if columns is None else rows[["Series Date"] + list(columns)]
+
+    def longitudinal_summary(self, df, columns):
+        """
+        Parameters
+        ----------
+        df : pandas.DataFrame
+            the frame the index was built from
+        columns : list of strings
+            measurement columns to summarize
+
+        Returns
+        -------
+        pandas.DataFrame
+            one row per animal and measurement with a value - N, first and
+            last Series Date and value, Change (last - first, the first value
+            is the baseline), Change (%) and Slope (least squares change per
+            day)
+
+        """
+        counts = numpy.diff(self.offsets)
+        starts = self.offsets[:-1][counts > 0]
+        animals = self.animals[counts > 0]
+        if len(starts) == 0 or not columns:
+            return pandas.DataFrame(
+                columns=["Animal ID", "Measurement", "N", "First Date", "Last Date"]
+                + ["First", "Last", "Change", "Change (%)", "Slope (per day)"]
+            )
+
+        values = (
+            df[columns]
+            .apply(pandas.to_numeric, errors="coerce")
+            .to_numpy(dtype="float64")[self.order]
+        )
+        valid = ~numpy.isnan(values)
+        # days since each animal's first series
+        first_day = numpy.repeat(self.dates[starts], counts[counts > 0])
+        days = ((self.dates - first_day) / numpy.timedelta64(1, "D"))[:, None]
+        position = numpy.arange(len(self.order))[:, None]
+
+        n = numpy.add.reduceat(valid.astype("int64"), starts, axis=0)
+        first = numpy.minimum.reduceat(
+            numpy.where(valid, position, len(self.order)), starts, axis=0
+        )
+        last = numpy.maximum.reduceat(numpy.where(valid, position, -1), starts, axis=0)
+        has = n > 0
+        first = numpy.where(has, first, 0)
+        last = numpy.where(has, last, 0)
+        column = numpy.arange(len(columns))
+        first_value = values[first, column]
+        last_value = values[last, column]
+
+        # least squares slope of value on days within each animal
+        x = numpy.where(valid, days, 0.0)
+        y = numpy.where(valid, values, 0.0)
+        sx = numpy.add.reduceat(x, starts, axis=0)
+        sy = numpy.add.reduceat(y, starts, axis=0)
+        sxx = numpy.add.reduceat(x * x, starts, axis=0)
+        sxy = numpy.add.reduceat(x * y, starts, axis=0)
+        with numpy.errstate(invalid="ignore", divide="ignore"):
+            denominator = n * sxx - sx * sx
+            slope = numpy.where(
+                (n > 1) & (denominator > 0),
+                (n * sxy - sx * sy) / denominator,
+                numpy.nan,
+            )
+            change = last_value - first_value
+            change_pct = 100 * change / numpy.abs(first_value)
+
+        summary = pandas.DataFrame(
+            {
+                "Animal ID": numpy.repeat(animals, len(columns)),
+                "Measurement": numpy.tile(
+                    numpy.asarray(columns, dtype=object), len(animals)
+                ),
+                "N": n.ravel(),
+                "First Date": self.dates[first].ravel(),
+                "Last Date": self.dates[last].ravel(),
+                "First": first_value.ravel(),
+                "Last": last_value.ravel(),
+                "Change": change.ravel(),
+                "Change (%)": change_pct.ravel(),
+                "Slope (per day)": slope.ravel(),
+            }
+        )
+        return summary[has.ravel()].reset_index(drop=True)
@@ -0,0 +1,369 @@
+# -*- coding: utf-8 -*-
+"""
+VDEH_service
+
+long running local extraction service - the analysis libraries stay imported
+and parsed reports, settings workbooks and stats results are cached between
+jobs. Jobs are posted as json to a localhost http port (see submit_job for
+the client side). Requests must carry the token of the running service
+(written to a file only the user can read, see token_path), be sent as
+application/json and come without an Origin header, so web pages open in a
+browser can not submit jobs. A job is a dict with the same options as
+express mode:
+
+    inputs : list of report paths (files or directories)
+    output : output path
+    settings : settings file path (optional)
+    store : series store path (optional)
+    wide : join study metadata onto series rows (optional)
+    sparse : keep measurement columns as pandas sparse columns (optional)
+    replicates : also save replicate statistics and values of number suffixed
+        measurements (optional)
+    longitudinal : also save the first/last value, change from baseline and
+        slope of every measurement of each animal (optional)
+    scan : only scan reports and save a settings template (optional)
+    query : dict of store selection options - animal, measure, start, end
+        (optional, builds the output from the store)
+    duplicates : handling of series found in more than one report, one of
+        vdeh_model.DUPLICATE_POLICIES (optional, default keep-first)
+    parse_workers : number of processes used to parse large reports
+        (optional, default 1)
+    prefetch : number of reports read ahead while parsing (optional,
+        default 2)
+    formats : table formats saved alongside the excel output (optional)
+    validate : check the settings against the reports before running
+        (optional, default true)
+    validate_only : only check the settings against the reports (optional)
+    checkpoint : directory for report stage checkpoints (optional)
+    plot_cache : directory of rendered plots reused while their data is
+        unchanged (optional, default <checkpoint>/plots)
+    plot_cache_size : size limit of the plot cache in MB (optional, default 64)
+    resamples : number of bootstrap resamples and permutations of the
+        pairwise comparisons (optional, default 0 - none)
+    seed : seed of the resampling (optional, default 0)
+    resample_workers : number of processes used for resampling (optional,
+        default 1)
+    from_stage : first report stage to run again (optional)
+    out_of_core : directory the series are spilled to in parquet chunks,
+        the report only keeps the group statistics of the model factors in
+        memory (optional)
+    chunk_size : number of series per spilled chunk (optional, default
+        vdeh_chunked.CHUNK_SERIES)
+"""
+
+__component_version__ = "1.0"
+__license__ = "MIT License"
+
+# %% import modules/libraries
+import hmac
+import http.server
+import json
+import os
+import secrets
+import threading
+import time
+import traceback
+import urllib.request
+
+from . import vdeh_chunked, vdeh_model
+
+# %% define functions
+
+DEFAULT_PORT = 8765
+TOKEN_HEADER = "X-VDEH-Token"
+
+
+def token_path(port, token_dir=None):
+    """
+    path of the file holding the token of the service on port (default
+    directory ~/.vdeh)
+    """
+    token_dir = token_dir or os.path.join(os.path.expanduser("~"), ".vdeh")
+    return os.path.join(token_dir, f"service_{port}.token")
+
+
+def write_token(port, token_dir=None):
+    """
+    create a new random token for the service on port, saved to a file only
+    the user can read - returns the token
+    """
+    path = token_path(port, token_dir)
+    os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+    # a new file, so the permissions of an older token file are not kept
+    if os.path.exists(path):
+        os.remove(path)
+    token = secrets.token_hex(32)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "w") as f:
+        f.write(token)
+    return token
+
+
+def read_token(port, token_dir=None):
+    with open(token_path(port, token_dir)) as f:
+        return f.read().strip()
+
+
+def run_job(job, model):
+    """
+    run one extraction/analysis job with the given (configured) model,
+    returns 0 on success and 1 if the job could not be run
+    """
+    logger = model.logger
+    model.input_paths = vdeh_model.expand_report_paths(job.get("inputs") or [])
+    model.output_path = job.get("output") or str()
+    model.settings_path = job.get("settings") or str()
+    model.store_path = job.get("store") or str()
+    model.wide_export = bool(job.get("wide"))
+    model.sparse_columns = bool(job.get("sparse"))
+    model.replicate_export = bool(job.get("replicates"))
+    model.longitudinal_export = bool(job.get("longitudinal"))
+    model.checkpoint_dir = job.get("checkpoint") or str()
+    model.export_formats = job.get("formats") or []
+    model.duplicate_policy = job.get("duplicates") or "keep-first"
+    model.parse_workers = int(job.get("parse_workers") or 1)
+    model.prefetch_depth = int(job.get("prefetch", 2))
+    model.plot_cache_dir = job.get("plot_cache") or str()
+    model.plot_cache_size = int(float(job.get("plot_cache_size") or 64) * 1024**2)
+    model.resample_iterations = int(job.get("resamples") or 0)
+    model.resample_seed = int(job.get("seed") or 0)
+    model.resample_workers = int(job.get("resample_workers") or 1)
+    model.spill_dir = job.get("out_of_core") or str()
+    model.chunk_series = int(job.get("chunk_size") or vdeh_chunked.CHUNK_SERIES)
+
+    query = job.get("query")
+    if query is not None:
+        # build the extracted data from the store instead of the reports
+        if not model.store_path or not model.output_path:
+            logger.log("error", "store queries require a store and an output path")
+            return 1
+        model.load_from_store(
+            animal_ids=query.get("animal"),
+            measurements=query.get("measure"),
+            start_date=query.get("start"),
+            end_date=query.get("end"),
+        )
+        model.export_extracted_data()
+        return 0
+
+    if not model.input_paths or not model.output_path:
+        logger.log("error", "jobs require input reports and an output path")
+        return 1
+
+    if job.get("scan"):
+        # header-only scan, write a settings template to the output path
+        model.scan_data()
+        vdeh_model.write_settings_template(model.catalog, model.output_path, logger)
+        return 0
+
+    if model.settings_path:
+        model.load_settings_from_file()
+        # check the settings against a header scan of the reports first, so
+        # a run that can not work stops before the reports are parsed
+        if job.get("validate", True) or job.get("validate_only"):
+            problems = model.preflight_check()
+            if (problems["Severity"] == "error").any():
+                logger.log("error", "settings do not match the reports - run stopped")
+                return 1
+            if job.get("validate_only"):
+                return 0
+        if model.spill_dir:
+            model.generate_chunked_report()
+        else:
+            model.generate_full_report(from_stage=job.get("from_stage"))
+    else:
+        model.check_data()
+        model.export_extracted_data()
+        if model.store_path:
+            model.update_store()
+
+    return 0
+
+
+def submit_job(
+    job, port=DEFAULT_PORT, host="127.0.0.1", timeout=None, token=None, token_dir=None
+):
+    """
+    send a job to a running service and wait for the result, returns the
+    decoded response (status, seconds and the log messages of the job) - the
+    token of the service is read from its token file unless given
+    """
+    if token is None:
+        token = read_token(port, token_dir)
+    request = urllib.request.Request(
+        f"http://{host}:{port}/jobs",
+        data=json.dumps(job).encode(),
+        headers={"Content-Type": "application/json", TOKEN_HEADER: token},
+        method="POST",
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read().decode())
+
+
+# %% define classes
+
+
+class JobLogger:
+    """
+    collects the messages logged during a job (returned to the client) and
+    passes them on to the service logger
+    """
+
+    def __init__(self, logger=None):
+        self.logger = logger
+        self.messages = []
+
+    @property
+    def queue(self):
+        # the queue of the service logger, so worker pools of the job log
+        # through it (see vdeh_logging.pool_options)
+        return getattr(self.logger, "queue", None)
+
+    def log(self, level, message, **kwargs):
+        self.messages.append([str(level), str(message)])
+        if self.logger:
+            self.logger.log(level, message, **kwargs)
+
+
+class VDEH_Service:
+    def __init__(
+        self,
+        logger=None,
+        version_info=None,
+        report_cache_size=64,
+        settings_cache_size=8,
+    ):
+        self.logger = logger
+        self.version_info = version_info or {}
+        self.report_cache = vdeh_model.LRUCache(report_cache_size)
+        self.settings_cache = vdeh_model.LRUCache(settings_cache_size)
+        self.result_cache = vdeh_model.LRUCache()
+        self.stage_cache = vdeh_model.LRUCache(32)
+        self.lock = threading.Lock()
+        self.jobs_run = 0
+
+        # import the plotting and stats stack up front so the first job does
+        # not pay for it
+        from matplotlib import pyplot  # noqa: F401
+        import pingouin  # noqa: F401
+
+    def status(self):
+        return {
+            "jobs run": self.jobs_run,
+            "cached reports": len(self.report_cache),
+            "cached settings": len(self.settings_cache),
+            "cached results": len(self.result_cache),
+            "cached report stages": len(self.stage_cache),
+            "report cache hits": self.report_cache.hits,
+            "report cache misses": self.report_cache.misses,
+        }
+
+    def run(self, job):
+        job_logger = JobLogger(self.logger)
+        start = time.perf_counter()
+
+        # jobs share the caches, run them one at a time
+        with self.lock:
+            model = vdeh_model.vdeh_model()
+            model.logger = job_logger
+            model.version_info = self.version_info
+            model.report_cache = self.report_cache
+            model.settings_cache = self.settings_cache
+            model.result_cache = self.result_cache
+            model.stage_cache = self.stage_cache
+            try:
+                status = run_job(job, model)
+            except Exception as e:
+                job_logger.log("error", f"Unable to run job: {e}")
+                job_logger.log("error", traceback.format_exc())
+                status = 1
+            self.jobs_run += 1
+
+        return {
+            "status": status,
+            "seconds": time.perf_counter() - start,
+            "log": job_logger.messages,
+        }
+
+    def make_server(self, port=DEFAULT_PORT, host="127.0.0.1", token_dir=None):
+        """
+        http server of the service (port 0 picks a free port) and its token,
+        the token file is removed by serve once the server stops
+        """
+        service = self
+
+        class RequestHandler(http.server.BaseHTTPRequestHandler):
+            def _reply(self, code, content):
+                body = json.dumps(content).encode()
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _allowed(self, json_body=False):
+                # browsers send an Origin header with cross-origin requests,
+                # and need a preflight (never answered) to send json or a
+                # custom header - jobs are only taken from local clients that
+                # could read the token file
+                if self.headers.get("Origin") is not None:
+                    self._reply(403, {"error": "cross-origin requests are refused"})
+                    return False
+                content_type = self.headers.get("Content-Type", "")
+                if json_body and (
+                    content_type.split(";")[0].strip().lower() != "application/json"
+                ):
+                    self._reply(415, {"error": "jobs must be sent as application/json"})
+                    return False
+                if not hmac.compare_digest(
+                    self.headers.get(TOKEN_HEADER, "").encode(), token.encode()
+                ):
+                    self._reply(403, {"error": "missing or wrong service token"})
+                    return False
+                return True
+
+            def do_GET(self):
+                if not self._allowed():
+                    return
+                if self.path == "/status":
+                    self._reply(200, service.status())
+                else:
+                    self._reply(404, {"error": f"unknown path {self.path}"})
+
+            def do_POST(self):
+                if not self._allowed(json_body=True):
+                    return
+                if self.path != "/jobs":
+                    self._reply(404, {"error": f"unknown path {self.path}"})
+                    return
+                try:
+                    length = int(self.headers.get("Content-Length", 0))
+                    job = json.loads(self.rfile.read(length).decode())
+                except Exception as e:
+                    self._reply(400, {"error": f"unable to read job: {e}"})
+                    return
+                self._reply(200, service.run(job))
+
+            def log_message(self, format, *args):
+                if service.logger:
+                    service.logger.log("debug", format % args)
+
+        server = http.server.ThreadingHTTPServer((host, port), RequestHandler)
+        port = server.server_address[1]
+        token = write_token(port, token_dir)
+        server.token_path = token_path(port, token_dir)
+        return server, token
+
+    def serve(self, port=DEFAULT_PORT, host="127.0.0.1", token_dir=None):
+        server, token = self.make_server(port, host, token_dir)
+        port = server.server_address[1]
+        if self.logger:
+            self.logger.log("info", f"VDEH service listening on {host}:{port}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            if os.path.exists(server.token_path):
+                os.remove(server.token_path)
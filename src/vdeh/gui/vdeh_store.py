@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+"""
+VDEH_store
+
+local sqlite store of extracted series, collected data from any number of
+runs can be upserted into the store and selections pulled back out as a
+report DataFrame without re-reading the VevoLab reports
+"""
+
+__component_version__ = "1.0"
+__license__ = "MIT License"
+
+# %% import modules/libraries
+import sqlite3
+
+import pandas
+
+# %% define functions
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS studies (
+        study_id TEXT NOT NULL,
+        field TEXT NOT NULL,
+        value TEXT,
+        PRIMARY KEY (study_id, field)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS series (
+        series_id INTEGER PRIMARY KEY,
+        study_id TEXT NOT NULL,
+        series_name TEXT NOT NULL,
+        animal_id TEXT NOT NULL,
+        series_date TEXT,
+        UNIQUE (study_id, series_name, animal_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS series_fields (
+        series_id INTEGER NOT NULL REFERENCES series (series_id),
+        field TEXT NOT NULL,
+        value TEXT,
+        PRIMARY KEY (series_id, field)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS measurements (
+        series_id INTEGER NOT NULL REFERENCES series (series_id),
+        measurement TEXT NOT NULL,
+        value REAL,
+        PRIMARY KEY (series_id, measurement)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_series_animal ON series (animal_id)",
+    "CREATE INDEX IF NOT EXISTS idx_series_date ON series (series_date)",
+    """
+    CREATE INDEX IF NOT EXISTS idx_measurements_key
+    ON measurements (measurement, series_id)
+    """,
+]
+
+# columns of the collected data that are stored as series keys
+KEY_COLUMNS = ["Study ID", "Series Name", "Animal ID", "Series Date"]
+
+# study ids per query when looking up upserted series (sqlite limits the
+# number of query parameters)
+STUDY_BATCH = 500
+
+
+def open_store(store_path):
+    """
+    open (and create if needed) the sqlite store at store_path
+    """
+    conn = sqlite3.connect(store_path)
+    with conn:
+        for statement in SCHEMA:
+            conn.execute(statement)
+    return conn
+
+
+def _to_iso_date(values):
+    dates = pandas.to_datetime(values, errors="coerce")
+    return [None if pandas.isna(d) else d.isoformat(sep=" ") for d in dates]
+
+
+def upsert_collected_data(conn, column_names, df, study_df):
+    """
+    Parameters
+    ----------
+    conn : sqlite3.Connection
+        connection returned by open_store
+    column_names : dict of lists
+        column names returned by collect_data, used to tell measurements
+        from metadata
+    df : pandas.DataFrame
+        series data returned by collect_data
+    study_df : pandas.DataFrame
+        study data returned by collect_data
+
+    Returns
+    -------
+    int
+        number of series written to the store
+
+    """
+    if df.shape[0] == 0:
+        return 0
+
+    measurement_keys = [
+        k
+        for k in column_names["VevoLab Measurement_Mode_Parameter or Calculation"]
+        if k in df.columns
+    ]
+    field_keys = [
+        c for c in df.columns if c not in measurement_keys and c not in KEY_COLUMNS
+    ]
+
+    keys_df = df.reindex(columns=KEY_COLUMNS).reset_index(drop=True)
+    keys_df["Study ID"] = keys_df["Study ID"].fillna("").astype(str)
+    keys_df["Animal ID"] = keys_df["Animal ID"].fillna("").astype(str)
+    keys_df["Series Date"] = _to_iso_date(keys_df["Series Date"])
+
+    with conn:
+        if study_df.shape[0] > 0:
+            study_long = study_df.melt(
+                id_vars="Study ID", var_name="field", value_name="value"
+            ).dropna()
+            conn.executemany(
+                "INSERT INTO studies (study_id, field, value) VALUES (?, ?, ?) "
+                + "ON CONFLICT (study_id, field) DO UPDATE SET value = excluded.value",
+                study_long.astype(str).itertuples(index=False, name=None),
+            )
+
+        conn.executemany(
+            "INSERT INTO series (study_id, series_name, animal_id, series_date) "
+            + "VALUES (?, ?, ?, ?) "
+            + "ON CONFLICT (study_id, series_name, animal_id) "
+            + "DO UPDATE SET series_date = excluded.series_date",
+            keys_df.itertuples(index=False, name=None),
+        )
+        # ids of the upserted series - only the series of the studies in this
+        # batch are read, not the whole table
+        study_ids = list(keys_df["Study ID"].unique())
+        series_ids = pandas.concat(
+            [
+                pandas.read_sql_query(
+                    "SELECT series_id, study_id, series_name, animal_id FROM series "
+                    + f"WHERE study_id IN ({','.join('?' * len(batch))})",
+                    conn,
+                    params=batch,
+                )
+                for batch in [
+                    study_ids[i : i + STUDY_BATCH]
+                    for i in range(0, len(study_ids), STUDY_BATCH)
+                ]
+            ]
+        ).set_index(["study_id", "series_name", "animal_id"])["series_id"]
+        row_ids = series_ids.reindex(
+            pandas.MultiIndex.from_frame(
+                keys_df[["Study ID", "Series Name", "Animal ID"]]
+            )
+        ).values
+
+        # a series is replaced as a whole, measurements and fields missing
+        # from the new copy must not survive from the old one
+        for table in ["measurements", "series_fields"]:
+            conn.executemany(
+                f"DELETE FROM {table} WHERE series_id = ?",
+                ((int(s),) for s in set(row_ids)),
+            )
+
+        values = df[measurement_keys].apply(pandas.to_numeric, errors="coerce")
+        values.index = row_ids
+        long_values = values.stack().reset_index()
+        conn.executemany(
+            "INSERT INTO measurements (series_id, measurement, value) "
+            + "VALUES (?, ?, ?) "
+            + "ON CONFLICT (series_id, measurement) DO UPDATE SET value = excluded.value",
+            (
+                (int(s), m, float(v))
+                for s, m, v in long_values.itertuples(index=False, name=None)
+            ),
+        )
+
+        fields = df[field_keys].astype(object).where(df[field_keys].notna())
+        fields.index = row_ids
+        long_fields = fields.stack().reset_index()
+        conn.executemany(
+            "INSERT INTO series_fields (series_id, field, value) VALUES (?, ?, ?) "
+            + "ON CONFLICT (series_id, field) DO UPDATE SET value = excluded.value",
+            (
+                (int(s), f, str(v))
+                for s, f, v in long_fields.itertuples(index=False, name=None)
+            ),
+        )
+
+    return len(row_ids)
+
+
+def select_report(
+    conn,
+    animal_ids=None,
+    measurements=None,
+    start_date=None,
+    end_date=None,
+    study_ids=None,
+):
+    """
+    Parameters
+    ----------
+    conn : sqlite3.Connection
+        connection returned by open_store
+    animal_ids, measurements, study_ids : list of strings, optional
+        restrict the selection to these animals/measurement keys/studies
+    start_date, end_date : string, optional
+        restrict the selection to series dates within this range (inclusive)
+
+    Returns
+    -------
+    report_df : pandas.DataFrame
+        one row per series with the series keys, series metadata and the
+        selected measurements (same layout as the data from collect_data)
+
+    """
+    conditions = []
+    params = []
+    for column, selection in [
+        ("s.animal_id", animal_ids),
+        ("s.study_id", study_ids),
+    ]:
+        if selection:
+            conditions.append(f"{column} IN ({','.join('?' * len(selection))})")
+            params += list(selection)
+    if start_date:
+        conditions.append("s.series_date >= ?")
+        params += _to_iso_date([start_date])
+    if end_date:
+        # compare against the end of the day so dates without a time include
+        # every series acquired on that day
+        conditions.append("s.series_date < date(?, '+1 day')")
+        params += [str(pandas.to_datetime(end_date).date())]
+    where = " WHERE " + " AND ".join(conditions) if conditions else ""
+
+    series_df = pandas.read_sql_query(
+        "SELECT s.series_id, s.study_id AS 'Study ID', "
+        + "s.series_name AS 'Series Name', s.animal_id AS 'Animal ID', "
+        + "s.series_date AS 'Series Date' FROM series s"
+        + where,
+        conn,
+        params=params,
+    ).set_index("series_id")
+
+    if measurements:
+        conditions.append(f"m.measurement IN ({','.join('?' * len(measurements))})")
+        params += list(measurements)
+    long_df = pandas.read_sql_query(
+        "SELECT m.series_id, m.measurement, m.value FROM measurements m "
+        + "JOIN series s ON s.series_id = m.series_id"
+        + (" WHERE " + " AND ".join(conditions) if conditions else ""),
+        conn,
+        params=params,
+    )
+    fields_df = pandas.read_sql_query(
+        "SELECT f.series_id, f.field, f.value FROM series_fields f "
+        + "JOIN series s ON s.series_id = f.series_id"
+        + where,
+        conn,
+        params=params[: len(params) - len(measurements or [])],
+    )
+
+    report_df = series_df.join(
+        fields_df.pivot(index="series_id", columns="field", values="value")
+    ).join(long_df.pivot(index="series_id", columns="measurement", values="value"))
+    report_df["Series Date"] = pandas.to_datetime(report_df["Series Date"])
+
+    return report_df.sort_values(["Animal ID", "Series Date"]).reset_index(drop=True)
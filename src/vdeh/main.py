@@ -87,20 +87,241 @@ SOFTWARE.
 # %% import modules/libraries
 # import gui
 try:
-    from gui import vdeh_controller, vdeh_model, vdeh_subgui_controller
+    from gui import (
+        vdeh_controller,
+        vdeh_model,
+        vdeh_subgui_controller,
+        vdeh_logging,
+    )
 except:
-    from .gui import vdeh_controller, vdeh_model, vdeh_subgui_controller
+    from .gui import (
+        vdeh_controller,
+        vdeh_model,
+        vdeh_subgui_controller,
+        vdeh_logging,
+    )
 # import gui.vdeh_controller as vdeh_controller
 # import gui.vdeh_model as vdeh_model
 # import gui.vdeh_subgui_controller as vdeh_subgui_controller
+# the service, batch and out-of-core modules are imported by run_express, the
+# gui starts without them
 import os
 import sys
 import argparse
-from PySide6 import QtWidgets
-from PySide6.QtUiTools import QUiLoader
-from PySide6.QtCore import QFile
+import contextlib
+import json
+import statistics
+import subprocess
+import time
+from PySide6 import QtCore, QtWidgets
 
 # %% define functions/classes
+def build_job(args):
+    # collect the express mode arguments into a job for vdeh_service.run_job,
+    # paths are made absolute so a service in another directory finds them
+    def absolute(path):
+        return os.path.abspath(path) if path else str()
+
+    job = {
+        "inputs": [absolute(p) for p in args.input or []],
+        "output": absolute(args.output),
+        "settings": absolute(args.settings),
+        "store": absolute(args.store),
+        "wide": args.wide,
+        "sparse": args.sparse,
+        "replicates": args.replicates,
+        "longitudinal": args.longitudinal,
+        "scan": args.scan,
+        "formats": args.format or [],
+        "duplicates": args.duplicates,
+        "parse_workers": args.parse_workers,
+        "prefetch": args.prefetch,
+        "checkpoint": absolute(args.checkpoint),
+        "plot_cache": absolute(args.plot_cache),
+        "plot_cache_size": args.plot_cache_size,
+        "resamples": args.resamples,
+        "seed": args.seed,
+        "resample_workers": args.resample_workers,
+        "out_of_core": absolute(args.out_of_core),
+        "chunk_size": args.chunk_size,
+        "from_stage": args.from_stage,
+        "validate": not args.no_validate,
+        "validate_only": args.validate,
+    }
+    if args.query:
+        job["query"] = {
+            "animal": args.animal,
+            "measure": args.measure,
+            "start": args.start,
+            "end": args.end,
+        }
+    return job
+
+
+def run_stream(args, logger):
+    # parse the reports (- reads stdin) and write one row per series to the
+    # output (stdout if none or -) as each series is parsed
+    to_stdout = args.output in [None, "", vdeh_model.STDIN_PATH]
+    try:
+        with (
+            contextlib.nullcontext(sys.stdout)
+            if to_stdout
+            else open(args.output, "w", newline="")
+        ) as out:
+            n = vdeh_model.stream_reports(
+                args.input, out, args.stream, logger, keys=args.measure
+            )
+    except BrokenPipeError:
+        # the consumer stopped reading (e.g. piped into head)
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 0
+    logger.log("info", f"{n} series streamed")
+    return 0
+
+
+def run_express(args):
+    # run extraction/analysis from the command line arguments without the gui
+    try:
+        from gui import (
+            vdeh_store,
+            vdeh_series,
+            vdeh_resample,
+            vdeh_chunked,
+            vdeh_service,
+            vdeh_batch,
+        )
+    except:
+        from .gui import (
+            vdeh_store,
+            vdeh_series,
+            vdeh_resample,
+            vdeh_chunked,
+            vdeh_service,
+            vdeh_batch,
+        )
+
+    streaming = args.stream and args.output in [None, "", vdeh_model.STDIN_PATH]
+    logger = vdeh_controller.VDEH_Logger(
+        console_loglevel=(args.loglevel or "INFO").upper(),
+        log_file_path=args.dev,
+        console_stream=sys.stderr if streaming else None,
+    )
+    version_info = {
+        "VevoLab Data Extraction Helper": __version__,
+        "vdeh model": vdeh_model.__component_version__,
+        "vdeh store": vdeh_store.__component_version__,
+        "vdeh series": vdeh_series.__component_version__,
+        "vdeh resample": vdeh_resample.__component_version__,
+        "vdeh chunked": vdeh_chunked.__component_version__,
+        "vdeh service": vdeh_service.__component_version__,
+        "vdeh batch": vdeh_batch.__component_version__,
+        "vdeh logging": vdeh_logging.__component_version__,
+    }
+
+    if args.batch:
+        # run every job of the manifest in a pool of worker processes
+        return int(
+            vdeh_batch.run_batch(
+                args.batch,
+                workers=args.workers,
+                force=args.force,
+                logger=logger,
+                version_info=version_info,
+            )
+            > 0
+        )
+
+    if args.serve:
+        # keep running and take jobs from --connect clients
+        service = vdeh_service.VDEH_Service(logger, version_info=version_info)
+        service.serve(args.serve)
+        return 0
+
+    if args.stream:
+        return run_stream(args, logger)
+    if vdeh_model.STDIN_PATH in (args.input or []):
+        logger.log("error", "reading reports from stdin (-i -) needs --stream")
+        return 1
+
+    job = build_job(args)
+
+    if args.connect:
+        # hand the job to a running service and relay its log
+        try:
+            response = vdeh_service.submit_job(job, args.connect)
+        except OSError as e:
+            logger.log(
+                "error", f"Unable to reach service on port {args.connect}: {e}"
+            )
+            return 1
+        for level, message in response["log"]:
+            logger.log(level, message)
+        logger.log("info", f"job finished in {response['seconds']:.2f} s")
+        return response["status"]
+
+    model = vdeh_model.vdeh_model()
+    model.logger = logger
+    model.version_info = version_info
+    try:
+        return vdeh_service.run_job(job, model)
+    except vdeh_model.DuplicateSeriesError as e:
+        logger.log("error", str(e))
+        return 1
+
+
+class FirstPaintProbe(QtCore.QObject):
+    # used by the startup benchmark - reports the time from the launch of the
+    # process to the first paint of the main window, then quits
+    def __init__(self, window):
+        super().__init__(window)
+        self.window = window
+        self.painted = False
+
+    def eventFilter(self, watched, event):
+        if (
+            watched is self.window
+            and event.type() == QtCore.QEvent.Type.Paint
+            and not self.painted
+        ):
+            self.painted = True
+            launched = float(os.environ.get("VDEH_STARTUP_T0", time.time()))
+            print(json.dumps({"first paint": time.time() - launched}), flush=True)
+            QtCore.QTimer.singleShot(0, QtWidgets.QApplication.quit)
+        return False
+
+
+def run_startup_benchmark(runs):
+    # launch the gui runs times under the offscreen qt platform and report
+    # the time to first paint (interpreter start, imports, window build and
+    # first paint) of each run
+    if "__compiled__" in globals():
+        command = [sys.executable]
+    else:
+        command = [sys.executable, "-m", "vdeh.main"]
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+
+    times = []
+    for i in range(runs):
+        env["VDEH_STARTUP_T0"] = repr(time.time())
+        result = subprocess.run(
+            command + ["--first-paint"],
+            env=env,
+            capture_output=True,
+            text=True,
+            timeout=120,
+        )
+        lines = [l for l in result.stdout.splitlines() if l.startswith("{")]
+        if not lines:
+            print(f"run {i + 1} - no paint reported\n{result.stderr}")
+            return 1
+        times.append(json.loads(lines[-1])["first paint"])
+        print(f"run {i + 1} - first paint after {times[-1]:.3f} s")
+
+    print(
+        f"time to first paint over {runs} runs - min {min(times):.3f} s, "
+        + f"median {statistics.median(times):.3f} s, max {max(times):.3f} s"
+    )
+    return 0
 
 
 # %% define main
@@ -112,7 +333,10 @@ def main():
         "-i",
         "--input",
         action="append",
-        help="path to VevoLab Report, may combine by declaring multiple times",
+        help=(
+            "path to VevoLab Report, may combine by declaring multiple times "
+            + "(- reads reports from stdin, with --stream)"
+        ),
     )
     parser.add_argument("-s", "--settings", help="path to settings file")
     parser.add_argument(
@@ -145,32 +369,277 @@ def main():
             + "without launching gui"
         ),
     )
+    parser.add_argument(
+        "-w",
+        "--wide",
+        action="store_true",
+        help=(
+            "join the study level metadata onto every series row of the "
+            + "extracted data instead of saving it as a separate sheet"
+        ),
+    )
 
-    args, others = parser.parse_known_args()
+    parser.add_argument(
+        "-f",
+        "--format",
+        action="append",
+        choices=vdeh_model.EXPORT_FORMATS,
+        help=(
+            "also save the output tables in this format beside the excel "
+            + "output, may declare multiple times"
+        ),
+    )
+    parser.add_argument(
+        "--stream",
+        choices=vdeh_model.STREAM_FORMATS,
+        help=(
+            "write one row per series to the output (stdout if no output or "
+            + "-) as each series is parsed, --measure limits the measurements"
+        ),
+    )
 
-    if args.express:
-        pass
-    else:
-        # create the application
+    parser.add_argument(
+        "--sparse",
+        action="store_true",
+        help=(
+            "keep measurement columns as sparse columns in memory (saves "
+            + "memory when reports mix many different measurement packages)"
+        ),
+    )
+    parser.add_argument(
+        "--replicates",
+        action="store_true",
+        help=(
+            "also save the N, SD, CV, min and max of number suffixed "
+            + "measurements (e.g. AutoLV frames) and their individual values"
+        ),
+    )
+    parser.add_argument(
+        "--longitudinal",
+        action="store_true",
+        help=(
+            "also save a longitudinal sheet - first and last value, change "
+            + "from baseline and slope per day of each measurement per animal"
+        ),
+    )
+    parser.add_argument(
+        "--duplicates",
+        choices=vdeh_model.DUPLICATE_POLICIES,
+        default="keep-first",
+        help=(
+            "handling of series found in more than one report (same series "
+            + "name, animal, date and contents) - default keep-first"
+        ),
+    )
+
+    parser.add_argument(
+        "--parse-workers",
+        type=int,
+        default=1,
+        help=(
+            "number of processes used to parse the series of large reports, "
+            + "their offset index is kept with the --checkpoint directory"
+        ),
+    )
 
-        loader = QUiLoader()
+    parser.add_argument(
+        "--prefetch",
+        type=int,
+        default=2,
+        help=(
+            "number of reports read ahead in the background while the "
+            + "current report is parsed (0 disables read-ahead), default 2"
+        ),
+    )
 
-        app = QtWidgets.QApplication(sys.argv)
+    parser.add_argument(
+        "--validate",
+        action="store_true",
+        help=(
+            "express mode - only check the settings file against a header "
+            + "scan of the reports and list the problems found"
+        ),
+    )
+    parser.add_argument(
+        "--no-validate",
+        action="store_true",
+        help="run the report without checking the settings against the reports",
+    )
 
-        ui_file = QFile(
-            os.path.join(os.path.dirname(__file__), "gui/vdeh_form_lite.ui")
-        )
-        window_ui = loader.load(ui_file)
+    parser.add_argument(
+        "--scan",
+        action="store_true",
+        help=(
+            "express mode - only scan the reports (files or directories) for "
+            + "available keys and save a settings template to the output path"
+        ),
+    )
+    parser.add_argument(
+        "--store",
+        help=(
+            "path to a local series store (sqlite), extracted data is "
+            + "added to the store, or read from it when using --query"
+        ),
+    )
+    parser.add_argument(
+        "-q",
+        "--query",
+        action="store_true",
+        help="express mode - build the extracted data from the store selection",
+    )
+    parser.add_argument(
+        "--animal",
+        action="append",
+        help="store selection - Animal ID to include, may declare multiple times",
+    )
+    parser.add_argument(
+        "--measure",
+        action="append",
+        help=(
+            "store selection (or streamed measurements) - VevoLab "
+            + "Measurement_Mode_Parameter or Calculation to include, may "
+            + "declare multiple times"
+        ),
+    )
+    parser.add_argument("--start", help="store selection - first Series Date")
+    parser.add_argument("--end", help="store selection - last Series Date")
+
+    parser.add_argument(
+        "--serve",
+        type=int,
+        metavar="PORT",
+        help=(
+            "run as a local extraction service on this port, keeping parsed "
+            + "reports, settings and stats results cached between jobs"
+        ),
+    )
+    parser.add_argument(
+        "--connect",
+        type=int,
+        metavar="PORT",
+        help="express mode - send the job to a service started with --serve",
+    )
+
+    parser.add_argument(
+        "--checkpoint",
+        metavar="DIR",
+        help=(
+            "save the outputs of each report stage to this directory and "
+            + "reuse them on later runs while their inputs are unchanged"
+        ),
+    )
+    parser.add_argument(
+        "--plot-cache",
+        metavar="DIR",
+        help=(
+            "reuse rendered plots from this directory while their data is "
+            + "unchanged, default is the plots folder of the --checkpoint directory"
+        ),
+    )
+    parser.add_argument(
+        "--plot-cache-size",
+        type=float,
+        default=64,
+        metavar="MB",
+        help="size limit of the plot cache, least recently used plots are removed",
+    )
+    parser.add_argument(
+        "--resamples",
+        type=int,
+        default=0,
+        metavar="N",
+        help=(
+            "add bootstrap confidence intervals and permutation p values from "
+            + "N resamples to the pairwise comparisons (e.g. 10000)"
+        ),
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="seed of the resampling, results are reproducible for a given seed",
+    )
+    parser.add_argument(
+        "--resample-workers",
+        type=int,
+        default=1,
+        metavar="N",
+        help="number of processes the resampling is spread over",
+    )
+    parser.add_argument(
+        "--out-of-core",
+        metavar="DIR",
+        help=(
+            "spill the series to parquet chunks in DIR as the reports are "
+            + "parsed and build the group summary and anova tables from "
+            + "per group statistics, for data larger than memory"
+        ),
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        metavar="SERIES",
+        help="number of series per spilled chunk with --out-of-core (default 5000)",
+    )
+    parser.add_argument(
+        "--from-stage",
+        choices=vdeh_model.REPORT_STAGES,
+        help="rerun the report from this stage even if its inputs are unchanged",
+    )
+    parser.add_argument(
+        "-b",
+        "--batch",
+        metavar="MANIFEST",
+        help=(
+            "run every job listed in a json/csv manifest, jobs unchanged "
+            + "since their last successful run are skipped"
+        ),
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="batch mode - number of worker processes, default is all cpus",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="batch mode - rerun jobs even if they are unchanged",
+    )
+
+    parser.add_argument(
+        "--startup-benchmark",
+        type=int,
+        metavar="RUNS",
+        help=(
+            "launch the gui RUNS times under the offscreen qt platform and "
+            + "report the time to first paint of the main window"
+        ),
+    )
+    parser.add_argument("--first-paint", action="store_true", help=argparse.SUPPRESS)
 
-        window_ui.show()
+    args, others = parser.parse_known_args()
 
-        ui = vdeh_controller.vdeh_main_window(window_ui, vdeh_model.vdeh_model, loader)
+    if args.startup_benchmark:
+        sys.exit(run_startup_benchmark(args.startup_benchmark))
+
+    if args.express or args.serve or args.batch:
+        sys.exit(run_express(args))
+    else:
+        # create the application
+        app = QtWidgets.QApplication(sys.argv)
+
+        ui = vdeh_controller.vdeh_main_window(vdeh_model.vdeh_model())
 
         ui.model.version_info = {
             "VevoLab Data Extraction Helper": __version__,
             "vdeh model": vdeh_model.__component_version__,
             "vdeh gui": vdeh_controller.__component_version__,
             "vdeh subguis": vdeh_subgui_controller.__component_version__,
+            "vdeh store": vdeh_model.vdeh_store.__component_version__,
+            "vdeh series": vdeh_model.vdeh_series.__component_version__,
+            "vdeh resample": vdeh_model.vdeh_resample.__component_version__,
+            "vdeh chunked": vdeh_model.vdeh_chunked.__component_version__,
+            "vdeh logging": vdeh_logging.__component_version__,
         }
 
         # if user specified --dev or --loglevel update model
@@ -179,9 +648,12 @@ def main():
         if args.loglevel:
             ui.model.log_level = args.loglevel
 
+        if args.first_paint:
+            probe = FirstPaintProbe(ui)
+            ui.installEventFilter(probe)
+
         # show the gui
-        # MainWindow.show()
-        # ui.ui.show()
+        ui.show()
 
         sys.exit(app.exec())
 